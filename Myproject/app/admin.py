@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 
-from .models import ReferenceType, ReferenceField, Reference, ReferenceIssue, ReferenceText
+from .models import ReferenceType, ReferenceField, Reference, ReferenceIssue, ReferenceText, ProfilerSettings, ProfileCapture
 
 
 # Роли хранятся в группах: admin, operator, user. Добавление пользователей — в /admin/, группу выбрать в форме.
@@ -40,6 +45,59 @@ class ReferenceTextAdmin(admin.ModelAdmin):
     search_fields = ("title", "input_text")
 
 
+@admin.register(ProfilerSettings)
+class ProfilerSettingsAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "allow_header", "allow_url_flag", "auto_threshold_ms", "auto_path_prefix", "keep")
+
+    def has_add_permission(self, request):
+        # Одна запись настроек
+        return not ProfilerSettings.objects.exists()
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        from .profiling import reset_settings_cache
+        reset_settings_cache()
+
+
+@admin.register(ProfileCapture)
+class ProfileCaptureAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "method", "path", "trigger", "duration_ms", "reference_text", "list_size", "user", "download_link")
+    list_filter = ("trigger",)
+    search_fields = ("path",)
+    readonly_fields = (
+        "created_at", "method", "path", "trigger", "user", "reference_text", "list_size",
+        "duration_ms", "download_link", "summary_block",
+    )
+    exclude = ("file", "summary")
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        return [
+            path("<int:pk>/download/", self.admin_site.admin_view(self.download), name="app_profilecapture_download"),
+        ] + super().get_urls()
+
+    def download(self, request, pk):
+        capture = get_object_or_404(ProfileCapture, pk=pk)
+        if not self.has_view_permission(request, capture):
+            raise PermissionDenied
+        try:
+            return FileResponse(capture.file.open("rb"), as_attachment=True, filename=capture.file.name.split("/")[-1])
+        except (OSError, ValueError):
+            raise Http404("Файл профиля не найден.")
+
+    def download_link(self, obj):
+        return format_html('<a href="{}">.prof</a>', reverse("admin:app_profilecapture_download", args=[obj.pk]))
+
+    download_link.short_description = "Скачать"
+
+    def summary_block(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto;">{}</pre>', obj.summary)
+
+    summary_block.short_description = "Сводка (top по cumulative)"
+
+
 # is_staff видит все проверки в приложении, но в админку — только is_superuser или группа admin
 def _admin_has_permission(request):
     if not request.user.is_active or not request.user.is_staff:
@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from . import shadow
+        from .db import configure_connection
+        from .search import ensure_fts_triggers
+
+        connection_created.connect(configure_connection, dispatch_uid="litera_sqlite_pragmas")
+        post_migrate.connect(ensure_fts_triggers, sender=self, dispatch_uid="litera_fts_triggers")
+        shadow.load()
+
+        if getattr(settings, "LITERA_WARMUP", False):
+            from .warmup import warm_up
+
+            warm_up()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Пакетная проверка ссылок в дочерних процессах (команды manage.py).
+
+Рабочие процессы не обращаются к БД: правила полей загружаются в основном
+процессе и передаются в initializer один раз. Модуль не импортирует модели
+на верхнем уровне, чтобы его можно было загрузить в процессе, запущенном
+через spawn (Windows, macOS), до django.setup().
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+_RULES_BY_TYPE = {}
+_TYPE_NAMES = {}
+
+
+def setup_django() -> None:
+    """django.setup() в дочернем процессе, запущенном через spawn; при fork Django уже готов."""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+        django.setup()
+
+
+def init_worker(rules_by_type: dict, type_names: dict) -> None:
+    """Initializer пула: настройка Django и правил полей в дочернем процессе."""
+    setup_django()
+
+    from .validators import FieldRule
+
+    # Правила приходят простыми кортежами: FieldRule нельзя распаковать до django.setup()
+    _RULES_BY_TYPE.clear()
+    _RULES_BY_TYPE.update({
+        code: [FieldRule(*rule) for rule in rules] for code, rules in rules_by_type.items()
+    })
+    _TYPE_NAMES.clear()
+    _TYPE_NAMES.update(type_names)
+
+
+def load_rules_for_workers():
+    """Правила всех типов из БД в виде, пригодном для init_worker: (rules_by_type, type_names)."""
+    from .models import ReferenceType
+    from .validators import load_field_rules
+
+    rules_by_type, type_names = {}, {}
+    for ref_type in ReferenceType.objects.all():
+        rules_by_type[ref_type.code] = [tuple(rule) for rule in load_field_rules(ref_type)]
+        type_names[ref_type.code] = ref_type.name
+    return rules_by_type, type_names
+
+
+def check_line(text: str, type_code=None) -> dict:
+    """
+    Разбор и проверка одной очищенной строки.
+    type_code=None — тип определяется автоматически (detect_reference_type).
+    """
+    from .parsers import PARSERS_BY_TYPE, detect_reference_type
+    from .validators import collect_issues
+
+    started = time.perf_counter()
+    if type_code is None:
+        type_code = detect_reference_type(text)
+    parser = PARSERS_BY_TYPE.get(type_code) if type_code else None
+    data = parser(text) if parser else {}
+    parse_seconds = time.perf_counter() - started
+
+    rules = _RULES_BY_TYPE.get(type_code, []) if data else []
+    issues = collect_issues(type_code, _TYPE_NAMES.get(type_code, type_code or ""), data, rules)
+    return {
+        "type": type_code,
+        "parsed_data": data,
+        "status": "error" if issues else "ok",
+        "issues": [list(issue) for issue in issues],
+        "parse_seconds": parse_seconds,
+    }
+
+
+def check_chunk(chunk: list, type_code=None) -> list:
+    """Проверка пачки строк [(ключ, номер строки, текст), ...] — единица работы пула."""
+    results = []
+    for key, line_no, text in chunk:
+        result = check_line(text, type_code)
+        result.update({"key": key, "line": line_no, "text": text})
+        results.append(result)
+    return results
+
+
+def write_json_atomic(path: Path, payload) -> None:
+    """Файл состояния команды: запись во временный файл и замена, чтобы прерванный запуск не оставил обрывок."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, ensure_ascii=False)
+    os.replace(tmp, path)
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
-from .auth_utils import can_see_templates
+from .auth_utils import can_see_templates, is_operator
 
 
 def litera_nav(request):
-    return {"can_see_templates": can_see_templates(request.user) if request.user.is_authenticated else False}
+    if not request.user.is_authenticated:
+        return {"can_see_templates": False, "can_see_perf": False}
+    return {"can_see_templates": can_see_templates(request.user), "can_see_perf": is_operator(request.user)}
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Настройка SQLite: PRAGMA соединений (сигнал connection_created, подключается в AppConfig.ready)
+и проверки django.core.checks: допустимость настроек (check_sqlite_pragmas) и режим журнала БД
+(check_journal_mode).
+
+По умолчанию:
+- journal_mode=WAL — чтение (страница проверки) не блокирует идущую проверку списка и наоборот.
+  Режим хранится в самом файле БД, поэтому ставится один раз миграцией 0027, а не в каждом
+  соединении; check_journal_mode предупреждает, если режим БД отличается от настроенного;
+- synchronous=NORMAL — в режиме WAL fsync только при checkpoint, а не на каждую транзакцию;
+- busy_timeout — пишущий ждёт освобождения блокировки вместо ошибки "database is locked".
+Переопределяется словарём LITERA_SQLITE_PRAGMAS (значение None — не менять). Допустимы только
+PRAGMA и значения из ALLOWED_PRAGMAS: PRAGMA не принимает параметров запроса, и в SQL попадают
+только проверенные имена и значения.
+"""
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+# PRAGMA -> допустимые значения (слова) или int (неотрицательное целое)
+ALLOWED_PRAGMAS = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+    "busy_timeout": int,
+    "cache_size": int,
+    "mmap_size": int,
+}
+# Хранятся в файле БД, а не в соединении
+PERSISTENT_PRAGMAS = {"journal_mode"}
+
+
+def pragma_value(name: str, value) -> str:
+    """Значение PRAGMA для SQL из ALLOWED_PRAGMAS; иначе ImproperlyConfigured."""
+    allowed = ALLOWED_PRAGMAS.get(name)
+    if allowed is None:
+        raise ImproperlyConfigured(f"LITERA_SQLITE_PRAGMAS: PRAGMA {name!r} не поддерживается")
+    if allowed is int:
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise ImproperlyConfigured(f"LITERA_SQLITE_PRAGMAS: {name} — неотрицательное целое, а не {value!r}")
+        return str(value)
+    word = str(value).upper()
+    if word not in allowed:
+        raise ImproperlyConfigured(
+            f"LITERA_SQLITE_PRAGMAS: {name} = {value!r}; допустимо: {', '.join(sorted(allowed))}"
+        )
+    return word
+
+
+def sqlite_pragmas() -> dict:
+    """Проверенные PRAGMA {имя: значение для SQL} из DEFAULT_PRAGMAS и LITERA_SQLITE_PRAGMAS."""
+    pragmas = dict(DEFAULT_PRAGMAS)
+    pragmas.update(getattr(settings, "LITERA_SQLITE_PRAGMAS", None) or {})
+    return {name: pragma_value(name, value) for name, value in pragmas.items() if value is not None}
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas().items():
+            if name not in PERSISTENT_PRAGMAS:
+                cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@checks.register()
+def check_sqlite_pragmas(app_configs=None, **kwargs):
+    """LITERA_SQLITE_PRAGMAS — только допустимые PRAGMA и значения."""
+    try:
+        sqlite_pragmas()
+    except ImproperlyConfigured as e:
+        return [checks.Error(str(e), id="litera.E001")]
+    return []
+
+
+@checks.register(checks.Tags.database)
+def check_journal_mode(app_configs=None, databases=None, **kwargs):
+    """journal_mode БД совпадает с настроенным (проверка с --database и при migrate)."""
+    try:
+        wanted = sqlite_pragmas().get("journal_mode")
+    except ImproperlyConfigured:
+        return []  # об этом сообщит check_sqlite_pragmas
+    messages = []
+    for alias in databases or ():
+        connection = connections[alias]
+        if connection.vendor != "sqlite" or wanted is None:
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            current = cursor.fetchone()[0].upper()
+        # Для БД в памяти режим всегда MEMORY
+        if current not in (wanted, "MEMORY"):
+            messages.append(checks.Warning(
+                f"База {alias}: journal_mode = {current}, в настройках — {wanted}",
+                hint=f"Выполните один раз: python manage.py dbshell, затем PRAGMA journal_mode = {wanted};",
+                id="litera.W001",
+            ))
+    return messages
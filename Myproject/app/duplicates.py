@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Повторы ссылок по Reference.normalized_hash (см. utils.normalize_reference_text).
+
+- list_duplicates — повторы внутри одного списка, за один проход;
+- seen_before — сколько раз такая же ссылка встречалась и проверялась в других
+  списках; запрос идёт только по покрывающему индексу app_ref_norm_hash_idx;
+- find_previous_check / clone_results — повторная отправка всего списка
+  (ReferenceText.input_hash, utils.input_digest — точный текст ссылок, а не
+  normalized_hash): результаты прошлой проверки копируются без
+  повторной очистки, разбора и проверки.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+
+from .models import Reference, ReferenceIssue, ReferenceText
+
+# Ограничение числа параметров в одном IN (...)
+HASH_CHUNK = 500
+
+
+def list_duplicates(rows) -> dict:
+    """
+    rows — [(номер ссылки в списке, normalized_hash)].
+    Возвращает {номер: [номера других ссылок с тем же текстом]} только для повторяющихся.
+    """
+    by_hash = {}
+    for number, digest in rows:
+        if digest:
+            by_hash.setdefault(digest, []).append(number)
+    result = {}
+    for numbers in by_hash.values():
+        if len(numbers) > 1:
+            for number in numbers:
+                result[number] = [other for other in numbers if other != number]
+    return result
+
+
+def seen_before(reference_text, hashes) -> dict:
+    """
+    {normalized_hash: (встречалась, проверялась)} по ссылкам других списков.
+    «Проверялась» — статус не new (ссылка прошла check_reference).
+    """
+    hashes = sorted({h for h in hashes if h})
+    result = {}
+    for start in range(0, len(hashes), HASH_CHUNK):
+        rows = (
+            Reference.objects.filter(normalized_hash__in=hashes[start:start + HASH_CHUNK])
+            .exclude(reference_text=reference_text)
+            .values("normalized_hash")
+            .annotate(seen=Count("id"), checked=Count("id", filter=~Q(status="new")))
+            .order_by()
+        )
+        for row in rows:
+            result[row["normalized_hash"]] = (row["seen"], row["checked"])
+    return result
+
+
+def find_previous_check(reference_text):
+    """
+    Последний другой список с тем же input_hash и сохранёнными ссылками — того же
+    пользователя или любого, если LITERA_DEDUP_ANY_USER. None, если такого нет.
+    """
+    if not reference_text.input_hash:
+        return None
+    candidates = ReferenceText.objects.filter(input_hash=reference_text.input_hash).exclude(pk=reference_text.pk)
+    if not getattr(settings, "LITERA_DEDUP_ANY_USER", False):
+        candidates = candidates.filter(user=reference_text.user)
+    return (
+        candidates.filter(Exists(Reference.objects.filter(reference_text=OuterRef("pk"))))
+        .order_by("-created_at")
+        .first()
+    )
+
+
+@transaction.atomic
+def clone_results(source, target) -> int:
+    """
+    Копирует в target ссылки source с типами, parsed_data, статусами и проблемами.
+    Прежние ссылки target удаляются. Возвращает число скопированных ссылок.
+    """
+    Reference.objects.filter(reference_text=target).delete()
+    source_refs = list(Reference.objects.filter(reference_text=source).order_by("id"))
+    issues_by_ref = {}
+    for issue in ReferenceIssue.objects.filter(reference__in=Reference.objects.filter(reference_text=source).values("id")):
+        issues_by_ref.setdefault(issue.reference_id, []).append(issue)
+
+    clones = Reference.objects.bulk_create([
+        Reference(
+            reference_text=target,
+            raw_text=ref.raw_text,
+            normalized_text=ref.normalized_text,
+            normalized_hash=ref.normalized_hash,
+            reference_type_id=ref.reference_type_id,
+            parsed_data=ref.parsed_data,
+            year=ref.year,
+            first_author=ref.first_author,
+            journal_title=ref.journal_title,
+            publisher=ref.publisher,
+            status=ref.status,
+            parser_version=ref.parser_version,
+            template_version=ref.template_version,
+        )
+        for ref in source_refs
+    ])
+    ReferenceIssue.objects.bulk_create([
+        ReferenceIssue(reference=clone, field_name=issue.field_name, severity=issue.severity, code=issue.code, params=issue.params)
+        for ref, clone in zip(source_refs, clones)
+        for issue in issues_by_ref.get(ref.pk, [])
+    ])
+    target.status = source.status
+    target.save(update_fields=["status", "updated_at"])
+    return len(clones)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Пробная проверка правки поля шаблона (кнопка «Проверить влияние» в форме поля).
+
+Предлагаемое правило поля прогоняется по сохранённому parsed_data ссылок типа
+вместе с остальными правилами — без повторного разбора и без записи в БД.
+Сравниваются вердикты по текущим и по предлагаемым правилам: сколько ссылок
+получат ошибку, сколько её потеряют, у скольких изменится только набор проблем.
+Для больших типов берутся последние LITERA_IMPACT_SAMPLE проверенных ссылок,
+итог пересчитывается на весь тип.
+"""
+import time
+
+from django.conf import settings
+
+from .models import Reference
+from .validators import FieldRule, collect_issues, load_field_rules
+
+
+def _verdict(issues):
+    return (
+        any(issue.severity == "error" for issue in issues),
+        sorted((issue.field_name, issue.code, issue.severity) for issue in issues),
+    )
+
+
+def field_change_impact(reference_type, field) -> dict:
+    """
+    Влияние несохранённого field (новое или изменённое поле reference_type) на
+    проверенные ссылки типа: {"total", "sampled", "gain_error", "lose_error",
+    "issues_changed", "seconds"}; для выборки — ещё "estimate" с пересчётом на total.
+    """
+    started = time.perf_counter()
+    current = load_field_rules(reference_type)
+    proposed_rule = FieldRule(field.name, field.label, field.required, field.pattern)
+    proposed = [proposed_rule if rule.name == field.name else rule for rule in current]
+    if proposed_rule not in proposed:
+        proposed.append(proposed_rule)
+
+    references = Reference.objects.filter(reference_type=reference_type).exclude(status="new")
+    total = references.count()
+    limit = getattr(settings, "LITERA_IMPACT_SAMPLE", 20000)
+
+    result = {"total": total, "sampled": 0, "gain_error": 0, "lose_error": 0, "issues_changed": 0}
+    for data in references.order_by("-id").values_list("parsed_data", flat=True)[:limit].iterator():
+        data = data or {}
+        old_error, old_issues = _verdict(collect_issues(reference_type.code, reference_type.name, data, current))
+        new_error, new_issues = _verdict(collect_issues(reference_type.code, reference_type.name, data, proposed))
+        result["sampled"] += 1
+        if new_error and not old_error:
+            result["gain_error"] += 1
+        elif old_error and not new_error:
+            result["lose_error"] += 1
+        elif old_issues != new_issues:
+            result["issues_changed"] += 1
+
+    if 0 < result["sampled"] < total:
+        scale = total / result["sampled"]
+        result["estimate"] = {
+            key: round(result[key] * scale) for key in ("gain_error", "lose_error", "issues_changed")
+        }
+    result["seconds"] = time.perf_counter() - started
+    return result
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Каталог проблем проверки ссылок.
+
+ReferenceIssue хранит код проблемы и небольшие параметры (params), текст
+сообщения собирается по каталогу при показе — render(code, params).
+Новая проблема: новый код, запись в MESSAGES, при необходимости разбор
+старого текста в from_message.
+"""
+import re
+
+OTHER = 0  # текст вне каталога, целиком в params["text"]
+NO_TYPE = 1
+PARSE_FAILED = 2
+REQUIRED_MISSING = 3
+BAD_FORMAT = 4
+ONLINE_NO_ACCESS_DATE = 5
+ONLINE_NO_URL_OR_CARRIER = 6
+
+# код -> (краткое название для статистики, шаблон сообщения с {параметрами})
+MESSAGES = {
+    OTHER: ("Прочее", "{text}"),
+    NO_TYPE: ("Не выбран тип", "Не выбран тип ссылки."),
+    PARSE_FAILED: ("Не удалось распарсить", "Не удалось распарсить ссылку для типа '{type_name}'."),
+    REQUIRED_MISSING: ("Нет обязательного поля", "Отсутствует обязательное поле: {label}."),
+    BAD_FORMAT: ("Неверный формат поля", "Поле «{label}» не соответствует ожидаемому формату."),
+    ONLINE_NO_ACCESS_DATE: (
+        "Электронный ресурс без даты обращения",
+        "По шаблону «Электронный ресурс» для сетевого ресурса обязательна дата обращения: (дата обращения: ДД.ММ.ГГГГ).",
+    ),
+    ONLINE_NO_URL_OR_CARRIER: (
+        "Электронный ресурс без URL и носителя",
+        "По шаблону «Электронный ресурс» в ссылке должны быть URL (Режим доступа) или сведения о носителе (CD-ROM и т.п.). "
+        "В тексте этого нет — выбранный тип не соответствует содержанию.",
+    ),
+}
+
+
+def render(code: int, params: dict = None) -> str:
+    """Текст сообщения: render(REQUIRED_MISSING, {"label": "Год"}) -> "Отсутствует обязательное поле: Год."."""
+    _, template = MESSAGES.get(code, MESSAGES[OTHER])
+    try:
+        return template.format(**(params or {}))
+    except (KeyError, IndexError, ValueError):
+        return template
+
+
+def title(code: int) -> str:
+    """Краткое название проблемы для группировки (страница «Статистика»)."""
+    return MESSAGES.get(code, MESSAGES[OTHER])[0]
+
+
+# Шаблоны каталога с параметрами -> регулярные выражения для разбора старых текстов
+_PATTERNS = [
+    (code, re.compile(re.sub(r"\\\{(\w+)\\\}", r"(?P<\1>.*)", re.escape(template)) + r"\Z", re.S))
+    for code, (_, template) in MESSAGES.items()
+    if code != OTHER
+]
+
+
+def from_message(message: str):
+    """Код и параметры по готовому тексту сообщения (перенос старых ReferenceIssue.message)."""
+    for code, pattern in _PATTERNS:
+        match = pattern.match(message)
+        if match:
+            return code, match.groupdict() or None
+    return OTHER, {"text": message}
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Замеры скорости парсеров и проверки на синтетическом корпусе.
+
+Примеры:
+    python manage.py benchmark
+    python manage.py benchmark --only parse diagnostic --corpus-size 5000
+    python manage.py benchmark --only startup --sizes 1000   # запуск процесса: без прогрева и с прогревом
+    python manage.py benchmark --sizes 100 1000 --compare benchmarks/results/bench-20250101-120000.json
+    python manage.py benchmark --write-budgets      # новые бюджеты времени для golden-корпуса
+    python manage.py benchmark --update-golden      # expected golden-корпуса по текущим парсерам
+    python manage.py benchmark --add-golden slow-lines.json   # медленные строки (страница «Производительность»)
+
+Файл для --add-golden — выгрузка SlowLine, проверенная и обезличенная вручную:
+корпус хранится в репозитории, а SlowLine содержит тексты пользователей.
+
+Замеры с БД выполняются на отдельной тестовой БД (как в manage.py test).
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from app import metrics
+from benchmarks import golden, suite
+
+GROUPS = ("parse", "golden", "diagnostic", "dedup", "check", "view", "startup")
+
+
+class Command(BaseCommand):
+    help = "Замеры производительности парсеров, диагностики, check_reference и страницы verify."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--only", nargs="+", choices=GROUPS, default=list(GROUPS), help="Группы замеров.")
+        parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10000], help="Размеры списков для dedup/check/view (startup — наименьший).")
+        parser.add_argument("--corpus-size", type=int, default=4000, help="Строк для замеров parse/diagnostic.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Файл результатов (по умолчанию benchmarks/results/bench-<время>.json).")
+        parser.add_argument("--compare", help="Предыдущий файл результатов для сравнения.")
+        parser.add_argument("--write-budgets", action="store_true", help="Записать бюджеты времени golden-корпуса и выйти.")
+        parser.add_argument("--tolerance", type=float, help="Допуск замедления (%%) для --write-budgets.")
+        parser.add_argument("--update-golden", action="store_true", help="Обновить expected golden-корпуса и выйти.")
+        parser.add_argument(
+            "--add-golden", metavar="FILE",
+            help="Добавить в golden-корпус строки из обезличенного вручную JSON-файла выгрузки медленных строк.",
+        )
+
+    def handle(self, *args, **options):
+        if options["add_golden"] is not None:
+            self._add_golden(options["add_golden"])
+            return
+
+        if options["update_golden"]:
+            corpus = golden.load_corpus()
+            for entry, actual in golden.mismatches(corpus):
+                self.stdout.write(f"[{entry['type']}] {entry['text'][:80]}")
+                self.stdout.write(f"    было:  {entry['expected']}")
+                self.stdout.write(f"    стало: {actual}")
+            path = golden.update_expected(corpus)
+            self.stdout.write(self.style.SUCCESS(f"Обновлено: {path}"))
+            return
+
+        if options["write_budgets"]:
+            calibration_us = golden.calibrate()
+            measured = golden.measure_parsers(golden.load_corpus())
+            self.stdout.write(f"Калибровка: {calibration_us:.2f} мкс")
+            for code, values in sorted(measured.items()):
+                self.stdout.write(f"{code:<22} median {values['median_us']:>9.1f} мкс   p99 {values['p99_us']:>9.1f} мкс")
+            path = golden.write_budgets(measured, calibration_us, options["tolerance"])
+            self.stdout.write(self.style.SUCCESS(f"Бюджеты: {path}"))
+            return
+
+        groups = options["only"]
+        needs_db = bool({"check", "view", "startup"} & set(groups))
+
+        if needs_db:
+            setup_test_environment()
+            old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # Метрики замеров не попадают в снимки метрик сайта
+            with metrics.isolated():
+                document = suite.run(groups, options["sizes"], options["seed"], options["corpus_size"])
+        finally:
+            if needs_db:
+                teardown_databases(old_config, verbosity=0)
+                teardown_test_environment()
+
+        path = suite.write_results(document, options["output"])
+
+        self.stdout.write(f"{'Замер':<36}{'n':>8}{'всего, с':>12}{'в секунду':>12}{'медиана, мкс':>14}")
+        for result in document["results"]:
+            self.stdout.write(
+                f"{result['name']:<36}{result['n']:>8}{result['total_s']:>12.3f}"
+                f"{result['per_second']:>12.1f}{result.get('median_us', ''):>14}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Результаты: {path}"))
+
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as fh:
+                    previous = json.load(fh)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Не удалось прочитать {options['compare']}: {e}")
+            self.stdout.write("")
+            self.stdout.write(f"{'Замер':<36}{'было/с':>12}{'стало/с':>12}{'изм., %':>10}")
+            for name, old, new, change in suite.compare(previous, document):
+                line = f"{name:<36}{old:>12.1f}{new:>12.1f}{change:>10.1f}"
+                self.stdout.write(self.style.ERROR(line) if change < -10 else line)
+
+    def _add_golden(self, path: str) -> None:
+        try:
+            with open(path, encoding="utf-8") as fh:
+                entries = json.load(fh)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Не удалось прочитать {path}: {e}")
+        added = golden.add_entries(golden.load_corpus(), entries)
+        self.stdout.write(self.style.SUCCESS(f"Добавлено строк: {added} из {len(entries)} ({golden.CORPUS_PATH})"))
+        if added:
+            self.stdout.write("Обновите бюджеты времени: python manage.py benchmark --write-budgets")
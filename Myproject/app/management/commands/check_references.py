@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+Пакетная проверка списков ссылок из текстовых файлов (без веб-интерфейса).
+
+Примеры:
+    python manage.py check_references archive/ --output report.json
+    python manage.py check_references a.txt b.txt --type BOOK --format csv --output report.csv
+    python manage.py check_references archive/ --save --user operator1
+
+Прогресс сохраняется в <output>.state.json: повторный запуск с теми же
+аргументами пропускает уже обработанные файлы. Файл отмечается обработанным
+после сохранения в БД (--save), а запись отчёта в <output>.partial.jsonl
+дописывается после этого: прерванный запуск не сохраняет файл дважды, а файл
+без записи отчёта при продолжении проверяется заново без сохранения.
+Файлы, которые не читаются в кодировке --encoding, пропускаются с сообщением.
+"""
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from app import issue_codes, stats
+from app.batch import check_chunk, init_worker, load_rules_for_workers, write_json_atomic
+from app.models import Reference, ReferenceIssue, ReferenceText, ReferenceType
+from app.parsers import PARSER_VERSION, PARSERS_BY_TYPE
+from app.utils import key_fields, normalized_fields, split_reference_lines
+from app.validators import Issue, build_issue_objects, template_versions
+
+
+class Command(BaseCommand):
+    help = "Проверка списков ссылок из файлов или каталога в нескольких процессах с отчётом JSON/CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Файлы .txt или каталоги (ищутся *.txt рекурсивно).")
+        parser.add_argument("--type", default="auto", help="Код типа для всех строк или auto (по умолчанию).")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Число рабочих процессов.")
+        parser.add_argument("--chunk-size", type=int, default=200, help="Строк в одной задаче пула.")
+        parser.add_argument("--format", choices=("json", "csv"), default="json")
+        parser.add_argument("--output", default="check_references_report.json", help="Файл отчёта.")
+        parser.add_argument("--encoding", default="utf-8-sig", help="Кодировка входных файлов.")
+        parser.add_argument("--save", action="store_true", help="Сохранить каждый файл как ReferenceText с результатами.")
+        parser.add_argument("--user", help="Имя пользователя-владельца сохраняемых ReferenceText.")
+        parser.add_argument("--restart", action="store_true", help="Игнорировать сохранённый прогресс.")
+
+    def handle(self, *args, **options):
+        type_code = None if options["type"] == "auto" else options["type"]
+        if type_code is not None and type_code not in PARSERS_BY_TYPE:
+            raise CommandError(f"Неизвестный тип {type_code}. Доступны: {', '.join(PARSERS_BY_TYPE)} или auto.")
+
+        owner = None
+        if options["user"]:
+            try:
+                owner = get_user_model().objects.get(username=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Пользователь {options['user']} не найден.")
+
+        files = self._collect_files(options["paths"])
+        if not files:
+            raise CommandError("Не найдено ни одного файла для проверки.")
+
+        output = Path(options["output"])
+        state_path = output.with_name(output.name + ".state.json")
+        partial_path = output.with_name(output.name + ".partial.jsonl")
+        state = {"done": {}, "stats": {}}
+        if state_path.exists() and not options["restart"]:
+            with open(state_path, encoding="utf-8") as fh:
+                state = json.load(fh)
+        elif partial_path.exists():
+            partial_path.unlink()
+
+        reported = self._load_partial(partial_path, state)
+        pending = [f for f in files if str(f) not in state["done"]]
+        # Прерывание между записью состояния и отчёта: файл обработан, но в отчёте его нет
+        unreported = [f for f in files if str(f) in state["done"] and str(f) not in reported]
+        if len(pending) < len(files):
+            self.stdout.write(f"Продолжение: пропущено уже обработанных файлов — {len(files) - len(pending)}.")
+
+        started = time.perf_counter()
+        lines_this_run = 0
+        self._skipped = []
+        if pending or unreported:
+            rules_by_type, type_names = load_rules_for_workers()
+            for path, results in self._run(pending + unreported, type_code, rules_by_type, type_names, options):
+                if str(path) not in state["done"]:
+                    if options["save"]:
+                        self._save_file(path, results, owner, state, state_path)
+                    for result in results:
+                        type_stats = state["stats"].setdefault(result["type"] or "—", {"lines": 0, "seconds": 0.0})
+                        type_stats["lines"] += 1
+                        type_stats["seconds"] += result["parse_seconds"]
+                    state["done"][str(path)] = {"lines": len(results)}
+                    state["saving"] = None
+                    write_json_atomic(state_path, state)
+                    lines_this_run += len(results)
+                self._append_report(partial_path, path, results)
+                self.stdout.write(f"  {path}: {len(results)} строк")
+
+        self._write_report(partial_path, output, options["format"])
+        elapsed = time.perf_counter() - started
+        self._print_stats(state["stats"], lines_this_run, elapsed)
+        if self._skipped:
+            self.stderr.write(
+                f"Пропущено файлов, не прочитанных в кодировке {options['encoding']}: {len(self._skipped)} "
+                f"(укажите --encoding и запустите снова)."
+            )
+
+        state_path.unlink(missing_ok=True)
+        partial_path.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(f"Отчёт: {output}"))
+
+    def _collect_files(self, paths):
+        files = []
+        for raw in paths:
+            path = Path(raw)
+            if path.is_dir():
+                files.extend(sorted(p for p in path.rglob("*.txt") if p.is_file()))
+            elif path.is_file():
+                files.append(path)
+            else:
+                raise CommandError(f"Путь не найден: {raw}")
+        return files
+
+    def _run(self, files, type_code, rules_by_type, type_names, options):
+        """Генератор (файл, результаты по строкам) по мере готовности всех пачек файла."""
+        chunk_size = max(1, options["chunk_size"])
+        texts = {}
+        chunks = []
+        for file_idx, path in enumerate(files):
+            try:
+                text = path.read_text(encoding=options["encoding"])
+            except UnicodeDecodeError as e:
+                self._skipped.append(path)
+                self.stderr.write(f"  {path}: пропущен — не читается в кодировке {options['encoding']} ({e.reason}, байт {e.start})")
+                continue
+            texts[file_idx] = text
+            lines = split_reference_lines(text)
+            if not lines:
+                chunks.append((file_idx, []))
+            for start in range(0, len(lines), chunk_size):
+                chunks.append((file_idx, [(file_idx, no, t) for no, t in lines[start:start + chunk_size]]))
+        self._texts = {files[idx]: text for idx, text in texts.items()}
+
+        remaining = {}
+        for file_idx, _ in chunks:
+            remaining[file_idx] = remaining.get(file_idx, 0) + 1
+        collected = {idx: [] for idx in remaining}
+
+        def finish(file_idx, results):
+            collected[file_idx].extend(results)
+            remaining[file_idx] -= 1
+            if remaining[file_idx] == 0:
+                return files[file_idx], sorted(collected.pop(file_idx), key=lambda r: r["line"])
+            return None
+
+        if options["workers"] <= 1:
+            init_worker(rules_by_type, type_names)
+            for file_idx, chunk in chunks:
+                done = finish(file_idx, check_chunk(chunk, type_code))
+                if done:
+                    yield done
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=options["workers"],
+            initializer=init_worker,
+            initargs=(rules_by_type, type_names),
+        ) as pool:
+            futures = {pool.submit(check_chunk, chunk, type_code): file_idx for file_idx, chunk in chunks}
+            for future in as_completed(futures):
+                done = finish(futures[future], future.result())
+                if done:
+                    yield done
+
+    def _load_partial(self, partial_path, state) -> set:
+        """
+        Файлы с записью в частичном отчёте. Оставляет только целые записи обработанных
+        файлов (обрывок последней строки после прерывания отбрасывается).
+        """
+        if not partial_path.exists():
+            return set()
+        entries = {}
+        with open(partial_path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if entry["file"] in state["done"]:
+                    entries.setdefault(entry["file"], line if line.endswith("\n") else line + "\n")
+        tmp = partial_path.with_name(partial_path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.writelines(entries.values())
+        os.replace(tmp, partial_path)
+        return set(entries)
+
+    def _append_report(self, partial_path, path, results):
+        with open(partial_path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps({"file": str(path), "lines": results}, ensure_ascii=False) + "\n")
+
+    def _save_file(self, path, results, owner, state, state_path):
+        """
+        Сохраняет файл как ReferenceText с результатами одной транзакцией. Перед ней
+        в состояние пишется отметка saving: если прерывание пришлось между фиксацией
+        транзакции и записью состояния, при продолжении найденный список не создаётся снова.
+        """
+        text = self._texts[path]
+        saving = state.get("saving")
+        if saving and saving["file"] == str(path):
+            if ReferenceText.objects.filter(
+                pk__gt=saving["after_id"], title=path.name[:255], input_text=text, user=owner,
+            ).exists():
+                return
+        state["saving"] = {"file": str(path), "after_id": ReferenceText.objects.aggregate(last=Max("id"))["last"] or 0}
+        write_json_atomic(state_path, state)
+
+        types = {t.code: t for t in ReferenceType.objects.all()}
+        versions = template_versions()
+        with transaction.atomic(), stats.batch(user_id=owner.pk if owner else None):
+            reference_text = ReferenceText.objects.create(
+                title=path.name[:255],
+                input_text=text,
+                user=owner,
+            )
+            issues = []
+            for result in results:
+                ref = Reference.objects.create(
+                    reference_text=reference_text,
+                    raw_text=result["text"],
+                    reference_type=types.get(result["type"]),
+                    parsed_data=result["parsed_data"],
+                    status=result["status"],
+                    **normalized_fields(result["text"]),
+                    **key_fields(result["parsed_data"]),
+                    parser_version=PARSER_VERSION,
+                    template_version=versions.get(types[result["type"]].pk if result["type"] in types else None),
+                )
+                ref_issues = [Issue(*issue) for issue in result["issues"]]
+                stats.count_check(ref, result["type"], ref_issues)
+                issues.extend(build_issue_objects(ref, ref_issues))
+            ReferenceIssue.objects.bulk_create(issues)
+
+    def _write_report(self, partial_path, output, fmt):
+        entries = []
+        if partial_path.exists():
+            with open(partial_path, encoding="utf-8") as fh:
+                entries = [json.loads(line) for line in fh if line.strip()]
+
+        if fmt == "json":
+            for entry in entries:
+                for result in entry["lines"]:
+                    result.pop("key", None)
+                    result["issues"] = [
+                        [field_name, severity, issue_codes.render(code, params)]
+                        for field_name, severity, code, params in result["issues"]
+                    ]
+            write_json_atomic(output, entries)
+            return
+
+        with open(output, "w", encoding="utf-8-sig", newline="") as fh:
+            writer = csv.writer(fh, delimiter=";")
+            writer.writerow(["file", "line", "type", "status", "field", "severity", "message", "text"])
+            for entry in entries:
+                for result in entry["lines"]:
+                    issues = [
+                        (field_name, severity, issue_codes.render(code, params))
+                        for field_name, severity, code, params in result["issues"]
+                    ] or [("", "", "")]
+                    for field_name, severity, message in issues:
+                        writer.writerow([
+                            entry["file"], result["line"], result["type"] or "", result["status"],
+                            field_name, severity, message, result["text"],
+                        ])
+
+    def _print_stats(self, stats, lines_this_run, elapsed):
+        self.stdout.write("")
+        # Скорость по типам — по времени самого разбора в процессах; общая — по времени всего запуска
+        self.stdout.write(f"{'Тип':<22}{'строк':>10}{'строк/с разбора':>18}")
+        total_lines = 0
+        for code in sorted(stats):
+            item = stats[code]
+            total_lines += item["lines"]
+            rate = item["lines"] / item["seconds"] if item["seconds"] else 0.0
+            self.stdout.write(f"{code:<22}{item['lines']:>10}{rate:>18.0f}")
+        self.stdout.write(f"{'Всего':<22}{total_lines:>10}")
+        if elapsed > 0 and lines_this_run:
+            self.stdout.write(
+                f"За этот запуск: {lines_this_run} строк за {elapsed:.1f} с "
+                f"({lines_this_run / elapsed:.0f} строк/с: чтение, разбор, проверка и сохранение во всех процессах)."
+            )
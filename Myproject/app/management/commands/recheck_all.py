@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Перепроверка сохранённых ссылок после обновления парсеров или шаблонов.
+
+Примеры:
+    python manage.py recheck_all --stale-only
+    python manage.py recheck_all --type BOOK --type ARTICLE_JOURNAL --workers 4
+    python manage.py recheck_all --parser-version 1 --since 2025-09-01
+
+Ссылки читаются порциями по возрастанию id (id > последнего обработанного),
+разбираются в пуле процессов (app/batch.py), результат порции записывается
+одной короткой транзакцией: массовые UPDATE ссылок и вставка/изменение/удаление
+только разницы проблем. Длинной блокировки записи нет — сайт работает во время
+перепроверки. Прогресс хранится в --state: повторный запуск с теми же фильтрами
+продолжает с места остановки.
+
+Перепроверяются уже проверенные ссылки с выбранным типом: вердикт ссылки без
+типа от парсеров и шаблонов не зависит, ещё не проверенные (status="new")
+проверит сайт.
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Max
+
+from app import metrics, page_cache, stats
+from app.batch import check_chunk, init_worker, load_rules_for_workers, write_json_atomic
+from app.models import Reference, ReferenceIssue, ReferenceType
+from app.validators import (
+    RESULT_FIELDS, Issue, apply_result, build_issue_objects, diff_issues, stale_q, template_versions, verdict_changed,
+)
+
+
+class Command(BaseCommand):
+    help = "Перепроверка сохранённых ссылок порциями в нескольких процессах с продолжением после прерывания."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--type", action="append", default=[], help="Код типа (можно несколько раз); по умолчанию все.")
+        parser.add_argument("--stale-only", action="store_true", help="Только ссылки, проверенные другой версией парсеров или шаблона.")
+        parser.add_argument("--parser-version", default="", help="Только ссылки, проверенные этой версией парсеров.")
+        parser.add_argument("--since", type=date.fromisoformat, help="Списки, созданные не раньше даты (ГГГГ-ММ-ДД).")
+        parser.add_argument("--until", type=date.fromisoformat, help="Списки, созданные не позже даты (ГГГГ-ММ-ДД).")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Число рабочих процессов.")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Ссылок в одной транзакции записи.")
+        parser.add_argument("--state", default="recheck_all.state.json", help="Файл прогресса.")
+        parser.add_argument("--restart", action="store_true", help="Начать заново, не продолжая прерванный запуск.")
+
+    def handle(self, *args, **options):
+        types = {t.code: t for t in ReferenceType.objects.all()}
+        unknown = [code for code in options["type"] if code not in types]
+        if unknown:
+            raise CommandError(f"Неизвестный тип ссылки: {', '.join(unknown)}")
+
+        versions = template_versions()
+        filters = {
+            "type": sorted(options["type"]),
+            "stale_only": options["stale_only"],
+            "parser_version": options["parser_version"],
+            "since": options["since"].isoformat() if options["since"] else None,
+            "until": options["until"].isoformat() if options["until"] else None,
+        }
+        queryset = self._queryset(filters, versions)
+
+        state_path = Path(options["state"])
+        state = None
+        if state_path.exists() and not options["restart"]:
+            with open(state_path, encoding="utf-8") as fh:
+                state = json.load(fh)
+            if state["filters"] != filters:
+                raise CommandError(
+                    f"{state_path} хранит прогресс запуска с другими фильтрами; повторите их или добавьте --restart."
+                )
+            self.stdout.write(f"Продолжение с id > {state['last_id']}.")
+        if state is None:
+            # Верхняя граница фиксируется при старте: ссылки, добавленные позже, проверит сайт
+            state = {
+                "filters": filters,
+                "last_id": 0,
+                "max_id": queryset.aggregate(max_id=Max("id"))["max_id"] or 0,
+                "stats": {},
+            }
+
+        chunk_size = max(1, options["chunk_size"])
+        workers = max(1, options["workers"])
+        rules_by_type, type_names = load_rules_for_workers()
+        pool = None
+        if workers > 1:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(rules_by_type, type_names))
+        else:
+            init_worker(rules_by_type, type_names)
+
+        started = time.perf_counter()
+        checked_this_run = 0
+        try:
+            while True:
+                rows = list(
+                    queryset.filter(id__gt=state["last_id"], id__lte=state["max_id"])
+                    .order_by("id")
+                    .values_list("id", "raw_text", "reference_type__code")[:chunk_size]
+                )
+                if not rows:
+                    break
+                results = self._check(rows, pool, workers)
+                self._store(rows, results, versions, state["stats"])
+                state["last_id"] = rows[-1][0]
+                write_json_atomic(state_path, state)
+                checked_this_run += len(rows)
+                self.stdout.write(f"  id ≤ {state['last_id']}: {checked_this_run} ссылок, {time.perf_counter() - started:.1f} с")
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        self._print_stats(state["stats"], checked_this_run, time.perf_counter() - started)
+        state_path.unlink(missing_ok=True)
+
+    def _queryset(self, filters, versions):
+        queryset = Reference.objects.exclude(status="new").filter(reference_type__isnull=False)
+        if filters["type"]:
+            queryset = queryset.filter(reference_type__code__in=filters["type"])
+        if filters["parser_version"]:
+            queryset = queryset.filter(parser_version=filters["parser_version"])
+        if filters["since"]:
+            queryset = queryset.filter(reference_text__created_at__date__gte=filters["since"])
+        if filters["until"]:
+            queryset = queryset.filter(reference_text__created_at__date__lte=filters["until"])
+        if filters["stale_only"]:
+            queryset = queryset.filter(stale_q(versions))
+        return queryset
+
+    def _check(self, rows, pool, workers):
+        """Разбор и проверка порции: {id ссылки: результат check_line}."""
+        by_type = {}
+        for ref_id, raw_text, type_code in rows:
+            by_type.setdefault(type_code, []).append((ref_id, 0, raw_text))
+
+        pieces = []
+        piece_size = max(1, -(-len(rows) // workers))
+        for type_code, items in by_type.items():
+            for start in range(0, len(items), piece_size):
+                pieces.append((items[start:start + piece_size], type_code))
+
+        if pool is None:
+            chunks = [check_chunk(piece, type_code) for piece, type_code in pieces]
+        else:
+            futures = [pool.submit(check_chunk, piece, type_code) for piece, type_code in pieces]
+            chunks = [future.result() for future in as_completed(futures)]
+        return {result["key"]: result for chunk in chunks for result in chunk}
+
+    def _store(self, rows, results, versions, type_stats):
+        """Запись результатов порции одной транзакцией; в type_stats — сводка по типам."""
+        ids = [row[0] for row in rows]
+        with transaction.atomic(), stats.batch():
+            # Перечитать под транзакцией: ссылки, изменённые или удалённые после разбора, пропускаются
+            references = {
+                ref.pk: ref
+                for ref in Reference.objects.filter(pk__in=ids)
+                .annotate(owner_id=F("reference_text__user_id"))
+                .only("id", "raw_text", "reference_text_id", "reference_type_id", *RESULT_FIELDS)
+            }
+            stored = {}
+            for issue in ReferenceIssue.objects.filter(reference_id__in=ids):
+                stored.setdefault(issue.reference_id, []).append(issue)
+
+            changed_refs, to_create, to_update, to_delete, touched = [], [], [], [], set()
+            for ref_id, raw_text, type_code in rows:
+                ref = references.get(ref_id)
+                if ref is None or ref.raw_text != raw_text:
+                    continue
+                result = results[ref_id]
+                issues = [Issue(*issue) for issue in result["issues"]]
+                old_status = ref.status
+
+                changed_fields = apply_result(ref, result["parsed_data"], issues, versions.get(ref.reference_type_id))
+                created, updated, deleted = diff_issues(stored.get(ref_id, []), issues)
+                to_create.extend(build_issue_objects(ref, created))
+                to_update.extend(updated)
+                to_delete.extend(deleted)
+                if changed_fields:
+                    changed_refs.append(ref)
+
+                counts = type_stats.setdefault(type_code, {"checked": 0, "changed": 0, "to_ok": 0, "to_error": 0})
+                counts["checked"] += 1
+                metrics.REFERENCES_CHECKED.inc(ref.status)
+                # Новые версии записываются, но изменением результата не считаются
+                changed = bool(verdict_changed(changed_fields) or created or updated or deleted)
+                if changed:
+                    counts["changed"] += 1
+                    touched.add(ref.reference_text_id)
+                stats.count_check(ref, type_code, issues, user_id=ref.owner_id, changed=changed)
+                if ref.status != old_status:
+                    counts["to_ok" if ref.status == "ok" else "to_error"] += 1
+
+            if changed_refs:
+                Reference.objects.bulk_update(changed_refs, RESULT_FIELDS, batch_size=500)
+            if to_delete:
+                ReferenceIssue.objects.filter(pk__in=to_delete).delete()
+            if to_update:
+                ReferenceIssue.objects.bulk_update(to_update, ["params"], batch_size=500)
+            if to_create:
+                ReferenceIssue.objects.bulk_create(to_create, batch_size=500)
+                for issue in to_create:
+                    metrics.ISSUES_CREATED.inc(issue.severity)
+            # Новая версия у страниц списков, где что-то изменилось (app/page_cache.py)
+            page_cache.touch(touched)
+
+    def _print_stats(self, type_stats, checked_this_run, elapsed):
+        if not type_stats:
+            self.stdout.write("Нет ссылок для перепроверки.")
+            return
+        self.stdout.write(f"Проверено ссылок: {checked_this_run} за {elapsed:.1f} с (в этом запуске).")
+        self.stdout.write(f"{'Тип':<24} {'проверено':>10} {'изменилось':>11} {'→ ok':>7} {'→ error':>8}")
+        for type_code, counts in sorted(type_stats.items()):
+            self.stdout.write(
+                f"{type_code:<24} {counts['checked']:>10} {counts['changed']:>11} "
+                f"{counts['to_ok']:>7} {counts['to_error']:>8}"
+            )
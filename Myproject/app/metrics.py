@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики в текстовом формате Prometheus (страница /metrics).
+
+Каждый процесс (воркер gunicorn) считает метрики в памяти и не чаще раза в
+LITERA_METRICS_FLUSH_SECONDS записывает снимок в LITERA_METRICS_DIR/metrics-<id>.json
+(атомарно: временный файл + os.replace); id уникален для процесса, а не только pid,
+который ОС может выдать снова. /metrics суммирует снимки всех процессов, поэтому
+счётчики не теряются при перезапуске воркеров и не зависят от того, какой воркер
+обслужил запрос мониторинга.
+
+Пока процесс жив, он держит flock на metrics-<id>.lock. Снимки процессов, чья
+блокировка свободна, при сборке переносятся в metrics-retired.json и удаляются
+(_prune): файлы не копятся при перезапусках воркеров по max_requests. Значения
+Gauge (текущее состояние процесса, например длина очереди) при этом отбрасываются:
+в сумму идут только живые процессы. Без fcntl (Windows) снимки не переносятся.
+
+Число разобранных ссылок по типам — litera_parse_duration_seconds_count{type}.
+"""
+import atexit
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+_lock = threading.Lock()
+_registry = {}  # имя -> метрика, в порядке объявления
+_last_flush = 0.0
+_dirty = False
+_process_id = None  # часть имени файла снимка, см. _process_path
+_held_locks = {}  # каталог -> открытый metrics-<id>.lock этого процесса
+
+RETIRED = "metrics-retired.json"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # значения меток -> число
+        _registry[name] = self
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        global _dirty
+        with _lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+            _dirty = True
+
+    def snapshot(self) -> dict:
+        return {json.dumps(list(k), ensure_ascii=False): v for k, v in self.values.items()}
+
+    @staticmethod
+    def merge(total: dict, part: dict) -> None:
+        for key, value in part.items():
+            total[key] = total.get(key, 0) + value
+
+    def render(self, merged: dict) -> list:
+        lines = []
+        for key, value in sorted(merged.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, json.loads(key))} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """Текущее значение в процессе (set); по процессам суммируется, как Counter."""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labelvalues) -> None:
+        global _dirty
+        with _lock:
+            self.values[labelvalues] = value
+            _dirty = True
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # значения меток -> [счётчики корзин..., +Inf, сумма]
+        _registry[name] = self
+
+    def observe(self, value: float, *labelvalues) -> None:
+        global _dirty
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            item = self.values.get(labelvalues)
+            if item is None:
+                item = self.values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            item[index] += 1
+            item[-1] += value
+            _dirty = True
+
+    def snapshot(self) -> dict:
+        return {json.dumps(list(k), ensure_ascii=False): list(v) for k, v in self.values.items()}
+
+    @staticmethod
+    def merge(total: dict, part: dict) -> None:
+        for key, value in part.items():
+            current = total.get(key)
+            if current is None:
+                total[key] = list(value)
+            elif len(current) == len(value):
+                total[key] = [a + b for a, b in zip(current, value)]
+
+    def render(self, merged: dict) -> list:
+        lines = []
+        for key, value in sorted(merged.items()):
+            if len(value) != len(self.buckets) + 2:
+                continue  # снимок со старыми границами корзин
+            labelvalues = json.loads(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, value):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [('le', repr(bound))])} {cumulative}")
+            cumulative += value[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {value[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+_FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+_SLOW_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+PARSE_SECONDS = Histogram(
+    "litera_parse_duration_seconds", "Время разбора одной ссылки парсером по типам.", ["type"], _FAST_BUCKETS,
+)
+PARSE_RESULTS = Counter(
+    "litera_parse_results_total", "Результаты разбора: success — поля извлечены, failure — нет.", ["type", "result"],
+)
+REFERENCES_CHECKED = Counter(
+    "litera_references_checked_total", "Проверенные ссылки по итоговому статусу.", ["status"],
+)
+ISSUES_CREATED = Counter(
+    "litera_issues_created_total", "Созданные замечания по серьёзности.", ["severity"],
+)
+CHECK_ALL_SECONDS = Histogram(
+    "litera_check_all_duration_seconds", "Время действия «Проверить» для всего списка.", (), _SLOW_BUCKETS,
+)
+HTTP_SECONDS = Histogram(
+    "litera_http_request_duration_seconds", "Время обработки HTTP-запроса по представлениям.", ["view"], _SLOW_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "litera_cache_requests_total", "Обращения к кэшам приложения: hit / miss.", ["cache", "result"],
+)
+SHADOW_QUEUED = Counter(
+    "litera_shadow_queued_total", "Строки, поставленные в очередь теневого разбора, по типам.", ["type"],
+)
+SHADOW_DROPPED = Counter(
+    "litera_shadow_dropped_total", "Строки доли теневого разбора, пропущенные из-за полной очереди, по типам.", ["type"],
+)
+SHADOW_QUEUE_DEPTH = Gauge(
+    "litera_shadow_queue_depth", "Строк в очереди теневого разбора (сумма по процессам).",
+)
+
+
+def metrics_dir() -> Path:
+    return Path(getattr(settings, "LITERA_METRICS_DIR", None) or Path(tempfile.gettempdir()) / "litera-metrics")
+
+
+def _process_path(directory: Path) -> Path:
+    """Файл снимка этого процесса; при первом обращении к каталогу захватывает блокировку процесса."""
+    global _process_id
+    if _process_id is None:
+        _process_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    path = directory / f"metrics-{_process_id}.json"
+    if fcntl is not None and directory not in _held_locks:
+        fh = open(path.with_suffix(".lock"), "a")
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        _held_locks[directory] = fh
+    return path
+
+
+def _write_json(path: Path, payload) -> None:
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(merged: dict, snapshot: dict, gauges: bool = True) -> None:
+    for name, values in snapshot.items():
+        metric = _registry.get(name)
+        if metric is not None and (gauges or metric.kind != "gauge"):
+            metric.merge(merged.setdefault(name, {}), values)
+
+
+def flush(force: bool = False) -> None:
+    """Записывает снимок метрик процесса, если с прошлой записи прошло LITERA_METRICS_FLUSH_SECONDS."""
+    global _last_flush, _dirty
+    now = time.monotonic()
+    if not _dirty or (not force and now - _last_flush < getattr(settings, "LITERA_METRICS_FLUSH_SECONDS", 1.0)):
+        return
+    with _lock:
+        snapshot = {name: metric.snapshot() for name, metric in _registry.items()}
+        _dirty = False
+        _last_flush = now
+    directory = metrics_dir()
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        _write_json(_process_path(directory), snapshot)
+    except OSError:
+        _dirty = True
+
+
+atexit.register(flush, True)
+
+
+def _prune(directory: Path) -> None:
+    """Снимки завершившихся процессов (их блокировка свободна) — в metrics-retired.json."""
+    if fcntl is None:
+        return
+    with open(directory / "prune.lock", "a") as guard:
+        fcntl.flock(guard, fcntl.LOCK_EX)
+        retired = _read_json(directory / RETIRED) or {}
+        finished = []
+        for path in directory.glob("metrics-*.json"):
+            if path.name == RETIRED:
+                continue
+            with open(path.with_suffix(".lock"), "a") as fh:
+                try:
+                    fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # процесс жив
+                _merge(retired, _read_json(path) or {}, gauges=False)
+                finished.append(path)
+        if not finished:
+            return
+        _write_json(directory / RETIRED, retired)
+        for path in finished:
+            path.unlink(missing_ok=True)
+            path.with_suffix(".lock").unlink(missing_ok=True)
+
+
+def collect() -> dict:
+    """Сумма снимков всех процессов, включая завершившиеся: имя -> {метки: значение}."""
+    flush(force=True)
+    directory = metrics_dir()
+    merged = {name: {} for name in _registry}
+    if not directory.is_dir():
+        return merged
+    try:
+        _prune(directory)
+    except OSError:
+        pass
+    for path in sorted(directory.glob("metrics-*.json")):
+        _merge(merged, _read_json(path) or {})
+    return merged
+
+
+def _after_fork() -> None:
+    """В дочернем процессе (воркер gunicorn после preload): свой id и пустые метрики — значения мастера считает мастер."""
+    global _process_id, _dirty
+    _process_id = None
+    for fh in _held_locks.values():
+        fh.close()
+    _held_locks.clear()
+    for metric in _registry.values():
+        metric.values.clear()
+    _dirty = False
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+@contextmanager
+def isolated():
+    """
+    Снимки метрик — во временный каталог на время блока (тесты, замеры), на выходе
+    значения процесса сбрасываются: общий каталог сайта не получает тестовых данных.
+    """
+    global _dirty
+    from django.test.utils import override_settings
+
+    with tempfile.TemporaryDirectory(prefix="litera-metrics-") as directory, override_settings(LITERA_METRICS_DIR=directory):
+        try:
+            yield Path(directory)
+        finally:
+            held = _held_locks.pop(Path(directory), None)
+            if held is not None:
+                held.close()
+            with _lock:
+                for metric in _registry.values():
+                    metric.values.clear()
+                _dirty = False
+
+
+def render() -> str:
+    """Текст для /metrics в формате Prometheus 0.0.4."""
+    merged = collect()
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f"# HELP {name} {metric.help_text}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        lines.extend(metric.render(merged[name]))
+    return "\n".join(lines) + "\n"
+
+
+def observe_parse(type_code: str, seconds: float, success: bool) -> None:
+    PARSE_SECONDS.observe(seconds, type_code)
+    PARSE_RESULTS.inc(type_code, "success" if success else "failure")
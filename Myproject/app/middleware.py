@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+import cProfile
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, perf, profiling
+
+logger = logging.getLogger("litera.perf")
+
+
+class PerformanceMiddleware:
+    """
+    Замеры запроса: общее время, число и время SQL, парсинг по типам, проверка,
+    рендер шаблонов. Каждый запрос — одна JSON-строка в логгер litera.perf
+    (в консоль — при LITERA_PERF_LOG=1, см. core/settings.py);
+    запросы медленнее LITERA_PERF_RECORD_MS сохраняются в PerfRecord для
+    страницы «Производительность». Время запроса по представлениям также
+    попадает в метрики /metrics (app/metrics.py) — независимо от LITERA_PERF_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "LITERA_PERF_ENABLED", True)
+        self.record_ms = getattr(settings, "LITERA_PERF_RECORD_MS", 200)
+        self.keep = getattr(settings, "LITERA_PERF_KEEP", 5000)
+        self.slow_lines_limit = getattr(settings, "LITERA_PERF_SLOW_LINES", 10)
+
+    def __call__(self, request):
+        if not self.enabled:
+            started = time.perf_counter()
+            response = self.get_response(request)
+            self._observe(request, time.perf_counter() - started)
+            return response
+
+        stats, token = perf.start_request(self.slow_lines_limit)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(stats.sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            perf.finish_request(token)
+        elapsed = time.perf_counter() - started
+        perf.save_slow_lines(stats)
+        self._observe(request, elapsed)
+        total_ms = elapsed * 1000
+
+        match = getattr(request, "resolver_match", None)
+        payload = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else "",
+            "status": response.status_code,
+            "user_id": request.user.pk if getattr(request, "user", None) and request.user.is_authenticated else None,
+            "total_ms": round(total_ms, 2),
+            **stats.as_dict(),
+        }
+        logger.info(json.dumps(payload, ensure_ascii=False))
+
+        if total_ms >= self.record_ms:
+            self._store(payload, stats)
+        return response
+
+    @staticmethod
+    def _observe(request, seconds: float) -> None:
+        match = getattr(request, "resolver_match", None)
+        metrics.HTTP_SECONDS.observe(seconds, match.view_name if match else "")
+        metrics.flush()
+
+    def _store(self, payload: dict, stats) -> None:
+        from .models import PerfRecord
+
+        try:
+            record = PerfRecord.objects.create(
+                method=payload["method"],
+                path=payload["path"][:255],
+                view_name=payload["view"][:128],
+                status_code=payload["status"],
+                user_id=payload["user_id"],
+                total_ms=payload["total_ms"],
+                sql_count=payload["sql_count"],
+                sql_ms=payload["sql_ms"],
+                parse_ms=payload["parse_ms"],
+                check_ms=payload["check_ms"],
+                validate_ms=payload["validate_ms"],
+                render_ms=payload["render_ms"],
+                details={"parse_by_type": payload["parse_by_type"], "slow_lines": stats.slow_lines()},
+            )
+            # Таблица ограничена: храним последние LITERA_PERF_KEEP записей
+            if record.pk % 100 == 0:
+                PerfRecord.objects.filter(pk__lte=record.pk - self.keep).delete()
+        except Exception as e:
+            logger.error(f"Не удалось сохранить замер запроса: {e}")
+
+
+class ProfilerMiddleware:
+    """
+    cProfile для выбранных запросов (см. app/profiling.py). Ставится после
+    AuthenticationMiddleware: выбор по заголовку и параметру зависит от роли.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        options = profiling.get_settings()
+        trigger = profiling.trigger_for(request, options) if options and options.enabled else None
+        if trigger is None:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Уже работает другой профилировщик (например, отладчик)
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        if trigger != "auto" or duration_ms >= options.auto_threshold_ms:
+            try:
+                profiling.save_capture(request, profiler, trigger, duration_ms, options.keep)
+            except Exception as e:
+                logger.error(f"Не удалось сохранить профиль запроса: {e}")
+        return response
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.26 on 2026-10-19 09:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('app', '0012_online_physical_carrier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Создано')),
+                ('method', models.CharField(max_length=8, verbose_name='Метод')),
+                ('path', models.CharField(max_length=255, verbose_name='Путь')),
+                ('view_name', models.CharField(blank=True, max_length=128, verbose_name='Представление')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('total_ms', models.FloatField(verbose_name='Всего, мс')),
+                ('sql_count', models.PositiveIntegerField(default=0, verbose_name='SQL-запросов')),
+                ('sql_ms', models.FloatField(default=0, verbose_name='SQL, мс')),
+                ('parse_ms', models.FloatField(default=0, verbose_name='Парсинг, мс')),
+                ('check_ms', models.FloatField(default=0, verbose_name='Проверка, мс')),
+                ('validate_ms', models.FloatField(default=0, verbose_name='Правила полей, мс')),
+                ('render_ms', models.FloatField(default=0, verbose_name='Шаблоны, мс')),
+                ('details', models.JSONField(blank=True, default=dict, verbose_name='Подробности')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Замер запроса',
+                'verbose_name_plural': 'Замеры запросов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
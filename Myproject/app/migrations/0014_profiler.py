@@ -0,0 +1,53 @@
+# Generated by Django 4.2.26 on 2026-10-19 09:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('app', '0013_perfrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfilerSettings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enabled', models.BooleanField(default=False, verbose_name='Профилирование включено')),
+                ('allow_header', models.BooleanField(default=True, help_text='Запросы operator/admin с заголовком X-Litera-Profile: 1.', verbose_name='По заголовку X-Litera-Profile')),
+                ('allow_url_flag', models.BooleanField(default=True, help_text='Только для admin.', verbose_name='По параметру ?profile=1')),
+                ('auto_threshold_ms', models.PositiveIntegerField(default=0, help_text='0 — выключено. Иначе профилируются все запросы с путём из «Префикс пути», сохраняются — медленнее порога.', verbose_name='Порог автозахвата, мс')),
+                ('auto_path_prefix', models.CharField(default='/check-list/', max_length=255, verbose_name='Префикс пути для автозахвата')),
+                ('keep', models.PositiveIntegerField(default=50, verbose_name='Хранить профилей')),
+            ],
+            options={
+                'verbose_name': 'Настройки профилировщика',
+                'verbose_name_plural': 'Настройки профилировщика',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfileCapture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('method', models.CharField(max_length=8, verbose_name='Метод')),
+                ('path', models.CharField(max_length=255, verbose_name='Путь')),
+                ('trigger', models.CharField(max_length=16, verbose_name='Причина')),
+                ('list_size', models.PositiveIntegerField(blank=True, null=True, verbose_name='Ссылок в списке')),
+                ('duration_ms', models.FloatField(verbose_name='Длительность, мс')),
+                ('file', models.FileField(upload_to='profiles/', verbose_name='Файл профиля')),
+                ('summary', models.TextField(blank=True, verbose_name='Сводка (top по cumulative)')),
+                ('reference_text', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app.referencetext', verbose_name='Текст списка ссылок')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
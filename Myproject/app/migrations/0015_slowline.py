@@ -0,0 +1,31 @@
+# Generated by Django 4.2.26 on 2026-10-19 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_profiler'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text_hash', models.CharField(max_length=40, unique=True, verbose_name='SHA-1 текста')),
+                ('type_code', models.CharField(max_length=64, verbose_name='Тип ссылки')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('elapsed_ms', models.FloatField(verbose_name='Макс. время разбора, мс')),
+                ('hits', models.PositiveIntegerField(default=1, verbose_name='Повторов')),
+                ('first_seen', models.DateTimeField(auto_now_add=True, verbose_name='Впервые')),
+                ('last_seen', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Последний раз')),
+            ],
+            options={
+                'verbose_name': 'Медленная строка',
+                'verbose_name_plural': 'Медленные строки',
+                'ordering': ['-elapsed_ms'],
+            },
+        ),
+    ]
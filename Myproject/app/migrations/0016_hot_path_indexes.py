@@ -0,0 +1,40 @@
+# Generated by Django 4.2.26 on 2026-10-19 09:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_slowline'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reference',
+            name='reference_text',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='references', to='app.referencetext', verbose_name='Текст списка ссылок'),
+        ),
+        migrations.AlterField(
+            model_name='referenceissue',
+            name='reference',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='issues', to='app.reference', verbose_name='Ссылка'),
+        ),
+        migrations.AddIndex(
+            model_name='reference',
+            index=models.Index(fields=['reference_text', 'id'], name='app_ref_text_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='referenceissue',
+            index=models.Index(fields=['reference', '-severity', 'field_name'], name='app_issue_ref_sev_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='referencetext',
+            index=models.Index(fields=['user', '-created_at'], name='app_rtext_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='referencetext',
+            index=models.Index(fields=['-created_at'], name='app_rtext_created_idx'),
+        ),
+    ]
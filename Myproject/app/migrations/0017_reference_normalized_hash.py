@@ -0,0 +1,52 @@
+# Generated by Django 4.2.26 on 2026-10-19 09:50
+
+import hashlib
+import re
+
+from django.db import migrations, models
+
+# Логика utils.normalized_fields на момент этой миграции: миграция не должна
+# зависеть от последующих правок кода приложения
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]|_')
+
+
+def normalized_fields(raw_text):
+    normalized = " ".join(PUNCTUATION_PATTERN.sub(" ", (raw_text or "").casefold()).split())
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest() if normalized else ""
+    return {"normalized_text": normalized, "normalized_hash": digest}
+
+
+def fill_normalized(apps, schema_editor):
+    """Заполняет normalized_text и normalized_hash у уже сохранённых ссылок (пачками по id)."""
+    Reference = apps.get_model("app", "Reference")
+    last_id = 0
+    while True:
+        batch = list(Reference.objects.filter(id__gt=last_id).order_by("id").only("id", "raw_text")[:2000])
+        if not batch:
+            break
+        for ref in batch:
+            fields = normalized_fields(ref.raw_text)
+            ref.normalized_text = fields["normalized_text"]
+            ref.normalized_hash = fields["normalized_hash"]
+        Reference.objects.bulk_update(batch, ["normalized_text", "normalized_hash"])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reference',
+            name='normalized_hash',
+            field=models.CharField(blank=True, max_length=40, verbose_name='Хэш нормализованного текста'),
+        ),
+        migrations.AddIndex(
+            model_name='reference',
+            index=models.Index(fields=['normalized_hash', 'reference_text', 'status'], name='app_ref_norm_hash_idx'),
+        ),
+        migrations.RunPython(fill_normalized, migrations.RunPython.noop),
+    ]
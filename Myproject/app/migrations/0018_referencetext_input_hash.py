@@ -0,0 +1,54 @@
+# Generated by Django 4.2.26 on 2026-10-19 09:51
+
+import hashlib
+import re
+
+from django.db import migrations, models
+
+# Логика utils.input_digest на момент этой миграции: миграция не должна
+# зависеть от последующих правок кода приложения
+LETTER_PATTERN = re.compile(r'^[^A-Za-zА-Яа-я]+')
+
+
+def input_digest(text):
+    lines = []
+    for line in (text or "").splitlines():
+        cleaned = LETTER_PATTERN.sub("", line.strip()).rstrip()
+        if cleaned:
+            lines.append(" ".join(cleaned.split()))
+    if not lines:
+        return ""
+    return hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def fill_input_hash(apps, schema_editor):
+    """input_hash для уже сохранённых списков."""
+    ReferenceText = apps.get_model("app", "ReferenceText")
+    batch = []
+    for reference_text in ReferenceText.objects.only("id", "input_text").iterator(chunk_size=500):
+        reference_text.input_hash = input_digest(reference_text.input_text)
+        batch.append(reference_text)
+        if len(batch) >= 500:
+            ReferenceText.objects.bulk_update(batch, ["input_hash"])
+            batch = []
+    ReferenceText.objects.bulk_update(batch, ["input_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_reference_normalized_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='referencetext',
+            name='input_hash',
+            field=models.CharField(blank=True, max_length=40, verbose_name='Хэш текста ссылок списка'),
+        ),
+        migrations.AddIndex(
+            model_name='referencetext',
+            index=models.Index(fields=['input_hash', '-created_at'], name='app_rtext_input_hash_idx'),
+        ),
+        migrations.RunPython(fill_input_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Полнотекстовый индекс SQLite FTS5 по ссылкам: raw_text и ключевые поля parsed_data.
+# Таблица app_reference_fts (rowid = app_reference.id) поддерживается триггерами на
+# app_reference. Их и начальное заполнение индекса создаёт 0026: миграции 0020 и 0024
+# пересоздают app_reference, а вместе с таблицей SQLite удаляет и её триггеры.
+# На других СУБД миграция ничего не делает (поиск — app/search.py).
+
+from django.db import migrations
+
+
+FORWARD_SQL = [
+    """
+    CREATE VIRTUAL TABLE app_reference_fts USING fts5(
+        raw_text, authors, title, source,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    # Ранжирование: совпадение в авторах и заглавии весит больше, чем в остальном тексте
+    "INSERT INTO app_reference_fts(app_reference_fts, rank) VALUES('rank', 'bm25(1.0, 3.0, 3.0, 2.0)')",
+]
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS app_reference_fts_ai",
+    "DROP TRIGGER IF EXISTS app_reference_fts_au",
+    "DROP TRIGGER IF EXISTS app_reference_fts_ad",
+    "DROP TABLE IF EXISTS app_reference_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_referencetext_input_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(FORWARD_SQL), _run(REVERSE_SQL)),
+    ]
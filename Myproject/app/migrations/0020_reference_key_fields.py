@@ -0,0 +1,94 @@
+# Generated by Django 4.2.26 on 2026-10-19 09:57
+
+import re
+
+from django.db import migrations, models
+
+# Логика utils.key_fields на момент этой миграции: миграция не должна
+# зависеть от последующих правок кода приложения
+AUTHOR_KEYS = ("authors", "author", "inventors")
+YEAR_KEYS = ("year", "publication_date")
+YEAR_PATTERN = re.compile(r"\b(1[5-9]\d\d|2\d\d\d)\b")
+SURNAME_PATTERN = re.compile(r"[^\W\d_]+(?:[-'’][^\W\d_]+)*")
+
+
+def _first_match(pattern, parsed_data, keys):
+    for key in keys:
+        match = pattern.search(str(parsed_data.get(key) or ""))
+        if match:
+            return match
+    return None
+
+
+def key_fields(parsed_data):
+    parsed_data = parsed_data or {}
+    author = _first_match(SURNAME_PATTERN, parsed_data, AUTHOR_KEYS)
+    year = _first_match(YEAR_PATTERN, parsed_data, YEAR_KEYS)
+    return {
+        "year": int(year.group(1)) if year else None,
+        "first_author": author.group(0)[:100] if author else "",
+        "journal_title": str(parsed_data.get("journal_title") or "").strip()[:255],
+        "publisher": str(parsed_data.get("publisher") or "").strip()[:255],
+    }
+
+
+def fill_key_fields(apps, schema_editor):
+    """Заполняет year, first_author, journal_title, publisher у уже разобранных ссылок (пачками по id)."""
+    Reference = apps.get_model("app", "Reference")
+    last_id = 0
+    while True:
+        batch = list(Reference.objects.filter(id__gt=last_id).order_by("id").only("id", "parsed_data")[:2000])
+        if not batch:
+            break
+        for ref in batch:
+            for name, value in key_fields(ref.parsed_data).items():
+                setattr(ref, name, value)
+        Reference.objects.bulk_update(batch, ["year", "first_author", "journal_title", "publisher"])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_reference_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reference',
+            name='first_author',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Первый автор'),
+        ),
+        migrations.AddField(
+            model_name='reference',
+            name='journal_title',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Журнал'),
+        ),
+        migrations.AddField(
+            model_name='reference',
+            name='publisher',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Издательство'),
+        ),
+        migrations.AddField(
+            model_name='reference',
+            name='year',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Год издания'),
+        ),
+        migrations.AddIndex(
+            model_name='reference',
+            index=models.Index(fields=['year'], name='app_ref_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reference',
+            index=models.Index(fields=['first_author', 'reference_text'], name='app_ref_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reference',
+            index=models.Index(fields=['journal_title', 'reference_text'], name='app_ref_journal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reference',
+            index=models.Index(fields=['publisher'], name='app_ref_publisher_idx'),
+        ),
+        migrations.RunPython(fill_key_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 4.2.26 on 2026-10-19 09:58
+
+import re
+
+from django.db import migrations, models
+
+# Каталог app/issue_codes.py на момент этой миграции: миграция не должна
+# зависеть от последующих правок каталога (новых кодов, изменённых текстов)
+OTHER = 0
+MESSAGES = {
+    OTHER: ("Прочее", "{text}"),
+    1: ("Не выбран тип", "Не выбран тип ссылки."),
+    2: ("Не удалось распарсить", "Не удалось распарсить ссылку для типа '{type_name}'."),
+    3: ("Нет обязательного поля", "Отсутствует обязательное поле: {label}."),
+    4: ("Неверный формат поля", "Поле «{label}» не соответствует ожидаемому формату."),
+    5: (
+        "Электронный ресурс без даты обращения",
+        "По шаблону «Электронный ресурс» для сетевого ресурса обязательна дата обращения: (дата обращения: ДД.ММ.ГГГГ).",
+    ),
+    6: (
+        "Электронный ресурс без URL и носителя",
+        "По шаблону «Электронный ресурс» в ссылке должны быть URL (Режим доступа) или сведения о носителе (CD-ROM и т.п.). "
+        "В тексте этого нет — выбранный тип не соответствует содержанию.",
+    ),
+}
+_PATTERNS = [
+    (code, re.compile(re.sub(r"\\\{(\w+)\\\}", r"(?P<\1>.*)", re.escape(template)) + r"\Z", re.S))
+    for code, (_, template) in MESSAGES.items()
+    if code != OTHER
+]
+
+
+def render(code, params=None):
+    _, template = MESSAGES.get(code, MESSAGES[OTHER])
+    try:
+        return template.format(**(params or {}))
+    except (KeyError, IndexError, ValueError):
+        return template
+
+
+def from_message(message):
+    for code, pattern in _PATTERNS:
+        match = pattern.match(message)
+        if match:
+            return code, match.groupdict() or None
+    return OTHER, {"text": message}
+
+
+def _batches(queryset, size=2000):
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by("id")[:size])
+        if not batch:
+            break
+        yield batch
+        last_id = batch[-1].id
+
+
+def messages_to_codes(apps, schema_editor):
+    """Тексты ReferenceIssue.message -> code и params."""
+    ReferenceIssue = apps.get_model("app", "ReferenceIssue")
+    for batch in _batches(ReferenceIssue.objects.only("id", "message")):
+        for issue in batch:
+            issue.code, issue.params = from_message(issue.message)
+        ReferenceIssue.objects.bulk_update(batch, ["code", "params"])
+
+
+def codes_to_messages(apps, schema_editor):
+    ReferenceIssue = apps.get_model("app", "ReferenceIssue")
+    for batch in _batches(ReferenceIssue.objects.only("id", "code", "params")):
+        for issue in batch:
+            issue.message = render(issue.code, issue.params)
+        ReferenceIssue.objects.bulk_update(batch, ["message"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0020_reference_key_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='referenceissue',
+            name='code',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Код проблемы'),
+        ),
+        migrations.AddField(
+            model_name='referenceissue',
+            name='params',
+            field=models.JSONField(blank=True, null=True, verbose_name='Параметры сообщения'),
+        ),
+        migrations.RunPython(messages_to_codes, codes_to_messages),
+        # default — чтобы при откате колонка вернулась в непустую таблицу; текст заполнит codes_to_messages
+        migrations.AlterField(
+            model_name='referenceissue',
+            name='message',
+            field=models.TextField(default='', verbose_name='Сообщение'),
+        ),
+        migrations.RemoveField(
+            model_name='referenceissue',
+            name='message',
+        ),
+        migrations.AddIndex(
+            model_name='referenceissue',
+            index=models.Index(fields=['code', 'field_name'], name='app_issue_code_idx'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.26 on 2026-10-19 10:00
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_counters(apps, schema_editor):
+    """
+    Счётчики по уже проверенным ссылкам: днём проверки считается день последнего
+    изменения списка (ReferenceText.updated_at), каждая ссылка — одна проверка
+    с новым результатом (checked и verdict).
+    """
+    Reference = apps.get_model("app", "Reference")
+    ReferenceIssue = apps.get_model("app", "ReferenceIssue")
+    StatCounter = apps.get_model("app", "StatCounter")
+
+    counts = Counter()
+    checked = (
+        Reference.objects.filter(status__in=("ok", "error"))
+        .values_list("id", "status", "year", "reference_type__code", "reference_text__user_id", "reference_text__updated_at")
+    )
+    days = {}
+    for ref_id, status, year, type_code, user_id, updated_at in checked.iterator(chunk_size=2000):
+        day = timezone.localdate(updated_at) if updated_at else timezone.localdate()
+        type_code = type_code or ""
+        days[ref_id] = (day, type_code)
+        counts[(day, "checked", type_code)] += 1
+        counts[(day, "verdict", type_code)] += 1
+        if status == "error":
+            counts[(day, "error", type_code)] += 1
+        if user_id:
+            counts[(day, "user", str(user_id))] += 1
+        if year and year <= day.year:
+            counts[(day, "age", str(day.year - year))] += 1
+    issues = ReferenceIssue.objects.values_list("reference_id", "field_name", "code")
+    for ref_id, field_name, code in issues.iterator(chunk_size=2000):
+        if ref_id not in days:
+            continue
+        day, type_code = days[ref_id]
+        counts[(day, "field", f"{type_code}:{field_name}"[:255])] += 1
+        counts[(day, "code", str(code))] += 1
+
+    StatCounter.objects.bulk_create(
+        [StatCounter(day=day, kind=kind, key=key, count=n) for (day, kind, key), n in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_issue_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('kind', models.CharField(choices=[('checked', 'Проверено ссылок по типу'), ('verdict', 'Новых результатов проверки по типу'), ('error', 'Ссылок с ошибками по типу'), ('field', 'Проблем по полю (тип:поле)'), ('code', 'Проблем по коду (app/issue_codes.py)'), ('user', 'Проверено ссылок по пользователю'), ('age', 'Ссылок по возрасту источника, лет')], max_length=16, verbose_name='Вид')),
+                ('key', models.CharField(blank=True, max_length=255, verbose_name='Ключ')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+            ],
+            options={
+                'verbose_name': 'Счётчик статистики',
+                'verbose_name_plural': 'Счётчики статистики',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='statcounter',
+            constraint=models.UniqueConstraint(fields=('kind', 'day', 'key'), name='app_stat_kind_day_key_uniq'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.26 on 2026-10-19 10:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('app', '0022_statcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Время проверки')),
+                ('parser_version', models.CharField(max_length=16, verbose_name='Версия парсеров')),
+                ('template_version', models.CharField(max_length=16, verbose_name='Версия шаблонов')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+                ('errors', models.PositiveIntegerField(default=0, verbose_name='Ссылок с ошибками')),
+                ('issues', models.PositiveIntegerField(default=0, verbose_name='Проблем')),
+                ('duration_ms', models.FloatField(default=0, verbose_name='Проверка, мс')),
+                ('parse_ms', models.FloatField(default=0, verbose_name='Разбор, мс')),
+                ('verdicts', models.JSONField(default=list, verbose_name='Вердикты по ссылкам')),
+                ('reference_text', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='app.referencetext', verbose_name='Текст списка ссылок')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='check_runs', to=settings.AUTH_USER_MODEL, verbose_name='Кто проверял')),
+            ],
+            options={
+                'verbose_name': 'Проверка списка',
+                'verbose_name_plural': 'Проверки списков',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['reference_text', '-created_at'], name='app_run_text_created_idx')],
+            },
+        ),
+    ]
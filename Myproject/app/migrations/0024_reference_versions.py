@@ -0,0 +1,53 @@
+# Generated by Django 4.2.26 on 2026-10-19 10:05
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+# Первые явные версии парсеров и правил (app/parsers.PARSER_VERSION,
+# app/validators.CHECK_VERSION) и хэш шаблона типа (validators.rules_digest) на момент
+# этой миграции. Ссылки, проверенные до неё, получают эти версии и не считаются устаревшими
+PARSER_VERSION = "1"
+CHECK_VERSION = "1"
+
+
+def rules_digest(rules):
+    payload = json.dumps([CHECK_VERSION, [list(rule) for rule in rules]], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def fill_versions(apps, schema_editor):
+    Reference = apps.get_model("app", "Reference")
+    ReferenceField = apps.get_model("app", "ReferenceField")
+    ReferenceType = apps.get_model("app", "ReferenceType")
+
+    rules = {type_id: [] for type_id in ReferenceType.objects.values_list("id", flat=True)}
+    for f in ReferenceField.objects.order_by("order_index", "id"):
+        rules.setdefault(f.reference_type_id, []).append([f.name, f.label, f.required, f.pattern])
+    checked = Reference.objects.exclude(status="new")
+    for type_id, type_rules in [*rules.items(), (None, [])]:
+        checked.filter(reference_type_id=type_id).update(
+            parser_version=PARSER_VERSION, template_version=rules_digest(type_rules)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0023_checkrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reference',
+            name='parser_version',
+            field=models.CharField(blank=True, max_length=16, verbose_name='Версия парсеров'),
+        ),
+        migrations.AddField(
+            model_name='reference',
+            name='template_version',
+            field=models.CharField(blank=True, max_length=16, verbose_name='Версия шаблона'),
+        ),
+        migrations.RunPython(fill_versions, migrations.RunPython.noop),
+    ]
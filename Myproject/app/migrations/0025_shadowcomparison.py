@@ -0,0 +1,33 @@
+# Generated by Django 4.2.26 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0024_reference_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShadowComparison',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Время')),
+                ('type_code', models.CharField(max_length=64, verbose_name='Тип ссылки')),
+                ('shadow', models.CharField(max_length=255, verbose_name='Теневой парсер')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('primary_ms', models.FloatField(verbose_name='Основной, мс')),
+                ('shadow_ms', models.FloatField(verbose_name='Теневой, мс')),
+                ('diverged', models.BooleanField(default=False, verbose_name='Есть расхождения')),
+                ('diff', models.JSONField(blank=True, default=dict, verbose_name='Расхождения')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Ошибка теневого парсера')),
+            ],
+            options={
+                'verbose_name': 'Сравнение с теневым парсером',
+                'verbose_name_plural': 'Сравнения с теневыми парсерами',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
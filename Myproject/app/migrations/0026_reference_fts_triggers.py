@@ -0,0 +1,87 @@
+# Триггеры, которые держат app_reference_fts (0019) в синхроне с app_reference, в том числе
+# при bulk_create/update/delete, минуя сигналы Django, и начальное заполнение индекса.
+# Создаются после последнего пересоздания app_reference (0024): SQLite удаляет триггеры
+# вместе с таблицей. Определения — копия app/search.py на момент этой миграции; если
+# позже триггеры пропадут, их после migrate создаст search.ensure_fts_triggers.
+# На других СУБД миграция ничего не делает (поиск — app/search.py).
+
+from django.db import migrations
+
+
+def _text(column):
+    # ё -> е: токенизатор unicode61 не сводит их друг к другу
+    return f"replace(replace(coalesce({column}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _fields(row, keys):
+    parts = [f"coalesce(json_extract({row}.parsed_data, '$.{key}'), '')" for key in keys]
+    return _text(" || ' ' || ".join(parts))
+
+
+AUTHOR_KEYS = ("authors", "author", "inventors")
+TITLE_KEYS = ("title", "title_main", "title_sub")
+SOURCE_KEYS = ("journal_title", "collection_title", "publisher", "owner_info")
+
+
+def _values(row):
+    return (
+        f"{row}.id, {_text(row + '.raw_text')}, {_fields(row, AUTHOR_KEYS)}, "
+        f"{_fields(row, TITLE_KEYS)}, {_fields(row, SOURCE_KEYS)}"
+    )
+
+
+FORWARD_SQL = [
+    "DROP TRIGGER IF EXISTS app_reference_fts_ai",
+    "DROP TRIGGER IF EXISTS app_reference_fts_au",
+    "DROP TRIGGER IF EXISTS app_reference_fts_ad",
+    f"""
+    CREATE TRIGGER app_reference_fts_ai AFTER INSERT ON app_reference BEGIN
+        INSERT INTO app_reference_fts(rowid, raw_text, authors, title, source) VALUES ({_values('new')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER app_reference_fts_au AFTER UPDATE OF raw_text, parsed_data ON app_reference
+    WHEN old.raw_text IS NOT new.raw_text OR old.parsed_data IS NOT new.parsed_data BEGIN
+        DELETE FROM app_reference_fts WHERE rowid = old.id;
+        INSERT INTO app_reference_fts(rowid, raw_text, authors, title, source) VALUES ({_values('new')});
+    END
+    """,
+    """
+    CREATE TRIGGER app_reference_fts_ad AFTER DELETE ON app_reference BEGIN
+        DELETE FROM app_reference_fts WHERE rowid = old.id;
+    END
+    """,
+    "DELETE FROM app_reference_fts",
+    f"""
+    INSERT INTO app_reference_fts(rowid, raw_text, authors, title, source)
+    SELECT {_values('app_reference')} FROM app_reference
+    """,
+]
+
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS app_reference_fts_ai",
+    "DROP TRIGGER IF EXISTS app_reference_fts_au",
+    "DROP TRIGGER IF EXISTS app_reference_fts_ad",
+    "DELETE FROM app_reference_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0025_shadowcomparison'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(FORWARD_SQL), _run(REVERSE_SQL)),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.26 on 2026-10-19 14:40
+
+# journal_mode хранится в файле БД: ставится один раз здесь, а не в каждом соединении
+# (app/db.py). Вне транзакции — внутри неё SQLite режим не меняет. Допустимые значения —
+# копия app/db.py на момент миграции. На других СУБД миграция ничего не делает.
+
+from django.conf import settings
+from django.db import migrations
+
+JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+
+
+def set_journal_mode(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "LITERA_SQLITE_PRAGMAS", None) or {}
+    mode = pragmas.get("journal_mode", "WAL")
+    if mode is None or str(mode).upper() not in JOURNAL_MODES:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA journal_mode = {str(mode).upper()}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('app', '0026_reference_fts_triggers'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from . import issue_codes
+
 
 class ReferenceType(models.Model):
     """Тип библиографической ссылки"""
@@ -58,10 +60,16 @@ class Reference(models.Model):
         related_name='references',
         null=True,
         blank=True,
+        db_index=False,  # покрывается индексом (reference_text, id)
         verbose_name="Текст списка ссылок"
     )
     raw_text = models.TextField(verbose_name="Исходный текст")
     normalized_text = models.TextField(blank=True, verbose_name="Нормализованный текст")
+    normalized_hash = models.CharField(
+        max_length=40,
+        blank=True,
+        verbose_name="Хэш нормализованного текста"
+    )
     reference_type = models.ForeignKey(
         ReferenceType,
         on_delete=models.SET_NULL,
@@ -71,12 +79,35 @@ class Reference(models.Model):
         verbose_name="Тип ссылки"
     )
     parsed_data = models.JSONField(blank=True, null=True, verbose_name="Распарсенные данные")
+    # Копии ключевых полей parsed_data (utils.key_fields) для статистики и фильтров без разбора JSON
+    year = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Год издания")
+    first_author = models.CharField(max_length=100, blank=True, verbose_name="Первый автор")
+    journal_title = models.CharField(max_length=255, blank=True, verbose_name="Журнал")
+    publisher = models.CharField(max_length=255, blank=True, verbose_name="Издательство")
     status = models.CharField(max_length=32, verbose_name="Статус")
+    # С какими парсерами и шаблоном типа ссылка проверялась (validators.is_stale): устаревшие
+    # результаты перепроверяются при открытии списка
+    parser_version = models.CharField(max_length=16, blank=True, verbose_name="Версия парсеров")
+    template_version = models.CharField(max_length=16, blank=True, verbose_name="Версия шаблона")
 
+    # На SQLite у таблицы есть триггеры полнотекстового индекса (search.FTS_TRIGGERS, миграция
+    # 0026). Миграция, которая пересоздаёт таблицу (например, AddField со значением по умолчанию),
+    # их удаляет; после migrate их создаёт заново search.ensure_fts_triggers (post_migrate)
     class Meta:
         verbose_name = "Ссылка"
         verbose_name_plural = "Ссылки"
         ordering = ['-id']
+        indexes = [
+            # Ссылки списка по порядку: check_list_verify, check_all
+            models.Index(fields=["reference_text", "id"], name="app_ref_text_id_idx"),
+            # Повторы ссылки во всех списках: покрывающий индекс, запрос не читает таблицу
+            models.Index(fields=["normalized_hash", "reference_text", "status"], name="app_ref_norm_hash_idx"),
+            # Статистика и фильтры по ключевым полям; reference_text — списки, цитирующие журнал/автора
+            models.Index(fields=["year"], name="app_ref_year_idx"),
+            models.Index(fields=["first_author", "reference_text"], name="app_ref_author_idx"),
+            models.Index(fields=["journal_title", "reference_text"], name="app_ref_journal_idx"),
+            models.Index(fields=["publisher"], name="app_ref_publisher_idx"),
+        ]
 
     def __str__(self):
         return self.raw_text[:50] + "..." if len(self.raw_text) > 50 else self.raw_text
@@ -88,6 +119,7 @@ class ReferenceIssue(models.Model):
         Reference,
         on_delete=models.CASCADE,
         related_name='issues',
+        db_index=False,  # покрывается индексом (reference, -severity, field_name)
         verbose_name="Ссылка"
     )
     field_name = models.CharField(
@@ -96,16 +128,28 @@ class ReferenceIssue(models.Model):
         verbose_name="Имя поля"
     )
     severity = models.CharField(max_length=16, verbose_name="Серьезность")
-    message = models.TextField(verbose_name="Сообщение")
+    # Текст сообщения собирается по каталогу app/issue_codes.py: см. message
+    code = models.PositiveSmallIntegerField(default=0, verbose_name="Код проблемы")
+    params = models.JSONField(blank=True, null=True, verbose_name="Параметры сообщения")
 
     class Meta:
         verbose_name = "Проблема ссылки"
         verbose_name_plural = "Проблемы ссылок"
         ordering = ['reference', '-severity']
+        indexes = [
+            # Проблемы ссылки/списка в порядке вывода: reference_errors, check_list_verify
+            models.Index(fields=["reference", "-severity", "field_name"], name="app_issue_ref_sev_idx"),
+            # Группировка проблем по виду
+            models.Index(fields=["code", "field_name"], name="app_issue_code_idx"),
+        ]
 
     def __str__(self):
         return f"{self.reference} - {self.severity}: {self.message[:50]}"
 
+    @property
+    def message(self) -> str:
+        return issue_codes.render(self.code, self.params)
+
 
 class ReferenceText(models.Model):
     """Хранение исходного и обработанного текста списка ссылок (проверка)"""
@@ -125,6 +169,11 @@ class ReferenceText(models.Model):
     input_text = models.TextField(
         verbose_name="Исходный текст"
     )
+    input_hash = models.CharField(
+        max_length=40,
+        blank=True,
+        verbose_name="Хэш текста ссылок списка"
+    )
     intermediate_text = models.TextField(
         blank=True,
         verbose_name="Промежуточный текст"
@@ -151,6 +200,225 @@ class ReferenceText(models.Model):
         verbose_name = "Текст списка ссылок"
         verbose_name_plural = "Тексты списков ссылок"
         ordering = ["-created_at"]
+        indexes = [
+            # Списки пользователя (check_list для user) и все списки (operator/admin)
+            models.Index(fields=["user", "-created_at"], name="app_rtext_user_created_idx"),
+            models.Index(fields=["-created_at"], name="app_rtext_created_idx"),
+            # Повторная отправка того же списка (duplicates.find_previous_check)
+            models.Index(fields=["input_hash", "-created_at"], name="app_rtext_input_hash_idx"),
+        ]
 
     def __str__(self):
         return self.title or f"Текст #{self.pk}"
+
+
+class PerfRecord(models.Model):
+    """Замер медленного HTTP-запроса (app/middleware.py). Хранятся последние LITERA_PERF_KEEP записей."""
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Создано")
+    method = models.CharField(max_length=8, verbose_name="Метод")
+    path = models.CharField(max_length=255, verbose_name="Путь")
+    view_name = models.CharField(max_length=128, blank=True, verbose_name="Представление")
+    status_code = models.PositiveSmallIntegerField(verbose_name="Код ответа")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Пользователь",
+    )
+    total_ms = models.FloatField(verbose_name="Всего, мс")
+    sql_count = models.PositiveIntegerField(default=0, verbose_name="SQL-запросов")
+    sql_ms = models.FloatField(default=0, verbose_name="SQL, мс")
+    parse_ms = models.FloatField(default=0, verbose_name="Парсинг, мс")
+    check_ms = models.FloatField(default=0, verbose_name="Проверка, мс")
+    validate_ms = models.FloatField(default=0, verbose_name="Правила полей, мс")
+    render_ms = models.FloatField(default=0, verbose_name="Шаблоны, мс")
+    details = models.JSONField(default=dict, blank=True, verbose_name="Подробности")
+
+    class Meta:
+        verbose_name = "Замер запроса"
+        verbose_name_plural = "Замеры запросов"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.method} {self.path} — {self.total_ms:.0f} мс"
+
+
+class ProfilerSettings(models.Model):
+    """Настройки профилировщика запросов (одна запись, правится в админке)."""
+    enabled = models.BooleanField(default=False, verbose_name="Профилирование включено")
+    allow_header = models.BooleanField(
+        default=True,
+        verbose_name="По заголовку X-Litera-Profile",
+        help_text="Запросы operator/admin с заголовком X-Litera-Profile: 1.",
+    )
+    allow_url_flag = models.BooleanField(
+        default=True,
+        verbose_name="По параметру ?profile=1",
+        help_text="Только для admin.",
+    )
+    auto_threshold_ms = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Порог автозахвата, мс",
+        help_text="0 — выключено. Иначе профилируются все запросы с путём из «Префикс пути», сохраняются — медленнее порога.",
+    )
+    auto_path_prefix = models.CharField(
+        max_length=255,
+        default="/check-list/",
+        verbose_name="Префикс пути для автозахвата",
+    )
+    keep = models.PositiveIntegerField(default=50, verbose_name="Хранить профилей")
+
+    class Meta:
+        verbose_name = "Настройки профилировщика"
+        verbose_name_plural = "Настройки профилировщика"
+
+    def __str__(self):
+        return "Профилировщик: " + ("включён" if self.enabled else "выключен")
+
+
+class ProfileCapture(models.Model):
+    """Профиль cProfile одного запроса (файл .prof в MEDIA_ROOT/profiles/)."""
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    method = models.CharField(max_length=8, verbose_name="Метод")
+    path = models.CharField(max_length=255, verbose_name="Путь")
+    trigger = models.CharField(max_length=16, verbose_name="Причина")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Пользователь",
+    )
+    reference_text = models.ForeignKey(
+        "ReferenceText",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Текст списка ссылок",
+    )
+    list_size = models.PositiveIntegerField(null=True, blank=True, verbose_name="Ссылок в списке")
+    duration_ms = models.FloatField(verbose_name="Длительность, мс")
+    file = models.FileField(upload_to="profiles/", verbose_name="Файл профиля")
+    summary = models.TextField(blank=True, verbose_name="Сводка (top по cumulative)")
+
+    class Meta:
+        verbose_name = "Профиль запроса"
+        verbose_name_plural = "Профили запросов"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.method} {self.path} — {self.duration_ms:.0f} мс"
+
+
+class SlowLine(models.Model):
+    """Строка, разбор которой занял больше LITERA_SLOW_LINE_MS (app/perf.py). Хранятся последние LITERA_SLOW_LINE_KEEP."""
+    text_hash = models.CharField(max_length=40, unique=True, verbose_name="SHA-1 текста")
+    type_code = models.CharField(max_length=64, verbose_name="Тип ссылки")
+    text = models.TextField(verbose_name="Текст")
+    elapsed_ms = models.FloatField(verbose_name="Макс. время разбора, мс")
+    hits = models.PositiveIntegerField(default=1, verbose_name="Повторов")
+    first_seen = models.DateTimeField(auto_now_add=True, verbose_name="Впервые")
+    last_seen = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Последний раз")
+
+    class Meta:
+        verbose_name = "Медленная строка"
+        verbose_name_plural = "Медленные строки"
+        ordering = ["-elapsed_ms"]
+
+    def __str__(self):
+        return f"[{self.type_code}] {self.elapsed_ms:.1f} мс: {self.text[:50]}"
+
+
+class StatCounter(models.Model):
+    """Счётчик статистики проверок за день (app/stats.py): страница «Статистика» читает только эту таблицу."""
+    KIND_CHOICES = [
+        ("checked", "Проверено ссылок по типу"),
+        ("verdict", "Новых результатов проверки по типу"),
+        ("error", "Ссылок с ошибками по типу"),
+        ("field", "Проблем по полю (тип:поле)"),
+        ("code", "Проблем по коду (app/issue_codes.py)"),
+        ("user", "Проверено ссылок по пользователю"),
+        ("age", "Ссылок по возрасту источника, лет"),
+    ]
+
+    day = models.DateField(verbose_name="День")
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, verbose_name="Вид")
+    key = models.CharField(max_length=255, blank=True, verbose_name="Ключ")
+    count = models.PositiveIntegerField(default=0, verbose_name="Количество")
+
+    class Meta:
+        verbose_name = "Счётчик статистики"
+        verbose_name_plural = "Счётчики статистики"
+        constraints = [
+            # Он же индекс для выборок «вид за период»
+            models.UniqueConstraint(fields=["kind", "day", "key"], name="app_stat_kind_day_key_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.kind} {self.key}: {self.count}"
+
+
+class CheckRun(models.Model):
+    """Снимок проверки списка (check_all): вердикты по ссылкам, версии парсеров и шаблонов, время (app/runs.py)"""
+    reference_text = models.ForeignKey(
+        ReferenceText,
+        on_delete=models.CASCADE,
+        related_name="runs",
+        db_index=False,  # покрывается индексом (reference_text, -created_at)
+        verbose_name="Текст списка ссылок",
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="check_runs",
+        verbose_name="Кто проверял",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время проверки")
+    parser_version = models.CharField(max_length=16, verbose_name="Версия парсеров")
+    template_version = models.CharField(max_length=16, verbose_name="Версия шаблонов")
+    total = models.PositiveIntegerField(default=0, verbose_name="Ссылок")
+    errors = models.PositiveIntegerField(default=0, verbose_name="Ссылок с ошибками")
+    issues = models.PositiveIntegerField(default=0, verbose_name="Проблем")
+    duration_ms = models.FloatField(default=0, verbose_name="Проверка, мс")
+    parse_ms = models.FloatField(default=0, verbose_name="Разбор, мс")
+    # [[normalized_hash, статус, [[field_name, code, severity, params], ...]], ...] в порядке списка
+    verdicts = models.JSONField(default=list, verbose_name="Вердикты по ссылкам")
+
+    class Meta:
+        verbose_name = "Проверка списка"
+        verbose_name_plural = "Проверки списков"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["reference_text", "-created_at"], name="app_run_text_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.reference_text} {self.created_at:%d.%m.%Y %H:%M}: {self.errors}/{self.total}"
+
+
+class ShadowComparison(models.Model):
+    """Сравнение основного и теневого парсера на одной ссылке (app/shadow.py). Хранятся последние LITERA_SHADOW_KEEP."""
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Время")
+    type_code = models.CharField(max_length=64, verbose_name="Тип ссылки")
+    shadow = models.CharField(max_length=255, verbose_name="Теневой парсер")
+    text = models.TextField(verbose_name="Текст")
+    primary_ms = models.FloatField(verbose_name="Основной, мс")
+    shadow_ms = models.FloatField(verbose_name="Теневой, мс")
+    diverged = models.BooleanField(default=False, verbose_name="Есть расхождения")
+    # {поле: [значение основного, значение теневого]} для различающихся полей
+    diff = models.JSONField(default=dict, blank=True, verbose_name="Расхождения")
+    error = models.TextField(blank=True, default="", verbose_name="Ошибка теневого парсера")
+
+    class Meta:
+        verbose_name = "Сравнение с теневым парсером"
+        verbose_name_plural = "Сравнения с теневыми парсерами"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"[{self.type_code}] {self.shadow}: {'расхождение' if self.diverged else 'совпадение'}"
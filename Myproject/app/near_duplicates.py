@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Почти-повторы внутри списка: одна и та же работа, оформленная по-разному
+(другое число страниц, сокращённое место издания и т.п.).
+
+Попарное сравнение — O(n²); здесь MinHash + LSH:
+1) признаки ссылки — слова нормализованного текста (utils.normalize_reference_text)
+   без служебных слов ГОСТ и пары слов заглавия из parsed_data;
+2) MinHash-подпись из NUM_PERM значений приближает коэффициент Жаккара; считается
+   одним хэшем на признак (one permutation hashing: признак попадает в одну из
+   NUM_PERM корзин, пустые корзины заполняются из соседних);
+3) подпись режется на BANDS полос; ссылки с совпавшей полосой — кандидаты;
+4) кандидаты проверяются точным Жаккаром и полями parsed_data (фамилия первого
+   автора и год не должны различаться) и объединяются в кластеры (union-find).
+
+Время почти линейно по числу ссылок; точные повторы (одинаковый
+normalized_hash) показываются отдельно — duplicates.list_duplicates.
+"""
+import zlib
+
+from .utils import first_author, normalize_reference_text, publication_year
+
+BANDS = 10
+ROWS = 3
+NUM_PERM = BANDS * ROWS
+# Порог точного Жаккара; пара с Жаккаром 0.5 попадает в кандидаты с вероятностью
+# 1 - (1 - 0.5^ROWS)^BANDS ≈ 0.74, с Жаккаром 0.7 — ≈ 0.98
+DEFAULT_THRESHOLD = 0.5
+# Корзина больше MAX_BUCKET — признак общих для многих ссылок слов, а не повтора; пропускается
+MAX_BUCKET = 64
+
+# Служебные слова описаний по ГОСТ: одинаковы у разных работ и только завышают сходство
+STOP_WORDS = frozenset((
+    "электронный", "ресурс", "url", "режим", "доступа", "дата", "обращения", "текст",
+    "непосредственный", "http", "https", "www", "ru", "com", "org", "html", "изд", "во",
+))
+_EMPTY_BIN = 1 << 32
+
+
+def features(text: str, parsed_data: dict = None) -> frozenset:
+    """
+    Множество признаков ссылки. Однобуквенные слова (инициалы, «с.», «М.») не
+    учитываются: на них и различается оформление одной и той же работы.
+    """
+    result = {word for word in normalize_reference_text(text).split() if len(word) > 1 and word not in STOP_WORDS}
+    parsed_data = parsed_data or {}
+    title = parsed_data.get("title") or parsed_data.get("title_main")
+    if title:
+        title_words = normalize_reference_text(title).split()
+        result.update(f"title:{a} {b}" for a, b in zip(title_words, title_words[1:]))
+    return frozenset(result)
+
+
+def signature(feature_set: frozenset) -> tuple:
+    """MinHash-подпись из NUM_PERM значений за один проход по признакам."""
+    bins = [_EMPTY_BIN] * NUM_PERM
+    for feature in feature_set:
+        h = zlib.crc32(feature.encode("utf-8"))
+        index, value = h % NUM_PERM, h // NUM_PERM
+        if value < bins[index]:
+            bins[index] = value
+    if all(value == _EMPTY_BIN for value in bins):
+        return ()
+    # Уплотнение: пустая корзина берёт значение ближайшей непустой справа (по кругу),
+    # со сдвигом на расстояние — так совпадения пустых корзин остаются согласованными
+    result = []
+    for index in range(NUM_PERM):
+        distance = 0
+        value = bins[index]
+        while value == _EMPTY_BIN:
+            distance += 1
+            value = bins[(index + distance) % NUM_PERM]
+        result.append(value + distance * _EMPTY_BIN)
+    return tuple(result)
+
+
+def _fields_agree(first: tuple, second: tuple) -> bool:
+    """Фамилия первого автора и год (кортежи из _key_fields), если известны у обеих ссылок, совпадают."""
+    return all(not a or not b or a == b for a, b in zip(first, second))
+
+
+def _key_fields(parsed_data: dict) -> tuple:
+    return first_author(parsed_data).casefold(), publication_year(parsed_data)
+
+
+def jaccard(first: frozenset, second: frozenset) -> float:
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def _find(parent: dict, key):
+    while parent[key] != key:
+        parent[key] = parent[parent[key]]
+        key = parent[key]
+    return key
+
+
+def find_clusters(items, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    items — [(ключ, текст, parsed_data)], ключи уникальны (например, номер ссылки).
+    Возвращает кластеры почти-повторов: [[ключ, ...], ...] по возрастанию ключей,
+    только кластеры из двух и более ссылок.
+    """
+    feature_sets = {}
+    parsed = {}
+    buckets = {}
+    for key, text, parsed_data in items:
+        feature_set = features(text, parsed_data)
+        if not feature_set:
+            continue
+        feature_sets[key] = feature_set
+        parsed[key] = _key_fields(parsed_data or {})
+        sig = signature(feature_set)
+        for band in range(BANDS):
+            band_key = (band, sig[band * ROWS:(band + 1) * ROWS])
+            buckets.setdefault(band_key, []).append(key)
+
+    # В корзине ссылка сравнивается не со всеми, а с «якорями» — первыми ссылками
+    # уже найденных групп; вместе с MAX_BUCKET работа остаётся линейной
+    parent = {key: key for key in feature_sets}
+    rejected = set()
+    for members in buckets.values():
+        if len(members) < 2 or len(members) > MAX_BUCKET:
+            continue
+        anchors = [members[0]]
+        for key in members[1:]:
+            for anchor in anchors:
+                root_anchor, root_key = _find(parent, anchor), _find(parent, key)
+                if root_anchor == root_key:
+                    break
+                if (anchor, key) in rejected:
+                    continue
+                if jaccard(feature_sets[anchor], feature_sets[key]) >= threshold and _fields_agree(parsed[anchor], parsed[key]):
+                    parent[root_key] = root_anchor
+                    break
+                rejected.add((anchor, key))
+            else:
+                anchors.append(key)
+
+    clusters = {}
+    for key in feature_sets:
+        clusters.setdefault(_find(parent, key), []).append(key)
+    return sorted((sorted(keys) for keys in clusters.values() if len(keys) > 1), key=lambda keys: keys[0])
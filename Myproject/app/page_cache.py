@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Условный GET и кэш фрагментов для страниц проверки списка (check_list_verify)
+и ошибок ссылки (reference_errors).
+
+Версия списка (list_version) — хэш ReferenceText.updated_at, числа и последнего
+id ссылок этого списка, версии парсеров, версии правил шаблонов, названий типов,
+предложения скопировать прошлую проверку (пока ссылок нет) и номера интервала
+LITERA_FRAGMENT_CACHE_SECONDS. Всё, что меняет ссылки или проблемы списка,
+обновляет updated_at через touch() в той же транзакции; другие списки версию не
+меняют, поэтому отметки «встречалась в других списках» могут отставать до конца
+текущего интервала.
+
+По версии страница получает ETag и Last-Modified (verify_etag/errors_etag —
+для django.views.decorators.http.condition): повторное открытие без изменений
+отвечает 304 без выполнения представления. Пока на странице есть ссылки,
+проверенные прежними парсерами или шаблонами, условный GET не применяется:
+представление их перепроверит (ленивая перепроверка) и отдаст новую страницу.
+Таблицы страниц кэшируются {% cache %} в кэше "fragments" с той же версией в
+ключе; тяжёлые части контекста представления вычисляются лениво, только если
+фрагмента нет в кэше.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+
+from . import metrics
+from .auth_utils import can_see_all_checks
+from .duplicates import find_previous_check
+from .models import Reference, ReferenceText, ReferenceType
+from .parsers import PARSER_VERSION
+from .validators import rules_version, stale_q, template_versions
+
+
+def touch(reference_text_ids) -> None:
+    """Новая версия страниц списков: updated_at = сейчас."""
+    ids = {pk for pk in reference_text_ids if pk is not None}
+    if ids:
+        ReferenceText.objects.filter(pk__in=ids).update(updated_at=timezone.now())
+
+
+def list_version(reference_text: ReferenceText) -> str:
+    """Версия страниц списка для ETag и ключей кэша фрагментов."""
+    references = Reference.objects.filter(reference_text=reference_text).aggregate(count=Count("id"), last_id=Max("id"))
+    # Без сохранённых ссылок страница предлагает скопировать прошлую проверку того же текста
+    previous = find_previous_check(reference_text) if not references["count"] else None
+    payload = json.dumps([
+        reference_text.pk,
+        reference_text.updated_at.isoformat(),
+        references["count"],
+        references["last_id"],
+        previous.pk if previous else None,
+        PARSER_VERSION,
+        rules_version(),
+        list(ReferenceType.objects.order_by("id").values_list("id", "name")),
+        int(time.time() // max(fragment_timeout(), 1)),
+    ], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def fragment_timeout() -> int:
+    return getattr(settings, "LITERA_FRAGMENT_CACHE_SECONDS", 600)
+
+
+def _page_text(request, kind: str, pk):
+    """
+    Список, к странице которого идёт GET, или None — тогда условный GET не
+    применяется и представление отвечает как обычно (в т.ч. 404/403 и ленивая
+    перепроверка устаревших ссылок страницы).
+    Результат запоминается в запросе: condition вызывает обе функции.
+    """
+    cached = getattr(request, "_litera_page_text", None)
+    if cached is not None and cached[0] == (kind, pk):
+        return cached[1]
+
+    reference_text = None
+    # Непоказанные сообщения выводятся в самой странице: 304 их бы потерял
+    if request.method in ("GET", "HEAD") and request.user.is_authenticated and not len(messages.get_messages(request)):
+        if kind == "verify":
+            reference_text = ReferenceText.objects.filter(pk=pk).first()
+            page_references = Reference.objects.filter(reference_text_id=pk)
+        else:
+            reference = Reference.objects.filter(pk=pk).select_related("reference_text").first()
+            reference_text = reference.reference_text if reference else None
+            page_references = Reference.objects.filter(pk=pk)
+        if reference_text is not None and not (
+            can_see_all_checks(request.user) or reference_text.user_id == request.user.pk
+        ):
+            reference_text = None
+        if reference_text is not None and page_references.filter(stale_q(template_versions())).exists():
+            reference_text = None
+    request._litera_page_text = ((kind, pk), reference_text)
+    return reference_text
+
+
+def _etag(request, kind: str, pk):
+    reference_text = _page_text(request, kind, pk)
+    if reference_text is None:
+        return None
+    # В странице — имя пользователя и CSRF-токен форм: у другого входа другой ETag
+    payload = f"{kind}:{list_version(reference_text)}:{request.user.pk}:{request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')}"
+    etag = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:24]
+
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match:
+        hit = quote_etag(etag) in parse_etags(if_none_match)
+        metrics.CACHE_REQUESTS.inc("conditional_get", "hit" if hit else "miss")
+    return etag
+
+
+def _last_modified(request, kind: str, pk):
+    reference_text = _page_text(request, kind, pk)
+    return reference_text.updated_at if reference_text is not None else None
+
+
+def verify_etag(request, pk):
+    return _etag(request, "verify", pk)
+
+
+def verify_last_modified(request, pk):
+    return _last_modified(request, "verify", pk)
+
+
+def errors_etag(request, pk):
+    return _etag(request, "errors", pk)
+
+
+def errors_last_modified(request, pk):
+    return _last_modified(request, "errors", pk)
@@ -1,6 +1,8 @@
 import re
+import time
 
 from .models import Reference, ReferenceType
+from . import metrics, perf, shadow
 from .utils import clean_reference_line
 
 # Класс символов тире (дефис, en-dash –, em-dash —) для разделителей областей по ГОСТ
@@ -697,12 +699,23 @@ PARSERS_BY_TYPE = {
     "PATENT": parse_patent,
 }
 
+# Теневые парсеры по типам (app/shadow.py): работают в фоне на доле ссылок после основного,
+# результат только сравнивается с основным. Заполняется из LITERA_SHADOW_PARSERS при запуске.
+SHADOW_PARSERS_BY_TYPE = {}
+
+# Версия парсеров (Reference.parser_version, снимки проверок CheckRun, app/runs.py).
+# Увеличивается вручную, когда меняется результат разбора: после этого сохранённые
+# ссылки считаются устаревшими и перепроверяются (validators.is_stale, recheck_all).
+# Правки, не влияющие на разбор (комментарии, замеры, теневые парсеры), её не меняют
+PARSER_VERSION = "1"
+
 
 def parse_reference_instance(reference: Reference) -> dict:
     """
     Парсит одну ссылку в зависимости от reference.reference_type.
     Возвращает словарь полей (или пустой словарь, если парсинг не удался).
-    Никаких изменений в базе здесь не выполняется.
+    Никаких изменений в базе здесь не выполняется: замеры (app/perf.py, app/metrics.py)
+    копятся в памяти и записываются после ответа.
     
     Args:
         reference: Экземпляр модели Reference
@@ -720,4 +733,49 @@ def parse_reference_instance(reference: Reference) -> dict:
         return {}
 
     text = reference.raw_text or ""
-    return parser(text)
+    started = time.perf_counter()
+    data = parser(text)
+    elapsed = time.perf_counter() - started
+    perf.record_parse(type_code, elapsed, text)
+    metrics.observe_parse(type_code, elapsed, bool(data))
+    shadow_parser = SHADOW_PARSERS_BY_TYPE.get(type_code)
+    if shadow_parser is not None:
+        # Только постановка в очередь: теневой разбор и запись — в фоновом потоке
+        shadow.submit(type_code, shadow_parser, text, data, elapsed)
+    return data
+
+
+# Признаки типов для автоопределения: по ним выбирается порядок перебора парсеров
+_TYPE_HINTS = [
+    ("ONLINE_JOURNAL", re.compile(r"\[Электронный\s+ресурс\]\s*:.*Режим\s+доступа", re.IGNORECASE)),
+    ("PATENT", re.compile(r"^Пат\.", re.IGNORECASE)),
+    ("DISSERTATION", re.compile(r"\bдис\.|автореф", re.IGNORECASE)),
+    ("STANDARD", re.compile(r"^(?:ГОСТ|СП\s|СНиП|ОСТ\s|СанПиН|Федеральный\s+закон)", re.IGNORECASE)),
+    ("ARTICLE_PROCEEDINGS", re.compile(r"(?<!:)//.*(?:материалы|конф|сб\.|сборник|труды|форум|симпозиум)", re.IGNORECASE)),
+    ("ARTICLE_JOURNAL", re.compile(r"(?<!:)//")),
+    ("ONLINE", re.compile(r"URL:|Режим\s+доступа|\[Электронный\s+ресурс\]|CD-ROM|DVD-ROM", re.IGNORECASE)),
+]
+
+# Порядок перебора, если ни один признак не подтвердился парсингом
+_DETECT_FALLBACK_ORDER = ["BOOK", "ARTICLE_JOURNAL", "ARTICLE_PROCEEDINGS", "ONLINE", "STANDARD"]
+
+
+def detect_reference_type(text: str):
+    """
+    Автоопределение типа ссылки по тексту (для пакетной проверки без ручного выбора типа).
+    Сначала пробуются типы, признаки которых найдены в строке, затем остальные.
+    Возвращает код типа, чей парсер дал непустой результат, или None.
+    """
+    value = clean_reference_line(text or "")
+    if not value:
+        return None
+
+    candidates = [code for code, hint in _TYPE_HINTS if hint.search(value)]
+    for code in _DETECT_FALLBACK_ORDER:
+        if code not in candidates:
+            candidates.append(code)
+
+    for code in candidates:
+        if PARSERS_BY_TYPE[code](value):
+            return code
+    return None
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Замеры производительности в рамках одного HTTP-запроса.
+
+PerformanceMiddleware (app/middleware.py) создаёт RequestStats на время запроса;
+парсер, проверка и шаблоны сообщают сюда затраченное время через record_*.
+Вне запроса (команды manage.py, тесты) record_* ничего не делают.
+
+Самые медленные строки запроса (LITERA_PERF_SLOW_LINES) копятся в RequestStats;
+после ответа PerformanceMiddleware сохраняет те из них, что разбирались дольше
+LITERA_SLOW_LINE_MS, в SlowLine (save_slow_lines) — парсер в БД не пишет.
+Из SlowLine после ручной проверки пополняется golden-корпус
+(python manage.py benchmark --add-golden).
+"""
+import contextvars
+import hashlib
+import heapq
+import logging
+import time
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger("litera.perf")
+
+_current = contextvars.ContextVar("litera_request_stats", default=None)
+
+
+class RequestStats:
+    """Счётчики одного запроса."""
+
+    def __init__(self, slow_lines_limit: int = 10):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.parse = {}  # код типа -> [число строк, секунды]
+        self.check_count = 0
+        self.check_seconds = 0.0
+        self.validate_seconds = 0.0
+        self.render_seconds = 0.0
+        self._slow_lines = []  # куча (секунды, тип, текст) из slow_lines_limit самых медленных строк
+        self._slow_lines_limit = slow_lines_limit
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        """Обёртка для connection.execute_wrapper: число и время SQL-запросов."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_seconds += time.perf_counter() - started
+
+    def add_parse(self, type_code: str, seconds: float, text: str) -> None:
+        item = self.parse.setdefault(type_code, [0, 0.0])
+        item[0] += 1
+        item[1] += seconds
+        entry = (seconds, type_code, text)
+        if len(self._slow_lines) < self._slow_lines_limit:
+            heapq.heappush(self._slow_lines, entry)
+        elif seconds > self._slow_lines[0][0]:
+            heapq.heapreplace(self._slow_lines, entry)
+
+    @property
+    def parse_seconds(self) -> float:
+        return sum(seconds for _, seconds in self.parse.values())
+
+    def slowest(self) -> list:
+        """Самые медленные строки запроса: (секунды, тип, текст), от медленной к быстрой."""
+        return sorted(self._slow_lines, reverse=True)
+
+    def slow_lines(self) -> list:
+        return [
+            {"type": type_code, "ms": round(seconds * 1000, 3), "text": text[:300]}
+            for seconds, type_code, text in self.slowest()
+        ]
+
+    def as_dict(self) -> dict:
+        return {
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_seconds * 1000, 2),
+            "parse_ms": round(self.parse_seconds * 1000, 2),
+            "parse_by_type": {
+                code: {"lines": count, "ms": round(seconds * 1000, 2)}
+                for code, (count, seconds) in self.parse.items()
+            },
+            "check_count": self.check_count,
+            "check_ms": round(self.check_seconds * 1000, 2),
+            "validate_ms": round(self.validate_seconds * 1000, 2),
+            "render_ms": round(self.render_seconds * 1000, 2),
+        }
+
+
+def start_request(slow_lines_limit: int = 10):
+    """Начать сбор для текущего запроса; возвращает (stats, token) для finish_request."""
+    stats = RequestStats(slow_lines_limit)
+    return stats, _current.set(stats)
+
+
+def finish_request(token) -> None:
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def record_parse(type_code: str, seconds: float, text: str) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.add_parse(type_code, seconds, text)
+
+
+def record_check(seconds: float) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.check_count += 1
+        stats.check_seconds += seconds
+
+
+def record_validate(seconds: float) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.validate_seconds += seconds
+
+
+def record_render(seconds: float) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.render_seconds += seconds
+
+
+def save_slow_lines(stats: RequestStats) -> None:
+    """Сохраняет в SlowLine медленные строки запроса, разбор которых дольше LITERA_SLOW_LINE_MS."""
+    threshold_ms = getattr(settings, "LITERA_SLOW_LINE_MS", 20)
+    if not threshold_ms:
+        return
+    for seconds, type_code, text in stats.slowest():
+        if seconds * 1000 < threshold_ms:
+            break
+        _save_slow_line(type_code, seconds * 1000, text)
+
+
+def _save_slow_line(type_code: str, elapsed_ms: float, text: str) -> None:
+    from django.db.models import F
+    from django.db.models.functions import Greatest
+    from django.utils import timezone
+
+    from .models import SlowLine
+
+    text_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    try:
+        updated = SlowLine.objects.filter(text_hash=text_hash).update(
+            hits=F("hits") + 1,
+            elapsed_ms=Greatest("elapsed_ms", elapsed_ms),
+            type_code=type_code,
+            last_seen=timezone.now(),
+        )
+        if updated:
+            return
+        line = SlowLine.objects.create(text_hash=text_hash, type_code=type_code, text=text, elapsed_ms=round(elapsed_ms, 3))
+        # Таблица ограничена: храним LITERA_SLOW_LINE_KEEP последних по времени появления
+        if line.pk % 50 == 0:
+            keep = getattr(settings, "LITERA_SLOW_LINE_KEEP", 1000)
+            stale = SlowLine.objects.order_by("-last_seen").values_list("pk", flat=True)[keep:keep + 1000]
+            SlowLine.objects.filter(pk__in=list(stale)).delete()
+    except Exception as e:
+        logger.error(f"Не удалось сохранить медленную строку: {e}")
+
+
+class _TimedTemplate:
+    """Шаблон, сообщающий время render(); остальные атрибуты — от исходного шаблона."""
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            record_render(time.perf_counter() - started)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django с замером времени рендера (settings.TEMPLATES['BACKEND'])."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
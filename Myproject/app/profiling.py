@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Профилирование отдельных запросов cProfile (ProfilerMiddleware в app/middleware.py).
+
+Запрос профилируется, если в ProfilerSettings включено профилирование и:
+- operator/admin прислал заголовок X-Litera-Profile: 1;
+- admin открыл страницу с параметром ?profile=1;
+- путь начинается с auto_path_prefix и задан auto_threshold_ms — тогда профиль
+  сохраняется, только если запрос оказался медленнее порога.
+
+Профиль сохраняется в MEDIA_ROOT/profiles/ (формат pstats, открывается snakeviz
+или python -m pstats) вместе с id списка и числом ссылок; просмотр и скачивание —
+в админке, «Профили запросов».
+"""
+import io
+import marshal
+import pstats
+import time
+
+from django.core.files.base import ContentFile
+
+from .auth_utils import is_admin, is_operator
+
+# Настройки читаются из БД не чаще раза в SETTINGS_TTL секунд на процесс
+SETTINGS_TTL = 5.0
+_settings_cache = {"value": None, "loaded_at": 0.0}
+
+SUMMARY_LINES = 40
+
+
+def get_settings():
+    """ProfilerSettings из кэша процесса (None, если таблица ещё не создана)."""
+    now = time.monotonic()
+    if now - _settings_cache["loaded_at"] >= SETTINGS_TTL:
+        from .models import ProfilerSettings
+
+        try:
+            _settings_cache["value"] = ProfilerSettings.objects.first()
+        except Exception:
+            _settings_cache["value"] = None
+        _settings_cache["loaded_at"] = now
+    return _settings_cache["value"]
+
+
+def reset_settings_cache() -> None:
+    _settings_cache["loaded_at"] = 0.0
+
+
+def trigger_for(request, options):
+    """Причина профилирования запроса: 'header' | 'url' | 'auto' | None."""
+    user = getattr(request, "user", None)
+    authenticated = user is not None and user.is_authenticated
+    if options.allow_header and request.headers.get("X-Litera-Profile") == "1" and authenticated and is_operator(user):
+        return "header"
+    if options.allow_url_flag and request.GET.get("profile") == "1" and authenticated and is_admin(user):
+        return "url"
+    if options.auto_threshold_ms and options.auto_path_prefix and request.path.startswith(options.auto_path_prefix):
+        return "auto"
+    return None
+
+
+def summarize(profiler) -> str:
+    """Top SUMMARY_LINES функций по cumulative time (текст pstats)."""
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(SUMMARY_LINES)
+    return out.getvalue()
+
+
+def _reference_text_for(request):
+    """(ReferenceText, число ссылок) для страниц списка check-list/<pk>/..., иначе (None, None)."""
+    from .models import Reference, ReferenceText
+
+    match = getattr(request, "resolver_match", None)
+    if not match or not match.url_name or not match.url_name.startswith("check_list_") or "pk" not in match.kwargs:
+        return None, None
+    reference_text = ReferenceText.objects.filter(pk=match.kwargs["pk"]).first()
+    if reference_text is None:
+        return None, None
+    return reference_text, Reference.objects.filter(reference_text=reference_text).count()
+
+
+def save_capture(request, profiler, trigger: str, duration_ms: float, keep: int):
+    """Сохраняет профиль запроса и удаляет самые старые сверх keep."""
+    from .models import ProfileCapture
+
+    # Тот же формат, что у Profile.dump_stats(); сериализуем до summarize(),
+    # которая забирает stats у профилировщика
+    profiler.create_stats()
+    content = marshal.dumps(profiler.stats)
+
+    reference_text, list_size = _reference_text_for(request)
+    user = getattr(request, "user", None)
+    capture = ProfileCapture(
+        method=request.method,
+        path=request.path[:255],
+        trigger=trigger,
+        user=user if user is not None and user.is_authenticated else None,
+        reference_text=reference_text,
+        list_size=list_size,
+        duration_ms=round(duration_ms, 2),
+        summary=summarize(profiler),
+    )
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    name = f"list{reference_text.pk}-n{list_size}-{stamp}.prof" if reference_text else f"request-{stamp}.prof"
+    capture.file.save(name, ContentFile(content), save=False)
+    capture.save()
+
+    for old in ProfileCapture.objects.order_by("-created_at", "-id")[keep:]:
+        old.file.delete(save=False)
+        old.delete()
+    return capture
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Снимки проверок списка (CheckRun) и сравнение двух проверок.
+
+check_all записывает снимок: вердикт каждой ссылки (normalized_hash, статус,
+проблемы как field_name/code/severity/params), версии парсеров и шаблонов, время.
+Сравнение не перепроверяет ссылки: проблемы обоих снимков превращаются в
+множества ключей (ссылка, поле, код, серьёзность), исправленные, новые и
+оставшиеся — разность и пересечение множеств. Ссылка в ключе — её
+normalized_hash и номер среди одинаковых, так что правка, перестановка и
+повторное сохранение списка сравнению не мешают.
+"""
+from django.db.models import Subquery
+
+from . import issue_codes, perf
+from .models import CheckRun, Reference, ReferenceIssue
+from .parsers import PARSER_VERSION
+from .validators import rules_version
+
+
+def parse_seconds() -> float:
+    """Время разбора ссылок в текущем запросе (perf), чтобы снимок знал свою долю."""
+    stats = perf.current()
+    if stats is None:
+        return 0.0
+    return sum(seconds for _, seconds in stats.parse.values())
+
+
+def record_run(reference_text, references, user=None, seconds: float = 0.0, parse_seconds: float = 0.0) -> CheckRun:
+    """Снимок только что выполненной проверки references (в порядке списка)."""
+    issues_by_ref = {}
+    issues_qs = ReferenceIssue.objects.filter(
+        reference__in=Subquery(Reference.objects.filter(reference_text=reference_text).values("id"))
+    ).order_by("reference_id", "-severity")
+    for ref_id, field_name, code, severity, params in issues_qs.values_list(
+        "reference_id", "field_name", "code", "severity", "params"
+    ):
+        issues_by_ref.setdefault(ref_id, []).append([field_name, code, severity, params])
+
+    verdicts = [[ref.normalized_hash, ref.status, issues_by_ref.get(ref.pk, [])] for ref in references]
+    return CheckRun.objects.create(
+        reference_text=reference_text,
+        user=user if user is not None and user.is_authenticated else None,
+        parser_version=PARSER_VERSION,
+        template_version=rules_version(),
+        total=len(verdicts),
+        errors=sum(1 for _, status, _ in verdicts if status == "error"),
+        issues=sum(len(issues) for _, _, issues in verdicts),
+        duration_ms=seconds * 1000,
+        parse_ms=parse_seconds * 1000,
+        verdicts=verdicts,
+    )
+
+
+def _issue_map(run: CheckRun) -> dict:
+    """{(normalized_hash, номер среди одинаковых, field_name, code, severity): params}."""
+    result = {}
+    seen = {}
+    for ref_hash, _, issues in run.verdicts:
+        occurrence = seen[ref_hash] = seen.get(ref_hash, -1) + 1
+        for field_name, code, severity, params in issues:
+            result[(ref_hash, occurrence, field_name, code, severity)] = params
+    return result
+
+
+def compare_runs(old: CheckRun, new: CheckRun) -> dict:
+    """
+    Проблемы, исправленные между old и new, новые и оставшиеся:
+    {"fixed": [...], "new": [...], "unchanged": [...]}, элементы — словари
+    с ref_hash, occurrence (номер среди ссылок с тем же хэшем), field_name, severity, message.
+    """
+    old_issues, new_issues = _issue_map(old), _issue_map(new)
+
+    def rows(keys, source):
+        return [
+            {
+                "ref_hash": key[0],
+                "occurrence": key[1],
+                "field_name": key[2],
+                "severity": key[4],
+                "message": issue_codes.render(key[3], source[key]),
+            }
+            for key in sorted(keys, key=lambda key: key[:4])
+        ]
+
+    return {
+        "fixed": rows(old_issues.keys() - new_issues.keys(), old_issues),
+        "new": rows(new_issues.keys() - old_issues.keys(), new_issues),
+        "unchanged": rows(old_issues.keys() & new_issues.keys(), new_issues),
+    }
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Песочница шаблонов (страница «Песочница», operator и admin).
+
+Кандидат прогоняется по выборке сохранённых ссылок и сравнивается с текущим
+parsed_data, без записи в БД:
+- extract — регулярное выражение по тексту ссылки извлекает значение поля
+  (группа value, иначе первая группа, иначе всё совпадение);
+- pattern — регулярное выражение проверяет значение поля, как ReferenceField.pattern
+  (re.match); сравнение — с текущим шаблоном поля;
+- parser — функция разбора «app.parsers…:имя» вместо текущего парсера типа.
+
+Прогон идёт в отдельном процессе под бюджетом времени: катастрофический
+перебор в регулярном выражении изнутри re не прервать, поэтому процесс
+завершается по истечении бюджета, а отчёт строится по готовым строкам.
+Как и app/batch.py, модуль не импортирует модели на верхнем уровне
+(процесс запускается через spawn).
+"""
+import importlib
+import multiprocessing
+import re
+import time
+
+MODES = (
+    ("extract", "Извлечение поля из текста"),
+    ("pattern", "Проверка формата поля"),
+    ("parser", "Функция разбора"),
+)
+# Строк с расхождениями и самых медленных строк в отчёте
+DIFF_ROWS = 100
+SLOWEST_ROWS = 10
+
+
+class SandboxError(ValueError):
+    """Некорректный кандидат: сообщение показывается в форме."""
+
+
+def load_parser(path: str):
+    """Функция разбора по пути «app.parsers…:имя» (только модули парсеров приложения)."""
+    module_name, _, func_name = path.partition(":")
+    if not module_name.startswith("app.parsers") or not func_name:
+        raise SandboxError("Функция разбора задаётся как app.parsers<...>:имя_функции.")
+    try:
+        func = getattr(importlib.import_module(module_name), func_name)
+    except (ImportError, AttributeError) as exc:
+        raise SandboxError(f"Не удалось загрузить {path}: {exc}")
+    if not callable(func):
+        raise SandboxError(f"{path} — не функция.")
+    return func
+
+
+def validate(mode: str, candidate: str, field_name: str) -> None:
+    """Проверка кандидата до запуска процесса: SandboxError с понятным сообщением."""
+    if mode not in dict(MODES):
+        raise SandboxError("Неизвестный режим.")
+    if not candidate:
+        raise SandboxError("Укажите регулярное выражение или функцию разбора.")
+    if mode == "parser":
+        load_parser(candidate)
+        return
+    if not field_name:
+        raise SandboxError("Укажите поле.")
+    try:
+        re.compile(candidate)
+    except re.error as exc:
+        raise SandboxError(f"Ошибка в регулярном выражении: {exc}")
+
+
+def load_sample(reference_type_id=None, status=None, contains="", limit=500) -> list:
+    """Последние limit проверенных ссылок по фильтрам: [(id, raw_text, type_code, parsed_data), ...]."""
+    from .models import Reference
+
+    references = Reference.objects.exclude(status="new")
+    if reference_type_id:
+        references = references.filter(reference_type_id=reference_type_id)
+    if status:
+        references = references.filter(status=status)
+    if contains:
+        references = references.filter(raw_text__icontains=contains)
+    return [
+        (ref_id, raw_text, type_code, parsed_data or {})
+        for ref_id, raw_text, type_code, parsed_data in references.order_by("-id").values_list(
+            "id", "raw_text", "reference_type__code", "parsed_data"
+        )[:limit]
+    ]
+
+
+def _text(value) -> str:
+    return str(value or "").strip()
+
+
+def _check_line(task: dict, run, raw_text: str, parsed_data: dict) -> dict:
+    """Результат одной строки: matched (None — у ссылки нет значения поля) и расхождения [[поле, было, стало]]."""
+    mode, field_name = task["mode"], task["field_name"]
+    if mode == "extract":
+        match = run.search(raw_text)
+        candidate = ""
+        if match:
+            if "value" in run.groupindex:
+                candidate = match.group("value")
+            else:
+                candidate = match.group(1) if run.groups else match.group(0)
+        current, candidate = _text(parsed_data.get(field_name)), _text(candidate)
+        return {"matched": match is not None, "diffs": [[field_name, current, candidate]] if current != candidate else []}
+
+    if mode == "pattern":
+        value = _text(parsed_data.get(field_name))
+        if not value:
+            return {"matched": None, "diffs": []}
+        matched = run.match(value) is not None
+        current_pattern = task["current_pattern"]
+        try:
+            was = not current_pattern or re.match(current_pattern, value) is not None
+        except re.error:
+            was = True  # как в collect_issues: некорректный шаблон в БД формат не проверяет
+        verdict = {True: "совпадает", False: "не совпадает"}
+        return {"matched": matched, "diffs": [[field_name, verdict[was], verdict[matched]]] if was != matched else []}
+
+    data = run(raw_text) or {}
+    diffs = [
+        [name, _text(parsed_data.get(name)), _text(data.get(name))]
+        for name in sorted(set(parsed_data) | set(data))
+        if _text(parsed_data.get(name)) != _text(data.get(name))
+    ]
+    return {"matched": bool(data), "diffs": diffs}
+
+
+def _worker(task: dict, sample: list, results) -> None:
+    """
+    Дочерний процесс: каждая строка сразу уходит в канал results, в конце — ("done", None).
+    По одной и через Pipe, а не Queue: у Queue отправку делает фоновый поток, который
+    не получит GIL, пока re перебирает варианты, и готовые строки не дошли бы до отчёта.
+    """
+    try:
+        if task["mode"] == "parser":
+            from .batch import setup_django
+
+            setup_django()
+            run = load_parser(task["candidate"])
+        else:
+            run = re.compile(task["candidate"])
+    except Exception as exc:  # noqa: BLE001 — ошибка кандидата уходит в отчёт
+        results.send(("error", str(exc)))
+        return
+
+    for ref_id, raw_text, _, parsed_data in sample:
+        started = time.perf_counter()
+        try:
+            line = _check_line(task, run, raw_text or "", parsed_data)
+        except Exception as exc:  # noqa: BLE001
+            line = {"matched": False, "diffs": [["", "", f"ошибка: {exc}"]]}
+        line.update({"id": ref_id, "seconds": time.perf_counter() - started})
+        results.send(("line", line))
+    results.send(("done", None))
+
+
+def run_sandbox(task: dict, sample: list, seconds: float) -> dict:
+    """
+    Прогон task ({"mode", "candidate", "field_name", "current_pattern"}) по sample
+    в отдельном процессе не дольше seconds. Отчёт: число строк, доля совпадений,
+    расхождения с parsed_data, самые медленные строки, время, признак timed_out.
+    """
+    started = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    results, child_end = context.Pipe(duplex=False)
+    process = context.Process(target=_worker, args=(task, sample, child_end), daemon=True)
+    process.start()
+    child_end.close()
+
+    lines, error, timed_out = [], None, False
+    deadline = started + seconds
+    try:
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                timed_out = True
+                break
+            if not results.poll(min(remaining, 0.5)):
+                continue
+            try:
+                kind, payload = results.recv()
+            except EOFError:
+                error = f"Процесс песочницы завершился с кодом {process.exitcode}."
+                break
+            if kind == "line":
+                lines.append(payload)
+            elif kind == "error":
+                error = payload
+                break
+            else:
+                break
+    finally:
+        if timed_out:
+            process.terminate()
+        process.join(timeout=5)
+        results.close()
+
+    texts = {ref_id: raw_text for ref_id, raw_text, _, _ in sample}
+    with_value = [line for line in lines if line["matched"] is not None]
+    matched = sum(1 for line in with_value if line["matched"])
+    changed = [line for line in lines if line["diffs"]]
+    report = {
+        "total": len(sample),
+        "processed": len(lines),
+        "with_value": len(with_value),
+        "matched": matched,
+        "match_rate": matched / len(with_value) * 100 if with_value else 0.0,
+        "changed": len(changed),
+        "diffs": [
+            {"id": line["id"], "text": texts[line["id"]], "field": field, "current": current, "candidate": candidate}
+            for line in changed[:DIFF_ROWS]
+            for field, current, candidate in line["diffs"]
+        ],
+        "slowest": [
+            {"id": line["id"], "text": texts[line["id"]], "ms": line["seconds"] * 1000}
+            for line in sorted(lines, key=lambda line: -line["seconds"])[:SLOWEST_ROWS]
+        ],
+        "seconds": sum(line["seconds"] for line in lines),
+        "wall_seconds": time.perf_counter() - started,
+        "timed_out": timed_out,
+        "error": error,
+        "stuck": None,
+    }
+    if timed_out and len(lines) < len(sample):
+        # Строки идут по порядку: на следующей за готовыми процесс и остановился
+        ref_id, raw_text, _, _ = sample[len(lines)]
+        report["stuck"] = {"id": ref_id, "text": raw_text}
+    return report
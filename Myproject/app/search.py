@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Полнотекстовый поиск по всем сохранённым ссылкам (страница «Поиск» для operator/admin).
+
+На SQLite — FTS5-таблица app_reference_fts (миграция 0019) с триггерами на app_reference
+(FTS_TRIGGERS, миграция 0026): ранжирование bm25
+с весами полей, фильтры по типу, статусу и пользователю; совпадения подсвечиваются
+в исходном тексте ссылки.
+На других СУБД — медленный запасной вариант через icontains по raw_text.
+
+Фильтры по первому автору, журналу, издательству и году идут по колонкам Reference
+(utils.key_fields) с их индексами; с ними текст запроса необязателен — тогда
+ссылки выдаются от новых к старым.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Reference
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Поля parsed_data, попадающие в столбцы индекса
+FTS_AUTHOR_KEYS = ("authors", "author", "inventors")
+FTS_TITLE_KEYS = ("title", "title_main", "title_sub")
+FTS_SOURCE_KEYS = ("journal_title", "collection_title", "publisher", "owner_info")
+
+
+def _fts_text(column):
+    # ё -> е: токенизатор unicode61 не сводит их друг к другу
+    return f"replace(replace(coalesce({column}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _fts_fields(row, keys):
+    parts = [f"coalesce(json_extract({row}.parsed_data, '$.{key}'), '')" for key in keys]
+    return _fts_text(" || ' ' || ".join(parts))
+
+
+def _fts_values(row):
+    return (
+        f"{row}.id, {_fts_text(row + '.raw_text')}, {_fts_fields(row, FTS_AUTHOR_KEYS)}, "
+        f"{_fts_fields(row, FTS_TITLE_KEYS)}, {_fts_fields(row, FTS_SOURCE_KEYS)}"
+    )
+
+
+# Триггеры держат индекс в синхроне и при bulk_create/update/delete, минуя сигналы Django
+FTS_TRIGGERS = {
+    "app_reference_fts_ai": f"""
+        CREATE TRIGGER app_reference_fts_ai AFTER INSERT ON app_reference BEGIN
+            INSERT INTO app_reference_fts(rowid, raw_text, authors, title, source) VALUES ({_fts_values('new')});
+        END
+    """,
+    "app_reference_fts_au": f"""
+        CREATE TRIGGER app_reference_fts_au AFTER UPDATE OF raw_text, parsed_data ON app_reference
+        WHEN old.raw_text IS NOT new.raw_text OR old.parsed_data IS NOT new.parsed_data BEGIN
+            DELETE FROM app_reference_fts WHERE rowid = old.id;
+            INSERT INTO app_reference_fts(rowid, raw_text, authors, title, source) VALUES ({_fts_values('new')});
+        END
+    """,
+    "app_reference_fts_ad": """
+        CREATE TRIGGER app_reference_fts_ad AFTER DELETE ON app_reference BEGIN
+            DELETE FROM app_reference_fts WHERE rowid = old.id;
+        END
+    """,
+}
+
+
+def ensure_fts_triggers(using=DEFAULT_DB_ALIAS, verbosity=1, **kwargs) -> list:
+    """
+    Обработчик post_migrate: если триггеров индекса нет (миграция пересоздала
+    app_reference, а SQLite удаляет триггеры вместе с таблицей), создаёт их заново
+    и перестраивает индекс по текущим ссылкам. Возвращает имена созданных триггеров.
+    """
+    db = connections[using]
+    if db.vendor != "sqlite":
+        return []
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master WHERE name = 'app_reference_fts' "
+            "OR (type = 'trigger' AND tbl_name = 'app_reference')"
+        )
+        rows = cursor.fetchall()
+        if ("table", "app_reference_fts") not in rows:
+            return []
+        existing = {name for kind, name in rows if kind == "trigger"}
+        missing = [name for name in FTS_TRIGGERS if name not in existing]
+        if not missing:
+            return []
+        for name in missing:
+            cursor.execute(FTS_TRIGGERS[name])
+        cursor.execute("DELETE FROM app_reference_fts")
+        cursor.execute(
+            "INSERT INTO app_reference_fts(rowid, raw_text, authors, title, source) "
+            f"SELECT {_fts_values('app_reference')} FROM app_reference"
+        )
+    if verbosity:
+        print(f"Индекс app_reference_fts: созданы триггеры {', '.join(missing)}, индекс перестроен")
+    return missing
+
+
+def fts_query(text: str) -> str:
+    """
+    Запрос пользователя -> выражение MATCH FTS5: каждое слово в кавычках (синтаксис
+    FTS5 пользователю недоступен, ошибок разбора не бывает), последнее — как префикс.
+    Пустая строка, если слов нет.
+    """
+    words = _WORD_PATTERN.findall((text or "").replace("ё", "е").replace("Ё", "Е"))
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def highlight(text: str, query: str) -> str:
+    """Исходный текст ссылки (экранированный) с <mark> на словах, начинающихся со слов запроса."""
+    words = _WORD_PATTERN.findall(query or "")
+    if not words:
+        return escape(text)
+    alternatives = "|".join(re.escape(word).replace("ё", "е").replace("е", "[её]") for word in sorted(words, key=len, reverse=True))
+    pattern = re.compile(rf"(?<!\w)(?:{alternatives})\w*", re.IGNORECASE)
+    parts, last = [], 0
+    for m in pattern.finditer(text):
+        parts.append(escape(text[last:m.start()]))
+        parts.append(f"<mark>{escape(m.group(0))}</mark>")
+        last = m.end()
+    parts.append(escape(text[last:]))
+    return mark_safe("".join(parts))
+
+
+# Параметр search_references -> колонка Reference; сравнение точное, чтобы работал индекс
+KEY_FILTERS = {"author": "first_author", "journal": "journal_title", "publisher": "publisher"}
+
+
+def _filters(reference_type_id=None, status=None, user_id=None, keys=None, year_from=None, year_to=None):
+    clauses, params = [], []
+    if reference_type_id:
+        clauses.append("r.reference_type_id = %s")
+        params.append(reference_type_id)
+    if status:
+        clauses.append("r.status = %s")
+        params.append(status)
+    if user_id:
+        clauses.append("t.user_id = %s")
+        params.append(user_id)
+    for name, value in (keys or {}).items():
+        if value:
+            clauses.append(f"r.{KEY_FILTERS[name]} = %s")
+            params.append(value)
+    if year_from:
+        clauses.append("r.year >= %s")
+        params.append(year_from)
+    if year_to:
+        clauses.append("r.year <= %s")
+        params.append(year_to)
+    return clauses, params
+
+
+def _queryset(text, reference_type_id=None, status=None, user_id=None, keys=None, year_from=None, year_to=None):
+    qs = Reference.objects.all()
+    if text:
+        qs = qs.filter(raw_text__icontains=text)
+    if reference_type_id:
+        qs = qs.filter(reference_type_id=reference_type_id)
+    if status:
+        qs = qs.filter(status=status)
+    if user_id:
+        qs = qs.filter(reference_text__user_id=user_id)
+    for name, value in (keys or {}).items():
+        if value:
+            qs = qs.filter(**{KEY_FILTERS[name]: value})
+    if year_from:
+        qs = qs.filter(year__gte=year_from)
+    if year_to:
+        qs = qs.filter(year__lte=year_to)
+    return qs.order_by("-id")
+
+
+def search_references(
+    text: str, reference_type_id=None, status=None, user_id=None, keys=None, year_from=None, year_to=None,
+    limit: int = 20, offset: int = 0,
+):
+    """
+    Возвращает (всего найдено, [Reference с атрибутом snippet]) в порядке релевантности.
+    keys — {"author"/"journal"/"publisher": значение} (KEY_FILTERS), year_from/year_to — год издания.
+    """
+    filters = (reference_type_id, status, user_id, keys, year_from, year_to)
+    if connection.vendor != "sqlite" or not text:
+        qs = _queryset(text, *filters)
+        refs = list(qs.select_related("reference_type", "reference_text__user")[offset:offset + limit])
+        for ref in refs:
+            ref.snippet = highlight(ref.raw_text, text)
+        return qs.count(), refs
+
+    match = fts_query(text)
+    if not match:
+        return 0, []
+    clauses, params = _filters(*filters)
+    joins = "JOIN app_reference r ON r.id = f.rowid"
+    if user_id:
+        joins += " LEFT JOIN app_referencetext t ON t.id = r.reference_text_id"
+    where = " AND ".join(["app_reference_fts MATCH %s"] + clauses)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM app_reference_fts f {joins} WHERE {where}", [match] + params)
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT f.rowid FROM app_reference_fts f {joins} WHERE {where} ORDER BY f.rank LIMIT %s OFFSET %s",
+            [match] + params + [limit, offset],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+
+    by_id = Reference.objects.select_related("reference_type", "reference_text__user").in_bulk(ids)
+    refs = []
+    for ref_id in ids:
+        ref = by_id.get(ref_id)
+        if ref is not None:
+            ref.snippet = highlight(ref.raw_text, text)
+            refs.append(ref)
+    return total, refs
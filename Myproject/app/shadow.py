@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Теневые версии парсеров: новая реализация разбора типа работает рядом
+с основной на доле реальных ссылок, её результат пользователю не показывается.
+
+parsers.SHADOW_PARSERS_BY_TYPE {код типа: функция} заполняется при запуске
+из LITERA_SHADOW_PARSERS = {"BOOK": "app.parsers_next:parse_book"} (load);
+модуль парсеров может и сам положить туда функцию. После основного разбора
+parse_reference_instance передаёт в submit текст и результат; доля
+LITERA_SHADOW_SAMPLE_RATE строк ставится в очередь, и только это происходит
+в пути разбора. Теневой разбор, сравнение (compare) и запись ShadowComparison
+выполняет фоновый поток процесса — запрос пользователя не ждёт ни теневого
+парсера, ни БД. Очередь ограничена LITERA_SHADOW_QUEUE: при переполнении строки
+пропускаются. Длина очереди и число поставленных и пропущенных строк — в /metrics
+(litera_shadow_queue_depth, litera_shadow_queued_total, litera_shadow_dropped_total):
+по ним видно, полна ли сводка сравнений. Сводка по парам «тип — теневой парсер» (summary) — на странице
+«Производительность»: по ней видно, можно ли сделать теневой парсер основным.
+"""
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import metrics
+
+logger = logging.getLogger("litera.perf")
+
+# Строк за одну запись в БД
+SAVE_BATCH = 100
+
+_queue = None
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def parser_name(func) -> str:
+    return f"{func.__module__}:{func.__qualname__}"
+
+
+def load() -> dict:
+    """Теневые парсеры из LITERA_SHADOW_PARSERS в parsers.SHADOW_PARSERS_BY_TYPE; ошибки — в лог."""
+    from .parsers import PARSERS_BY_TYPE, SHADOW_PARSERS_BY_TYPE
+    from .sandbox import SandboxError, load_parser
+
+    for type_code, path in getattr(settings, "LITERA_SHADOW_PARSERS", {}).items():
+        if type_code not in PARSERS_BY_TYPE:
+            logger.error(f"Теневой парсер {path}: нет основного парсера типа {type_code}")
+            continue
+        try:
+            SHADOW_PARSERS_BY_TYPE[type_code] = load_parser(path)
+        except SandboxError as e:
+            logger.error(f"Теневой парсер для {type_code} не загружен: {e}")
+    return SHADOW_PARSERS_BY_TYPE
+
+
+def _text(value) -> str:
+    return str(value or "").strip()
+
+
+def submit(type_code: str, shadow_parser, text: str, data: dict, seconds: float) -> bool:
+    """
+    С вероятностью LITERA_SHADOW_SAMPLE_RATE ставит строку в очередь теневого
+    разбора (основной разобрал её в data за seconds). Не блокирует: при полной
+    очереди строка пропускается и учитывается в metrics.SHADOW_DROPPED.
+    Возвращает True, если строка поставлена.
+    """
+    if random.random() >= getattr(settings, "LITERA_SHADOW_SAMPLE_RATE", 0.1):
+        return False
+    items = _ensure_worker()
+    try:
+        items.put_nowait((type_code, shadow_parser, text, data, seconds))
+    except queue.Full:
+        metrics.SHADOW_DROPPED.inc(type_code)
+        return False
+    finally:
+        metrics.SHADOW_QUEUE_DEPTH.set(items.qsize())
+    metrics.SHADOW_QUEUED.inc(type_code)
+    return True
+
+
+def compare(type_code: str, shadow_parser, text: str, data: dict, seconds: float):
+    """
+    Разбирает text теневым парсером и возвращает несохранённое сравнение с
+    результатом основного (data за seconds). Исключения теневого парсера
+    попадают в ShadowComparison.error.
+    """
+    from .models import ShadowComparison
+
+    started = time.perf_counter()
+    try:
+        shadow_data, error = shadow_parser(text) or {}, ""
+    except Exception as e:  # noqa: BLE001 — ошибка теневого парсера только записывается
+        shadow_data, error = {}, f"{type(e).__name__}: {e}"
+    shadow_seconds = time.perf_counter() - started
+
+    data = data or {}
+    diff = {
+        name: [_text(data.get(name)), _text(shadow_data.get(name))]
+        for name in sorted(set(data) | set(shadow_data))
+        if _text(data.get(name)) != _text(shadow_data.get(name))
+    }
+    return ShadowComparison(
+        type_code=type_code,
+        shadow=parser_name(shadow_parser)[:255],
+        text=text,
+        primary_ms=round(seconds * 1000, 3),
+        shadow_ms=round(shadow_seconds * 1000, 3),
+        diverged=bool(diff or error),
+        diff=diff,
+        error=error,
+    )
+
+
+def save(comparisons: list) -> None:
+    """Запись сравнений одной вставкой; таблица ограничена LITERA_SHADOW_KEEP последними."""
+    if not comparisons:
+        return
+    from .models import ShadowComparison
+
+    try:
+        created = ShadowComparison.objects.bulk_create(comparisons)
+        # Как PerfRecord: раз в ~100 записей удаляются старые
+        if any(c.pk and c.pk % 100 == 0 for c in created):
+            keep = getattr(settings, "LITERA_SHADOW_KEEP", 10000)
+            last_pk = max(c.pk for c in created if c.pk)
+            ShadowComparison.objects.filter(pk__lte=last_pk - keep).delete()
+    except Exception as e:
+        logger.error(f"Не удалось сохранить сравнение с теневым парсером: {e}")
+
+
+def _ensure_worker() -> queue.Queue:
+    """Очередь и фоновый поток процесса; создаются при первой строке (в воркере gunicorn — после fork)."""
+    global _queue, _worker
+    with _worker_lock:
+        if _queue is None:
+            _queue = queue.Queue(maxsize=getattr(settings, "LITERA_SHADOW_QUEUE", 1000))
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, args=(_queue,), name="litera-shadow", daemon=True)
+            _worker.start()
+        return _queue
+
+
+def _run(items: queue.Queue) -> None:
+    while True:
+        batch = [items.get()]
+        while len(batch) < SAVE_BATCH:
+            try:
+                batch.append(items.get_nowait())
+            except queue.Empty:
+                break
+        metrics.SHADOW_QUEUE_DEPTH.set(items.qsize())
+        try:
+            save([compare(*item) for item in batch])
+        except Exception as e:  # поток не должен останавливаться
+            logger.error(f"Теневой разбор не выполнен: {e}")
+        finally:
+            close_old_connections()
+            for _ in batch:
+                items.task_done()
+
+
+def wait() -> None:
+    """Дождаться обработки всех поставленных строк (команды, тесты)."""
+    if _queue is not None:
+        _queue.join()
+
+
+def _after_fork() -> None:
+    # Поток мастера в дочерний процесс не переходит, а блокировки очереди могли быть заняты
+    global _queue, _worker, _worker_lock
+    _queue, _worker, _worker_lock = None, None, threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def summary(since) -> list:
+    """
+    Сводка сравнений после since по парам (тип, теневой парсер): сравнений,
+    расхождений, ошибок, среднее время основного и теневого, ускорение.
+    """
+    from django.db.models import Avg, Count, Q
+
+    from .models import ShadowComparison
+
+    rows = (
+        ShadowComparison.objects.filter(created_at__gte=since)
+        .values("type_code", "shadow")
+        .annotate(
+            n=Count("id"),
+            diverged_n=Count("id", filter=Q(diverged=True)),
+            errors=Count("id", filter=~Q(error="")),
+            primary_ms=Avg("primary_ms"),
+            shadow_ms=Avg("shadow_ms"),
+        )
+        .order_by("type_code", "shadow")
+    )
+    result = []
+    for row in rows:
+        row["diverged_rate"] = 100 * row["diverged_n"] / row["n"]
+        row["speedup"] = row["primary_ms"] / row["shadow_ms"] if row["shadow_ms"] else None
+        result.append(row)
+    return result
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Агрегированная статистика проверок (страница «Статистика», operator и admin).
+
+Каждая проверка ссылки увеличивает дневные счётчики StatCounter (вид, ключ):
+страница читает их и не сканирует Reference/ReferenceIssue. Исключение —
+частые авторы, журналы и издательства (top_sources): группировка текущих
+ссылок по ключевым колонкам Reference (utils.key_fields) с их индексами.
+Счётчики копятся в памяти внутри batch() и записываются одним upsert'ом
+на выходе; вне batch() — сразу после проверки ссылки.
+
+Два рода счётчиков:
+- проверки — "checked" (по типу) и "user" (по владельцу списка): каждая
+  проверка ссылки, в т.ч. перепроверка с тем же результатом;
+- результаты — "verdict" (по типу), "error", "field", "code", "age": только
+  проверки, изменившие результат ссылки (validators.check_reference), в т.ч.
+  первая; повторная проверка без изменений их не трогает, изменившийся
+  результат учитывается ещё раз. Доли ошибок считаются от "verdict".
+Удаление списка счётчики не уменьшает.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Reference, ReferenceText, StatCounter
+
+# Ключевые колонки Reference для top_sources
+SOURCE_COLUMNS = ("first_author", "journal_title", "publisher")
+
+# Границы групп «возраста» источника (лет от года издания до года проверки)
+AGE_BUCKETS = ((0, 2), (3, 5), (6, 10), (11, 20), (21, None))
+
+_batch = ContextVar("litera_stats_batch", default=None)
+
+
+class _Batch:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.counts = Counter()
+
+
+@contextmanager
+def batch(user_id=None):
+    """
+    Копит счётчики проверок внутри блока и записывает их на выходе.
+    user_id — владелец проверяемого списка (иначе он ищется по каждой ссылке).
+    Вложенный batch() ничего не делает: счётчики попадут во внешний.
+    """
+    if _batch.get() is not None:
+        yield
+        return
+    current = _Batch(user_id)
+    token = _batch.set(current)
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+        flush(current.counts)
+
+
+def count_check(reference, type_code: str, issues, user_id=None, changed: bool = True) -> None:
+    """
+    Учитывает проверку ссылки: тип и пользователь — всегда; если результат
+    изменился (changed) — ещё статус, проблемы (validators.Issue) и возраст
+    источника (reference.year).
+    """
+    current = _batch.get()
+    if user_id is None and current is not None:
+        user_id = current.user_id
+    if user_id is None and reference.reference_text_id:
+        user_id = ReferenceText.objects.filter(pk=reference.reference_text_id).values_list("user_id", flat=True).first()
+
+    day = timezone.localdate()
+    counts = current.counts if current is not None else Counter()
+    type_code = type_code or ""
+    counts[(day, "checked", type_code)] += 1
+    if user_id:
+        counts[(day, "user", str(user_id))] += 1
+    if changed:
+        counts[(day, "verdict", type_code)] += 1
+        if reference.status == "error":
+            counts[(day, "error", type_code)] += 1
+        for issue in issues:
+            counts[(day, "field", f"{type_code}:{issue.field_name}"[:255])] += 1
+            counts[(day, "code", str(issue.code))] += 1
+        if reference.year and reference.year <= day.year:
+            counts[(day, "age", str(day.year - reference.year))] += 1
+
+    if current is None:
+        flush(counts)
+
+
+def flush(counts: Counter) -> None:
+    """Прибавляет counts {(день, вид, ключ): n} к StatCounter."""
+    if not counts:
+        return
+    rows = [(day, kind, key, n) for (day, kind, key), n in counts.items()]
+    if connection.vendor in ("sqlite", "postgresql"):
+        table = connection.ops.quote_name(StatCounter._meta.db_table)
+        key = connection.ops.quote_name("key")
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} (day, kind, {key}, count) VALUES (%s, %s, %s, %s) "
+                f"ON CONFLICT (kind, day, {key}) DO UPDATE SET count = {table}.count + excluded.count",
+                rows,
+            )
+        return
+    for day, kind, key, n in rows:
+        updated = StatCounter.objects.filter(day=day, kind=kind, key=key).update(count=F("count") + n)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    StatCounter.objects.create(day=day, kind=kind, key=key, count=n)
+            except IntegrityError:
+                StatCounter.objects.filter(day=day, kind=kind, key=key).update(count=F("count") + n)
+
+
+def age_bucket(age: int) -> str:
+    """Подпись группы возраста источника: 4 -> "3–5", 30 -> "больше 20"."""
+    for low, high in AGE_BUCKETS:
+        if high is None:
+            return f"больше {low - 1}"
+        if low <= age <= high:
+            return f"{low}–{high}"
+    return ""
+
+
+def top_sources(column: str, limit: int = 10) -> list:
+    """
+    Самые частые значения ключевой колонки Reference (SOURCE_COLUMNS) во всех
+    сохранённых ссылках: [(значение, ссылок, списков)] по убыванию числа ссылок.
+    """
+    if column not in SOURCE_COLUMNS:
+        raise ValueError(f"Нет ключевой колонки {column}")
+    return list(
+        Reference.objects.exclude(**{column: ""})
+        .values(column)
+        .annotate(n=Count("id"), lists=Count("reference_text", distinct=True))
+        .order_by("-n", column)
+        .values_list(column, "n", "lists")[:limit]
+    )
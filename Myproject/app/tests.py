@@ -1,3 +1,1177 @@
-from django.test import TestCase
+import io
+import json
+import marshal
+import os
+import queue
+import re
+import runpy
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from benchmarks import corpus, golden
+from . import (
+    db, impact, issue_codes, metrics, near_duplicates, perf, profiling, runs, sandbox, search, shadow, stats, warmup,
+)
+from .management.commands import check_references, recheck_all
+from .duplicates import clone_results, find_previous_check, list_duplicates, seen_before
+from .models import (
+    PerfRecord, ProfileCapture, ProfilerSettings, Reference, ReferenceField, ReferenceIssue, ReferenceText,
+    ReferenceType, SlowLine, StatCounter,
+)
+from .parsers import PARSER_VERSION, PARSERS_BY_TYPE, SHADOW_PARSERS_BY_TYPE, parse_reference_instance
+from .search import search_references
+from .utils import input_digest, key_fields, normalized_fields, split_reference_lines
+from .validators import Issue, check_reference, is_stale, stale_q, sync_issues, template_versions
+
+_module_context = ExitStack()
+
+
+def setUpModule():
+    # Снимки метрик тестов — во временный каталог, а не в общий каталог сайта
+    _module_context.enter_context(metrics.isolated())
+
+
+def tearDownModule():
+    _module_context.close()
+
+
+class GoldenCorpusTests(SimpleTestCase):
+    """Парсеры дают на эталонном корпусе ровно ожидаемый parsed_data."""
+
+    def test_parsed_data_matches_golden(self):
+        for entry in golden.load_corpus():
+            with self.subTest(type=entry["type"], text=entry["text"][:60]):
+                self.assertEqual(PARSERS_BY_TYPE[entry["type"]](entry["text"]), entry["expected"])
+
+    def test_corpus_covers_every_parser(self):
+        covered = {entry["type"] for entry in golden.load_corpus()}
+        self.assertEqual(covered, set(PARSERS_BY_TYPE))
+
+
+class SyntheticCorpusTests(SimpleTestCase):
+    """Синтетический корпус benchmarks/corpus.py: детерминирован, покрывает все типы, нумеруется как список студента."""
+
+    def test_same_seed_gives_same_corpus(self):
+        self.assertEqual(corpus.generate_corpus(200, seed=7), corpus.generate_corpus(200, seed=7))
+        self.assertNotEqual(corpus.generate_corpus(200, seed=7), corpus.generate_corpus(200, seed=8))
+
+    def test_every_type_is_covered_evenly(self):
+        self.assertEqual(set(corpus.GENERATORS), set(PARSERS_BY_TYPE))
+        items = corpus.generate_corpus(len(PARSERS_BY_TYPE) * 5)
+        counts = {}
+        for item in items:
+            counts[item["type"]] = counts.get(item["type"], 0) + 1
+        self.assertEqual(counts, dict.fromkeys(PARSERS_BY_TYPE, 5))
+        self.assertEqual({item["type"] for item in corpus.generate_corpus(10, types=["BOOK"])}, {"BOOK"})
+
+    def test_broken_ratio_bounds(self):
+        self.assertTrue(all(item["well_formed"] for item in corpus.generate_corpus(50, broken_ratio=0)))
+        self.assertFalse(any(item["well_formed"] for item in corpus.generate_corpus(50, broken_ratio=1)))
+
+    def test_numbered_list_splits_back_into_corpus_lines(self):
+        items = corpus.generate_corpus(30, broken_ratio=0)
+        text = corpus.as_numbered_list(items)
+        lines = text.splitlines()
+        self.assertEqual(len(lines), len(items))
+        for number, (line, item) in enumerate(zip(lines, items), start=1):
+            self.assertEqual(line, f"{number}. {item['text']}")
+        self.assertEqual(split_reference_lines(text), [(number, item["text"]) for number, item in enumerate(items, start=1)])
+
+
+class IssueCatalogTests(SimpleTestCase):
+    """Тексты каталога app/issue_codes.py разбираются обратно в код и параметры (перенос старых сообщений)."""
+
+    def test_render_roundtrip(self):
+        samples = [(code, {"label": "Год", "type_name": "Книга"}) for code in issue_codes.MESSAGES if code != issue_codes.OTHER]
+        for code, params in samples:
+            with self.subTest(code=code):
+                text = issue_codes.render(code, params)
+                parsed_code, parsed_params = issue_codes.from_message(text)
+                self.assertEqual(parsed_code, code)
+                self.assertEqual(issue_codes.render(parsed_code, parsed_params), text)
+
+    def test_unknown_message_kept_as_text(self):
+        self.assertEqual(issue_codes.from_message("Что-то иное."), (issue_codes.OTHER, {"text": "Что-то иное."}))
+        self.assertEqual(issue_codes.render(issue_codes.OTHER, {"text": "Что-то иное."}), "Что-то иное.")
+
+
+# Замер по часам зависит от загрузки машины: в CI не запускается, только явно
+# (LITERA_PERF_TESTS=1 python manage.py test) — перед выпуском и после правки парсеров
+@skipUnless(os.environ.get("LITERA_PERF_TESTS"), "замеры времени: LITERA_PERF_TESTS=1")
+class ParserTimeBudgetTests(SimpleTestCase):
+    """
+    Медиана и p99 каждого парсера на golden-корпусе не хуже бюджета больше чем на допуск.
+    Допуск: LITERA_PERF_TOLERANCE (в процентах) или tolerance_percent из golden/budgets.json.
+    Бюджеты приводятся к скорости текущей машины калибровочной нагрузкой.
+    """
+
+    def test_parsers_within_time_budget(self):
+        violations = golden.verify_budgets()
+        self.assertFalse(violations, "\n".join(violations))
+
+
+# Грубая проверка по умолчанию: p99 не выше десяти бюджетов. Загрузка машины даёт
+# разы, катастрофический бэктрекинг — порядки, поэтому проверка и в CI не шумит
+BACKTRACKING_TOLERANCE_PERCENT = 900
+
+
+class ParserBacktrackingTests(SimpleTestCase):
+    """p99 каждого парсера на golden-корпусе — в пределах бюджета с десятикратным запасом."""
+
+    def test_no_parser_is_orders_of_magnitude_slower(self):
+        violations = golden.verify_budgets(tolerance=BACKTRACKING_TOLERANCE_PERCENT, metrics=("p99_us",), repeats=5)
+        self.assertFalse(violations, "\n".join(violations))
+
+    def test_slow_parser_is_reported(self):
+        parse_book = PARSERS_BY_TYPE["BOOK"]
+
+        def slow_book(text):
+            time.sleep(0.005)
+            return parse_book(text)
+
+        with mock.patch.dict(PARSERS_BY_TYPE, {"BOOK": slow_book}):
+            violations = golden.verify_budgets(attempts=1, tolerance=BACKTRACKING_TOLERANCE_PERCENT, metrics=("p99_us",), repeats=2)
+        self.assertEqual([line.split(":")[0] for line in violations], ["BOOK"])
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN — формат SQLite")
+class QueryPlanTests(TestCase):
+    """
+    Запросы страниц проверки к Reference, ReferenceIssue и ReferenceText идут по
+    индексам: без полного сканирования таблицы и без временного B-дерева для сортировки.
+    """
+
+    HOT_TABLES = ("app_reference", "app_referenceissue", "app_referencetext")
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("student", password="x")
+        cls.user.groups.add(Group.objects.get_or_create(name="user")[0])
+        cls.operator = User.objects.create_user("operator", password="x")
+        cls.operator.groups.add(Group.objects.get_or_create(name="operator")[0])
+        book = ReferenceType.objects.get(code="BOOK")
+        cls.lists = []
+        for owner in (cls.user, cls.operator, cls.user):
+            reference_text = ReferenceText.objects.create(input_text="1. Иванов, И. И. Книга. – Москва, 2020. – 10 с.", user=owner)
+            for i in range(5):
+                raw_text = f"Иванов, И. И. Книга {i}. – Москва, 2020. – 10 с."
+                ref = Reference.objects.create(
+                    reference_text=reference_text, raw_text=raw_text, reference_type=book, status="error",
+                    **normalized_fields(raw_text),
+                )
+                ReferenceIssue.objects.create(
+                    reference=ref, field_name="year", severity="warning", code=issue_codes.BAD_FORMAT, params={"label": "Год"},
+                )
+                ReferenceIssue.objects.create(
+                    reference=ref, field_name="pages", severity="error", code=issue_codes.REQUIRED_MISSING, params={"label": "Страницы"},
+                )
+            cls.lists.append(reference_text)
+
+    def setUp(self):
+        # Таблицы из кэша фрагментов пропускают запросы, планы которых здесь проверяются
+        caches["fragments"].clear()
+
+    def _plan_problems(self, queries) -> list:
+        problems = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query["sql"]
+                if not sql.startswith("SELECT") or not any(f'"{table}"' in sql for table in self.HOT_TABLES):
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    full_scan = re.match(r"SCAN (\w+)$", detail) and detail.split()[1] in self.HOT_TABLES
+                    if full_scan or "USE TEMP B-TREE" in detail:
+                        problems.append(f"{detail}\n    {sql}")
+        return problems
+
+    def _assert_indexed(self, user, method, url, data=None):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertLess(response.status_code, 400)
+        problems = self._plan_problems(ctx.captured_queries)
+        self.assertFalse(problems, "\n".join(problems))
+
+    def test_check_list_user(self):
+        self._assert_indexed(self.user, "get", reverse("check_list"))
+
+    def test_check_list_operator(self):
+        self._assert_indexed(self.operator, "get", reverse("check_list"))
+
+    def test_check_list_verify(self):
+        self._assert_indexed(self.user, "get", reverse("check_list_verify", args=[self.lists[0].pk]))
+
+    def test_check_all(self):
+        reference_text = self.lists[0]
+        data = {"action": "check_all"}
+        for ref in reference_text.references.all():
+            data[f"reference_type_{ref.pk}"] = str(ref.reference_type_id)
+        self._assert_indexed(self.user, "post", reverse("check_list_verify", args=[reference_text.pk]), data)
+
+    def test_reference_errors(self):
+        ref = self.lists[0].references.first()
+        self._assert_indexed(self.user, "get", reverse("reference_errors", args=[ref.pk]))
+
+
+class PageCacheTests(TestCase):
+    """Условный GET и кэш фрагментов страниц проверки списка и ошибок ссылки (app/page_cache.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("student", password="x")
+        cls.user.groups.add(Group.objects.get_or_create(name="user")[0])
+        book = ReferenceType.objects.get(code="BOOK")
+        cls.reference_text = ReferenceText.objects.create(input_text="Иванов, И. И. Книга. – Москва, 2020. – 10 с.", user=cls.user)
+        raw_text = "Иванов, И. И. Книга. – Москва, 2020. – 10 с."
+        cls.reference = Reference.objects.create(
+            reference_text=cls.reference_text, raw_text=raw_text, reference_type=book, **normalized_fields(raw_text),
+        )
+
+    def setUp(self):
+        caches["fragments"].clear()
+        self.client.force_login(self.user)
+        self.url = reverse("check_list_verify", args=[self.reference_text.pk])
+        # Первый ответ ставит cookie CSRF, а она входит в ETag
+        self.client.get(self.url)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        errors_url = reverse("reference_errors", args=[self.reference.pk])
+        errors_etag = self.client.get(errors_url)["ETag"]
+        self.assertEqual(self.client.get(errors_url, HTTP_IF_NONE_MATCH=errors_etag).status_code, 304)
+
+    def test_check_changes_version(self):
+        etag = self.client.get(self.url)["ETag"]
+        data = {"action": "check_all", f"reference_type_{self.reference.pk}": str(self.reference.reference_type_id)}
+        self.client.post(self.url, data)
+        # Страница с сообщением о проверке — без условного GET, следующая — с новой версией
+        self.assertFalse(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).has_header("ETag"))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertContains(response, "status-error")
+
+    def test_stale_reference_is_rechecked_not_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        Reference.objects.filter(pk=self.reference.pk).update(status="ok", parser_version="старая")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.reference.refresh_from_db()
+        self.assertEqual(self.reference.parser_version, PARSER_VERSION)
+        etag = self.client.get(self.url)["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_clone_offer_changes_version(self):
+        text = "Петров, П. П. Статья // Журнал. – 2021. – № 1."
+        empty = ReferenceText.objects.create(input_text=text, input_hash=input_digest(text), user=self.user)
+        url = reverse("check_list_verify", args=[empty.pk])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Тот же текст проверен в другом списке: страница должна предложить копию
+        source = ReferenceText.objects.create(input_text=text, input_hash=empty.input_hash, user=self.user)
+        Reference.objects.create(reference_text=source, raw_text=text, **normalized_fields(text))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Использовать результаты прошлой проверки")
+
+    def test_fragments_skip_listing_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertContains(response, "Книга")
+        self.assertFalse([q["sql"] for q in ctx.captured_queries if '"app_referenceissue"' in q["sql"]])
+
+
+class PreviousCheckTests(TestCase):
+    """Повторная отправка списка: копируются результаты только того же текста ссылок (app/duplicates.py)."""
+
+    TEXT = "1. Иванов, И. И. Книга. – Москва, 2020. – 10 с.\n2. Петров, П. П. Статья // Журнал. – 2021. – № 1."
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("student", password="x")
+        cls.source = cls._create(cls.TEXT)
+        book = ReferenceType.objects.get(code="BOOK")
+        for _, raw_text in split_reference_lines(cls.TEXT):
+            ref = Reference.objects.create(
+                reference_text=cls.source, raw_text=raw_text, reference_type=book, status="error",
+                **normalized_fields(raw_text),
+            )
+            ReferenceIssue.objects.create(
+                reference=ref, field_name="pages", severity="error", code=issue_codes.REQUIRED_MISSING, params={"label": "Страницы"},
+            )
+
+    @classmethod
+    def _create(cls, text):
+        return ReferenceText.objects.create(input_text=text, input_hash=input_digest(text), user=cls.user)
+
+    def test_same_list_with_other_numbering_and_spaces(self):
+        target = self._create("Иванов,  И. И. Книга. – Москва, 2020. – 10 с.\n\n  Петров, П. П. Статья // Журнал. – 2021. – № 1.")
+        self.assertEqual(find_previous_check(target), self.source)
+
+        self.assertEqual(clone_results(self.source, target), 2)
+        self.assertEqual(target.references.count(), 2)
+        self.assertEqual(ReferenceIssue.objects.filter(reference__reference_text=target).count(), 2)
+
+    def test_punctuation_fix_is_a_new_list(self):
+        fixed = self.TEXT.replace("Книга. – Москва", "Книга / И. И. Иванов. – Москва")
+        self.assertIsNone(find_previous_check(self._create(fixed)))
+        self.assertIsNone(find_previous_check(self._create(self.TEXT.replace(" – 10 с.", " 10 с"))))
+
+
+class CheckReferenceTests(TestCase):
+    """validators.check_reference: изменившийся результат, перепроверка без изменений, версии."""
+
+    RAW = "Иванов, И. И. Книга. – Москва, 2020. – 10 с."
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("student", password="x")
+        reference_text = ReferenceText.objects.create(input_text=cls.RAW, user=cls.user)
+        cls.reference = Reference.objects.create(
+            reference_text=reference_text, raw_text=cls.RAW, reference_type=ReferenceType.objects.get(code="BOOK"),
+            **normalized_fields(cls.RAW),
+        )
+
+    def _count(self, kind):
+        return sum(StatCounter.objects.filter(kind=kind).values_list("count", flat=True))
+
+    def test_version_bump_is_not_a_change(self):
+        self.assertTrue(check_reference(self.reference))
+        Reference.objects.filter(pk=self.reference.pk).update(parser_version="old", template_version="old")
+        reference = Reference.objects.select_related("reference_type").get(pk=self.reference.pk)
+        self.assertTrue(is_stale(reference, template_versions()))
+        verdicts_before = self._count("verdict")
+
+        self.assertFalse(check_reference(reference))
+        self.assertEqual(self._count("verdict"), verdicts_before)
+        reference.refresh_from_db()
+        self.assertFalse(is_stale(reference, template_versions()))
+
+    def test_every_check_is_counted(self):
+        self.assertTrue(check_reference(self.reference))
+        self.assertFalse(check_reference(self.reference))
+        self.assertEqual((self._count("checked"), self._count("user"), self._count("verdict")), (2, 2, 1))
+
+
+class MetricsTests(TestCase):
+    """Снимки метрик процессов: сумма по всем процессам, перенос снимков завершившихся (app/metrics.py)."""
+
+    def _value(self):
+        return metrics.collect()["litera_references_checked_total"].get(json.dumps(["test"]), 0)
+
+    def test_snapshots_of_finished_processes_are_merged_once(self):
+        metrics.REFERENCES_CHECKED.inc("test")
+        self.assertEqual(self._value(), 1)
+
+        finished = metrics.metrics_dir() / "metrics-999999-finished.json"
+        finished.write_text(json.dumps({"litera_references_checked_total": {json.dumps(["test"]): 2}}), encoding="utf-8")
+        self.assertEqual(self._value(), 3)
+        if metrics.fcntl is not None:
+            self.assertFalse(finished.exists())
+            self.assertTrue((metrics.metrics_dir() / metrics.RETIRED).exists())
+        self.assertEqual(self._value(), 3)
+
+    def test_gauges_of_finished_processes_are_dropped(self):
+        if metrics.fcntl is None:
+            self.skipTest("без fcntl снимки завершившихся процессов не переносятся")
+        metrics.SHADOW_QUEUE_DEPTH.set(2)
+        finished = metrics.metrics_dir() / "metrics-999998-finished.json"
+        finished.write_text(json.dumps({"litera_shadow_queue_depth": {"[]": 5}}), encoding="utf-8")
+        self.assertEqual(metrics.collect()["litera_shadow_queue_depth"], {"[]": 2})
+        self.assertIn("litera_shadow_queue_depth 2", metrics.render())
+
+    def test_metrics_require_login_from_loopback(self):
+        self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="127.0.0.1").status_code, 403)
+
+
+class SlowLineTests(TestCase):
+    """Медленные строки: парсер в БД не пишет, SlowLine заполняется после ответа (app/perf.py)."""
+
+    def test_saved_after_request_only(self):
+        stats, token = perf.start_request(slow_lines_limit=2)
+        try:
+            for ms in (5, 30, 50):
+                perf.record_parse("BOOK", ms / 1000, f"Строка {ms}")
+            self.assertFalse(SlowLine.objects.exists())
+        finally:
+            perf.finish_request(token)
+        with self.settings(LITERA_SLOW_LINE_MS=20):
+            perf.save_slow_lines(stats)
+            perf.save_slow_lines(stats)
+        self.assertEqual(
+            sorted(SlowLine.objects.values_list("text", "hits")), [("Строка 30", 2), ("Строка 50", 2)],
+        )
+
+
+class ShadowTests(TestCase):
+    """Теневой парсер: доля строк, разбор и запись в фоновом потоке, не в пути разбора."""
+
+    def setUp(self):
+        self.threads = []
+        self.saved = []
+        book = ReferenceType.objects.get(code="BOOK")
+        self.reference = Reference(reference_type=book, raw_text="Иванов, И. И. Методы анализа данных. – Москва : Наука, 2020. – 120 с.")
+
+        def shadow_parser(text):
+            self.threads.append(threading.current_thread())
+            return {"title": "другое"}
+
+        patcher = mock.patch.dict(SHADOW_PARSERS_BY_TYPE, {"BOOK": shadow_parser})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Запись из фонового потока в БД теста (транзакция TestCase) не проверяется
+        saver = mock.patch.object(shadow, "save", side_effect=self.saved.extend)
+        saver.start()
+        self.addCleanup(saver.stop)
+
+    def test_sampled_line_parsed_in_background(self):
+        with self.settings(LITERA_SHADOW_SAMPLE_RATE=1.0):
+            data = parse_reference_instance(self.reference)
+            shadow.wait()
+        self.assertEqual(len(self.threads), 1)
+        self.assertIsNot(self.threads[0], threading.current_thread())
+        self.assertEqual(len(self.saved), 1)
+        self.assertTrue(self.saved[0].diverged)
+        self.assertEqual(self.saved[0].diff["title"], [str(data.get("title") or "").strip(), "другое"])
+
+    def test_full_queue_drops_are_counted(self):
+        full = queue.Queue(maxsize=1)
+        full.put_nowait(None)
+        dropped = metrics.SHADOW_DROPPED.values.get(("BOOK",), 0)
+        with self.settings(LITERA_SHADOW_SAMPLE_RATE=1.0), mock.patch.object(shadow, "_ensure_worker", return_value=full):
+            self.assertFalse(shadow.submit("BOOK", SHADOW_PARSERS_BY_TYPE["BOOK"], self.reference.raw_text, {}, 0.001))
+        self.assertEqual(metrics.SHADOW_DROPPED.values[("BOOK",)], dropped + 1)
+        self.assertEqual(metrics.SHADOW_QUEUE_DEPTH.values[()], 1)
+        self.assertEqual(self.threads, [])
+
+    def test_not_sampled(self):
+        with self.settings(LITERA_SHADOW_SAMPLE_RATE=0.0):
+            parse_reference_instance(self.reference)
+            shadow.wait()
+        self.assertEqual(self.threads, [])
+        self.assertEqual(self.saved, [])
+
+
+class KeyFieldTests(TestCase):
+    """Фильтры поиска и частые источники по ключевым колонкам Reference (utils.key_fields)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.operator = User.objects.create_user("operator", password="x")
+        cls.operator.groups.add(Group.objects.get_or_create(name="operator")[0])
+        rows = [
+            ("Иванов, И. И. Статья // Вестник. – 2010. – № 1.", {"authors": "Иванов, И. И.", "journal_title": "Вестник", "year": "2010"}),
+            ("Иванов, И. И. Статья 2 // Вестник. – 2021. – № 2.", {"authors": "Иванов, И. И.", "journal_title": "Вестник", "year": "2021"}),
+            ("Петров, П. П. Книга. – Москва : Наука, 2015. – 10 с.", {"authors": "Петров, П. П.", "publisher": "Наука", "year": "2015"}),
+        ]
+        for number, (raw_text, data) in enumerate(rows):
+            text = ReferenceText.objects.create(input_text=raw_text, user=cls.operator)
+            Reference.objects.create(
+                reference_text=text, raw_text=raw_text, parsed_data=data, status="ok",
+                **key_fields(data), **normalized_fields(raw_text),
+            )
+
+    def test_search_by_key_columns_without_text(self):
+        self.client.force_login(self.operator)
+        url = reverse("reference_search")
+        self.assertEqual(self.client.get(url, {"journal": "Вестник"}).context["total"], 2)
+        self.assertEqual(self.client.get(url, {"author": "Иванов", "year_from": "2015"}).context["total"], 1)
+        self.assertEqual(self.client.get(url, {"q": "Книга", "publisher": "Наука"}).context["total"], 1)
+        self.assertEqual(self.client.get(url, {"q": "Книга", "publisher": "Наука", "year_to": "2014"}).context["total"], 0)
+
+    def test_top_sources(self):
+        self.assertEqual(stats.top_sources("journal_title"), [("Вестник", 2, 2)])
+        self.assertEqual(stats.top_sources("first_author"), [("Иванов", 2, 2), ("Петров", 1, 1)])
+        with self.assertRaises(ValueError):
+            stats.top_sources("raw_text")
+
+
+@skipUnless(connection.vendor == "sqlite", "FTS5 есть только на SQLite")
+class SearchIndexTests(TestCase):
+    """Индекс app_reference_fts следует за ссылками через триггеры (search.FTS_TRIGGERS, миграции 0019, 0026)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reference_text = ReferenceText.objects.create(input_text="—", user=User.objects.create_user("student"))
+
+    def _found(self, text):
+        return [ref.pk for ref in search_references(text)[1]]
+
+    def test_insert_update_delete(self):
+        raw_text = "Сидоров, С. С. Ёлки. – Москва, 2020. – 10 с."
+        ref = Reference.objects.create(reference_text=self.reference_text, raw_text=raw_text, **normalized_fields(raw_text))
+        self.assertEqual(self._found("Сидоров"), [ref.pk])
+        self.assertEqual(self._found("елки"), [ref.pk])
+
+        Reference.objects.filter(pk=ref.pk).update(parsed_data={"publisher": "Наука"})
+        self.assertEqual(self._found("Наука"), [ref.pk])
+        Reference.objects.filter(pk=ref.pk).update(raw_text="Кузнецов, К. К. Сосны. – 2021.")
+        self.assertEqual(self._found("Сидоров"), [])
+        self.assertEqual(self._found("Кузн"), [ref.pk])
+
+        ref.delete()
+        self.assertEqual(self._found("Кузнецов"), [])
+
+    def test_dropped_triggers_are_restored_after_migrate(self):
+        # Так их удаляет миграция, пересоздающая app_reference
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER app_reference_fts_ai")
+        raw_text = "Сидоров, С. С. Ёлки. – Москва, 2020. – 10 с."
+        ref = Reference.objects.create(reference_text=self.reference_text, raw_text=raw_text, **normalized_fields(raw_text))
+        self.assertEqual(self._found("Сидоров"), [])
+
+        self.assertEqual(search.ensure_fts_triggers(verbosity=0), ["app_reference_fts_ai"])
+        self.assertEqual(self._found("Сидоров"), [ref.pk])
+        self.assertEqual(search.ensure_fts_triggers(verbosity=0), [])
+        other = Reference.objects.create(reference_text=self.reference_text, raw_text="Кузнецов, К. К. Сосны. – 2021.")
+        self.assertEqual(self._found("Кузнецов"), [other.pk])
+
+
+class WarmupTests(SimpleTestCase):
+    """Прогрев (app/warmup.py) и адрес gunicorn по умолчанию."""
+
+    def test_parsers_warm_up_without_benchmarks(self):
+        with mock.patch.dict(sys.modules, {"benchmarks": None, "benchmarks.golden": None}):
+            warmup._warm_parsers()
+        # Строка каждого типа действительно разбирается своим парсером
+        covered = {code for code, parser in PARSERS_BY_TYPE.items() if any(parser(text) for text in warmup.WARMUP_LINES)}
+        self.assertEqual(covered, set(PARSERS_BY_TYPE))
+
+    def test_gunicorn_binds_loopback_by_default(self):
+        path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py")
+        env = {key: value for key, value in os.environ.items() if key not in ("PORT", "GUNICORN_BIND")}
+        with mock.patch.dict(os.environ, env, clear=True):
+            self.assertEqual(runpy.run_path(path)["bind"], "127.0.0.1:8000")
+        with mock.patch.dict(os.environ, {**env, "PORT": "10000"}, clear=True):
+            self.assertEqual(runpy.run_path(path)["bind"], "0.0.0.0:10000")
+
+
+class SqlitePragmaTests(SimpleTestCase):
+    """PRAGMA SQLite (app/db.py): в SQL попадают только имена и значения из ALLOWED_PRAGMAS."""
+
+    def test_allowlist(self):
+        with self.settings(LITERA_SQLITE_PRAGMAS={"synchronous": "full", "journal_mode": None, "cache_size": 2000}):
+            self.assertEqual(db.sqlite_pragmas()["synchronous"], "FULL")
+            self.assertNotIn("journal_mode", db.sqlite_pragmas())
+            self.assertEqual(db.check_sqlite_pragmas(), [])
+        for pragmas in ({"synchronous": "NORMAL; DROP TABLE app_reference"}, {"writable_schema": "ON"}, {"busy_timeout": "5000"}):
+            with self.settings(LITERA_SQLITE_PRAGMAS=pragmas):
+                self.assertEqual([message.id for message in db.check_sqlite_pragmas()], ["litera.E001"])
+
+    def test_journal_mode_not_set_per_connection(self):
+        executed = []
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def execute(self, sql):
+                executed.append(sql)
+
+        connection = mock.Mock(vendor="sqlite", cursor=Cursor)
+        db.configure_connection(None, connection)
+        self.assertTrue(executed)
+        self.assertFalse([sql for sql in executed if "journal_mode" in sql])
+
+
+class CheckReferencesCommandTests(TestCase):
+    """Команда check_references: прерванный запуск продолжается с необработанных файлов."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        (self.dir / "a.txt").write_text("1. Иванов, И. И. Книга. – Москва, 2020. – 10 с.\n", encoding="utf-8")
+        (self.dir / "b.txt").write_text("1. Петров, П. П. Статья // Журнал. – 2021. – № 1. – С. 1–2.\n", encoding="utf-8")
+        self.output = self.dir / "report.json"
+
+    def _run(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command(
+            "check_references", str(self.dir), "--workers", "1", "--output", str(self.output), *args, stdout=out, stderr=err,
+        )
+        return out.getvalue() + err.getvalue()
+
+    def _report_files(self):
+        return sorted(Path(entry["file"]).name for entry in json.loads(self.output.read_text(encoding="utf-8")))
+
+    def _fail_on_second(self, name):
+        """Подмена метода Command: второй вызов прерывает запуск (после первого вызова, как Ctrl+C)."""
+        original = getattr(check_references.Command, name)
+        calls = []
+
+        def fail_on_second(command, *args):
+            calls.append(args)
+            if len(calls) > 1:
+                raise KeyboardInterrupt
+            return original(command, *args)
+
+        return mock.patch.object(check_references.Command, name, fail_on_second)
+
+    def test_resume_after_interruption(self):
+        with self._fail_on_second("_append_report"), self.assertRaises(KeyboardInterrupt):
+            self._run()
+        self.assertFalse(self.output.exists())
+
+        # Второй файл отмечен обработанным, но записи отчёта нет: проверяется заново
+        original = check_references.Command._run
+        with mock.patch.object(check_references.Command, "_run", autospec=True, side_effect=original) as run:
+            output = self._run()
+        self.assertIn("пропущено уже обработанных файлов — 2", output)
+        self.assertEqual([path.name for path in run.call_args.args[1]], ["b.txt"])
+        self.assertEqual(self._report_files(), ["a.txt", "b.txt"])
+        self.assertFalse((self.dir / "report.json.state.json").exists())
+
+    def test_saved_once_when_interrupted_after_commit(self):
+        # Транзакция второго файла зафиксирована, состояние записать не успели
+        original = check_references.Command._save_file
+        saved = []
+
+        def save_then_fail(command, path, *args):
+            original(command, path, *args)
+            saved.append(path.name)
+            if len(saved) > 1:
+                raise KeyboardInterrupt
+
+        with mock.patch.object(check_references.Command, "_save_file", save_then_fail), self.assertRaises(KeyboardInterrupt):
+            self._run("--save")
+        self.assertEqual(ReferenceText.objects.count(), 2)
+
+        self._run("--save")
+        self.assertEqual(sorted(ReferenceText.objects.values_list("title", flat=True)), ["a.txt", "b.txt"])
+        self.assertEqual(Reference.objects.count(), 2)
+        self.assertEqual(self._report_files(), ["a.txt", "b.txt"])
+
+    def test_undecodable_file_is_skipped(self):
+        (self.dir / "c.txt").write_bytes("1. Сидоров, С. С. Книга. – 2020.\n".encode("cp1251"))
+        output = self._run()
+        self.assertIn("c.txt: пропущен — не читается в кодировке utf-8-sig", output)
+        self.assertIn("Пропущено файлов, не прочитанных в кодировке utf-8-sig: 1", output)
+        self.assertEqual(self._report_files(), ["a.txt", "b.txt"])
+
+
+class RecheckAllCommandTests(TestCase):
+    """Команда recheck_all: продолжение после прерывания с id > последнего записанного."""
+
+    @classmethod
+    def setUpTestData(cls):
+        reference_text = ReferenceText.objects.create(input_text="—", user=User.objects.create_user("student"))
+        book = ReferenceType.objects.get(code="BOOK")
+        raw_text = "Иванов, И. И. Книга. – Москва, 2020. – 10 с."
+        cls.ids = [
+            Reference.objects.create(
+                reference_text=reference_text, raw_text=raw_text, reference_type=book, status="ok",
+                parser_version="старая", **normalized_fields(raw_text),
+            ).pk
+            for _ in range(3)
+        ]
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.state = Path(tmp.name) / "state.json"
+
+    def _run(self, *args):
+        out = io.StringIO()
+        call_command("recheck_all", "--workers", "1", "--chunk-size", "1", "--state", str(self.state), *args, stdout=out)
+        return out.getvalue()
+
+    def test_resume_after_interruption(self):
+        original = recheck_all.Command._store
+        stored = []
+
+        def store_then_fail(command, rows, *args):
+            if stored:
+                raise KeyboardInterrupt
+            stored.extend(row[0] for row in rows)
+            return original(command, rows, *args)
+
+        with mock.patch.object(recheck_all.Command, "_store", store_then_fail):
+            with self.assertRaises(KeyboardInterrupt):
+                self._run("--stale-only")
+        self.assertEqual(stored, self.ids[:1])
+        self.assertEqual(json.loads(self.state.read_text(encoding="utf-8"))["last_id"], self.ids[0])
+
+        # Прогресс хранится для тех же фильтров
+        with self.assertRaises(CommandError):
+            self._run()
+
+        with mock.patch.object(recheck_all.Command, "_store", autospec=True, side_effect=original) as store:
+            output = self._run("--stale-only")
+        self.assertIn(f"Продолжение с id > {self.ids[0]}", output)
+        self.assertEqual([call.args[1][0][0] for call in store.call_args_list], self.ids[1:])
+        self.assertEqual(set(Reference.objects.values_list("parser_version", flat=True)), {PARSER_VERSION})
+        self.assertFalse(self.state.exists())
+
+
+class StatsRollupTests(TestCase):
+    """Счётчики StatCounter (app/stats.py): накопление в batch(), upsert, страница «Статистика»."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.operator = User.objects.create_user("operator", password="x")
+        cls.operator.groups.add(Group.objects.get_or_create(name="operator")[0])
+        cls.reference_text = ReferenceText.objects.create(input_text="—", user=cls.operator)
+
+    def _reference(self, status, year):
+        return Reference(reference_text=self.reference_text, status=status, year=year)
+
+    def _counts(self):
+        return {(kind, key): n for kind, key, n in StatCounter.objects.values_list("kind", "key", "count")}
+
+    def test_reference_type_list_loads_only_types_and_fields(self):
+        self.client.force_login(self.operator)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("reference_type_list"))
+        self.assertContains(response, "Заглавие")
+        tables = [q["sql"] for q in ctx.captured_queries if '"app_reference' in q["sql"]]
+        self.assertFalse([sql for sql in tables if 'FROM "app_reference"' in sql or '"app_referenceissue"' in sql])
+        self.assertEqual(len([sql for sql in tables if 'FROM "app_referencefield"' in sql]), 1)
+        self.assertEqual(len([sql for sql in tables if 'FROM "app_referencetype"' in sql]), 1)
+
+    def test_batch_writes_once_and_adds_up(self):
+        issue = Issue("pages", "error", issue_codes.REQUIRED_MISSING, {"label": "Страницы"})
+        this_year = timezone.localdate().year
+        with CaptureQueriesContext(connection) as ctx:
+            with stats.batch(user_id=self.operator.pk):
+                stats.count_check(self._reference("error", this_year - 4), "BOOK", [issue])
+                stats.count_check(self._reference("ok", None), "BOOK", [], changed=False)
+                self.assertFalse(StatCounter.objects.exists())
+        self.assertEqual(len([q for q in ctx.captured_queries if "INSERT" in q["sql"]]), 1)
+        stats.count_check(self._reference("ok", None), "BOOK", [])
+
+        self.assertEqual(self._counts(), {
+            ("checked", "BOOK"): 3,
+            ("user", str(self.operator.pk)): 3,
+            ("verdict", "BOOK"): 2,
+            ("error", "BOOK"): 1,
+            ("field", "BOOK:pages"): 1,
+            ("code", str(issue_codes.REQUIRED_MISSING)): 1,
+            ("age", "4"): 1,
+        })
+
+    def test_dashboard_reads_counters(self):
+        day = timezone.localdate()
+        StatCounter.objects.bulk_create([
+            StatCounter(day=day, kind="checked", key="BOOK", count=10),
+            StatCounter(day=day, kind="verdict", key="BOOK", count=4),
+            StatCounter(day=day, kind="error", key="BOOK", count=1),
+            StatCounter(day=day - timedelta(days=400), kind="checked", key="BOOK", count=99),
+        ])
+        self.client.force_login(self.operator)
+        context = self.client.get(reverse("stats_dashboard"), {"days": 30}).context
+        self.assertEqual((context["total_checked"], context["total_verdicts"], context["total_errors"]), (10, 4, 1))
+        self.assertEqual(context["by_type"][0]["error_rate"], 25)
+
+
+class IssueUpsertTests(TestCase):
+    """validators.sync_issues: в БД меняется только разница между сохранёнными и новыми проблемами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        reference_text = ReferenceText.objects.create(input_text="—")
+        cls.reference = Reference.objects.create(reference_text=reference_text, raw_text="—", status="error")
+
+    def _stored(self):
+        return {(i.field_name, i.code): (i.pk, i.params) for i in ReferenceIssue.objects.filter(reference=self.reference)}
+
+    def test_only_difference_is_written(self):
+        year = Issue("year", "error", issue_codes.REQUIRED_MISSING, {"label": "Год"})
+        pages = Issue("pages", "warning", issue_codes.BAD_FORMAT, {"label": "Страницы"})
+        self.assertTrue(sync_issues(self.reference, [year, pages]))
+        before = self._stored()
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertFalse(sync_issues(self.reference, [pages, year]))
+        self.assertEqual(len(ctx.captured_queries), 1)  # только чтение сохранённых
+        self.assertEqual(self._stored(), before)
+
+        # Новые params — UPDATE той же строки; пропавшая проблема удаляется, новая вставляется
+        url = Issue("url", "error", issue_codes.ONLINE_NO_URL_OR_CARRIER, None)
+        self.assertTrue(sync_issues(self.reference, [year._replace(params={"label": "Год издания"}), url]))
+        after = self._stored()
+        self.assertEqual(after[("year", issue_codes.REQUIRED_MISSING)], (before[("year", issue_codes.REQUIRED_MISSING)][0], {"label": "Год издания"}))
+        self.assertNotIn(("pages", issue_codes.BAD_FORMAT), after)
+        self.assertIn(("url", issue_codes.ONLINE_NO_URL_OR_CARRIER), after)
+
+
+class StaleDetectionTests(TestCase):
+    """Устаревшие результаты (validators.is_stale/stale_q) и ленивая перепроверка при открытии списка."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("student", password="x")
+        cls.reference_text = ReferenceText.objects.create(input_text="—", user=cls.user)
+        versions = template_versions()
+        book = ReferenceType.objects.get(code="BOOK")
+        raw_text = "Иванов, И. И. Книга. – Москва, 2020. – 10 с."
+        cases = {
+            "new": dict(status="new", reference_type=book),
+            "current": dict(status="ok", reference_type=book, parser_version=PARSER_VERSION, template_version=versions[book.pk]),
+            "old_parser": dict(status="ok", reference_type=book, parser_version="старая", template_version=versions[book.pk]),
+            "old_template": dict(status="error", reference_type=book, parser_version=PARSER_VERSION, template_version="старый"),
+            "untyped": dict(status="error", parser_version=PARSER_VERSION, template_version=versions[None]),
+        }
+        cls.refs = {
+            name: Reference.objects.create(reference_text=cls.reference_text, raw_text=raw_text, **normalized_fields(raw_text), **fields)
+            for name, fields in cases.items()
+        }
+
+    def test_is_stale_matches_stale_q(self):
+        versions = template_versions()
+        stale = {ref.pk for ref in self.refs.values() if is_stale(ref, versions)}
+        self.assertEqual(stale, {self.refs["old_parser"].pk, self.refs["old_template"].pk})
+        self.assertEqual(set(Reference.objects.filter(stale_q(versions)).values_list("pk", flat=True)), stale)
+
+    def test_field_edit_makes_type_stale(self):
+        book = self.refs["current"].reference_type
+        book.fields.create(name="isbn", label="ISBN", pattern="")
+        versions = template_versions()
+        self.assertTrue(is_stale(Reference.objects.get(pk=self.refs["current"].pk), versions))
+        self.assertFalse(is_stale(self.refs["untyped"], versions))
+
+    def test_verify_page_rechecks_within_limit(self):
+        self.client.force_login(self.user)
+        with self.settings(LITERA_LAZY_RECHECK_LIMIT=1):
+            response = self.client.get(reverse("check_list_verify", args=[self.reference_text.pk]))
+        self.assertEqual((response.context["rechecked_count"], response.context["stale_left"]), (1, 1))
+        self.assertEqual(Reference.objects.filter(stale_q(template_versions())).count(), 1)
+
+
+class FieldImpactTests(TestCase):
+    """Пробная проверка правки поля (impact.field_change_impact): счётчики по сохранённому parsed_data."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("student", password="x")
+        reference_text = ReferenceText.objects.create(input_text="—", user=user)
+        cls.book = ReferenceType.objects.get(code="BOOK")
+        base = {"authors": "Иванов И. И.", "title": "Книга", "place": "Москва", "publisher": "Наука", "year": "2020", "pages": "10 с."}
+        samples = [
+            ("ok", {**base, "document_type": "монография"}),  # без изменений
+            ("ok", base),                                       # получит ошибку
+            ("error", {**base, "title": ""}),                   # ошибка останется, проблем станет больше
+            ("error", {**base, "title": "", "document_type": "монография"}),  # без изменений
+            ("new", base),                                      # не проверялась — не в счёт
+        ]
+        for status, data in samples:
+            Reference.objects.create(
+                reference_text=reference_text, raw_text="—", reference_type=cls.book, status=status, parsed_data=data
+            )
+
+    def _required_document_type(self):
+        return ReferenceField(reference_type=self.book, name="document_type", label="Тип документа", required=True, pattern=r".+")
+
+    def test_counts_without_saving(self):
+        fields_before = list(self.book.fields.values_list("name", "required"))
+        result = impact.field_change_impact(self.book, self._required_document_type())
+        self.assertEqual(
+            {key: result[key] for key in ("total", "sampled", "gain_error", "lose_error", "issues_changed")},
+            {"total": 4, "sampled": 4, "gain_error": 1, "lose_error": 0, "issues_changed": 1},
+        )
+        self.assertNotIn("estimate", result)
+        self.assertEqual(list(self.book.fields.values_list("name", "required")), fields_before)
+
+    def test_dropping_required_loses_error(self):
+        field = ReferenceField(reference_type=self.book, name="title", label="Заглавие", required=False, pattern=r".+")
+        result = impact.field_change_impact(self.book, field)
+        self.assertEqual((result["gain_error"], result["lose_error"], result["issues_changed"]), (0, 2, 0))
+
+    def test_sample_is_scaled_to_total(self):
+        with self.settings(LITERA_IMPACT_SAMPLE=2):
+            result = impact.field_change_impact(self.book, self._required_document_type())
+        # Последние две проверенные ссылки: одна с прибавленной проблемой, одна без изменений
+        self.assertEqual((result["total"], result["sampled"], result["issues_changed"]), (4, 2, 1))
+        self.assertEqual(result["estimate"], {"gain_error": 0, "lose_error": 0, "issues_changed": 2})
+
+
+class SandboxTests(SimpleTestCase):
+    """Песочница шаблонов: прогон в отдельном процессе под бюджетом времени (sandbox.run_sandbox)."""
+
+    TASK = {"mode": "extract", "candidate": r"(a+)+$", "field_name": "title", "current_pattern": ""}
+
+    def test_report_for_finished_run(self):
+        sample = [(1, "aaa", "BOOK", {"title": "aaa"}), (2, "bbb", "BOOK", {"title": "bbb"})]
+        report = sandbox.run_sandbox(self.TASK, sample, seconds=30)
+        self.assertFalse(report["timed_out"])
+        self.assertEqual((report["processed"], report["matched"], report["changed"]), (2, 1, 1))
+        self.assertEqual(report["diffs"], [{"id": 2, "text": "bbb", "field": "title", "current": "bbb", "candidate": ""}])
+
+    def test_catastrophic_regex_is_cut_at_budget(self):
+        # (a+)+$ на «aaa…ab» — экспоненциальный перебор, изнутри re его не прервать
+        sample = [(1, "aaa", "BOOK", {}), (2, "a" * 40 + "b", "BOOK", {}), (3, "aaa", "BOOK", {})]
+        report = sandbox.run_sandbox(self.TASK, sample, seconds=2)
+        self.assertTrue(report["timed_out"])
+        self.assertEqual(report["processed"], 1)
+        self.assertEqual(report["stuck"], {"id": 2, "text": "a" * 40 + "b"})
+        self.assertLess(report["wall_seconds"], 10)
+
+    def test_invalid_candidate_is_rejected_before_run(self):
+        with self.assertRaises(sandbox.SandboxError):
+            sandbox.validate("extract", "(", "title")
+        with self.assertRaises(sandbox.SandboxError):
+            sandbox.validate("parser", "os:system", "")
+
+
+class PerformanceMiddlewareTests(TestCase):
+    """Замеры запроса (PerformanceMiddleware): JSON-строка в litera.perf и PerfRecord для медленных."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("student", password="x")
+        cls.user.groups.add(Group.objects.get_or_create(name="user")[0])
+        raw_text = "Иванов, И. И. Книга. – Москва, 2020. – 10 с."
+        cls.reference_text = ReferenceText.objects.create(input_text=raw_text, user=cls.user)
+        cls.reference = Reference.objects.create(
+            reference_text=cls.reference_text, raw_text=raw_text,
+            reference_type=ReferenceType.objects.get(code="BOOK"), **normalized_fields(raw_text),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("check_list_verify", args=[self.reference_text.pk])
+
+    def test_check_request_is_measured(self):
+        data = {"action": "check_all", f"reference_type_{self.reference.pk}": str(self.reference.reference_type_id)}
+        with self.settings(LITERA_PERF_RECORD_MS=0), self.assertLogs("litera.perf", "INFO") as logs:
+            self.client.post(self.url, data)
+            self.client.get(self.url)
+
+        post, get = (json.loads(line.split(":", 2)[2]) for line in logs.output)
+        self.assertEqual((post["method"], post["view"], post["user_id"]), ("POST", "check_list_verify", self.user.pk))
+        self.assertEqual(post["parse_by_type"]["BOOK"]["lines"], 1)
+        self.assertEqual(post["check_count"], 1)
+        self.assertGreater(post["sql_count"], 0)
+        self.assertGreater(get["render_ms"], 0)
+
+        records = PerfRecord.objects.order_by("id")
+        self.assertEqual([record.method for record in records], ["POST", "GET"])
+        self.assertEqual(records[0].sql_count, post["sql_count"])
+        self.assertEqual(records[0].details["parse_by_type"], post["parse_by_type"])
+        self.assertEqual(len(records[0].details["slow_lines"]), 1)
+
+    def test_fast_request_is_logged_not_stored(self):
+        with self.settings(LITERA_PERF_RECORD_MS=60_000), self.assertLogs("litera.perf", "INFO") as logs:
+            self.client.get(self.url)
+        self.assertEqual(len(logs.output), 1)
+        self.assertFalse(PerfRecord.objects.exists())
+
+
+class ProfilerTests(TestCase):
+    """Профилирование запросов (ProfilerMiddleware, app/profiling.py): кто включает и что сохраняется."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.operator = User.objects.create_user("operator", password="x")
+        cls.operator.groups.add(Group.objects.get_or_create(name="operator")[0])
+        cls.student = User.objects.create_user("student", password="x")
+        cls.student.groups.add(Group.objects.get_or_create(name="user")[0])
+        raw_text = "Иванов, И. И. Книга. – Москва, 2020. – 10 с."
+        cls.reference_text = ReferenceText.objects.create(input_text=raw_text, user=cls.student)
+        Reference.objects.create(reference_text=cls.reference_text, raw_text=raw_text, **normalized_fields(raw_text))
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media.name))
+        ProfilerSettings.objects.all().delete()
+        self.options = ProfilerSettings.objects.create(enabled=True, allow_header=True, keep=1)
+        profiling.reset_settings_cache()
+        self.addCleanup(profiling.reset_settings_cache)
+        self.url = reverse("check_list_verify", args=[self.reference_text.pk])
+
+    def test_header_from_operator_only(self):
+        self.client.force_login(self.student)
+        self.client.get(reverse("index"), HTTP_X_LITERA_PROFILE="1")
+        self.assertFalse(ProfileCapture.objects.exists())
+
+        self.client.force_login(self.operator)
+        self.client.get(self.url, HTTP_X_LITERA_PROFILE="1")
+        capture = ProfileCapture.objects.get()
+        self.assertEqual((capture.trigger, capture.reference_text, capture.list_size), ("header", self.reference_text, 1))
+        self.assertIn("cumulative", capture.summary)
+        with capture.file.open("rb") as f:
+            self.assertIsInstance(marshal.load(f), dict)
+
+    def test_auto_threshold_and_keep(self):
+        self.options.allow_header = False
+        self.options.auto_path_prefix = "/check-list/"
+        self.options.auto_threshold_ms = 60_000
+        self.options.save()
+        profiling.reset_settings_cache()
+        self.client.force_login(self.operator)
+        self.client.get(self.url)
+        self.assertFalse(ProfileCapture.objects.exists())
+
+        # Страница списка заведомо дольше 1 мс; keep=1 — остаётся только последний профиль
+        ProfilerSettings.objects.update(auto_threshold_ms=1)
+        profiling.reset_settings_cache()
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(list(ProfileCapture.objects.values_list("trigger", flat=True)), ["auto"])
+
+    def test_download_requires_view_permission(self):
+        self.client.force_login(self.operator)
+        self.client.get(self.url, HTTP_X_LITERA_PROFILE="1")
+        download_url = reverse("admin:app_profilecapture_download", args=[ProfileCapture.objects.get().pk])
+
+        # Группа admin открывает админку, но без права просмотра профилей файл не отдаётся
+        staff = User.objects.create_user("staff", password="x", is_staff=True)
+        staff.groups.add(Group.objects.get_or_create(name="admin")[0])
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(download_url).status_code, 403)
+
+        self.client.force_login(User.objects.create_superuser("root", password="x"))
+        response = self.client.get(download_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Disposition"].startswith("attachment"))
+        response.close()
+
+
+class DuplicateDetectionTests(TestCase):
+    """Повторы по normalized_hash: внутри списка (list_duplicates) и в других списках (seen_before)."""
+
+    RAW = "Иванов, И. И. Книга. – Москва, 2020. – 10 с."
+    VARIANT = "ИВАНОВ И. И. Книга — Москва,  2020 - 10 с"
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("student", password="x")
+        cls.current = ReferenceText.objects.create(input_text="—", user=user)
+        for status in ("new", "ok", "error"):
+            other = ReferenceText.objects.create(input_text="—", user=user)
+            Reference.objects.create(reference_text=other, raw_text=cls.VARIANT, status=status, **normalized_fields(cls.VARIANT))
+        Reference.objects.create(reference_text=cls.current, raw_text=cls.RAW, status="ok", **normalized_fields(cls.RAW))
+
+    def test_case_punctuation_and_spaces_are_ignored(self):
+        self.assertEqual(normalized_fields(self.RAW), normalized_fields(self.VARIANT))
+        self.assertEqual(normalized_fields(self.RAW)["normalized_text"], "иванов и и книга москва 2020 10 с")
+        self.assertEqual(normalized_fields(" – ")["normalized_hash"], "")
+
+    def test_list_duplicates(self):
+        digest = normalized_fields(self.RAW)["normalized_hash"]
+        rows = [(1, digest), (2, "другой"), (3, digest), (4, ""), (5, "")]
+        self.assertEqual(list_duplicates(rows), {1: [3], 3: [1]})
+
+    def test_seen_before_excludes_own_list(self):
+        digest = normalized_fields(self.RAW)["normalized_hash"]
+        expected = {digest: (3, 2)}
+        self.assertEqual(seen_before(self.current, [digest, digest, "", "другой"]), expected)
+        with mock.patch("app.duplicates.HASH_CHUNK", 1):
+            self.assertEqual(seen_before(self.current, [digest, "другой"]), expected)
+
+
+class NearDuplicateTests(SimpleTestCase):
+    """Почти-повторы внутри списка (near_duplicates.find_clusters): MinHash + LSH и проверка полей."""
+
+    BOOK = "Иванов, И. И. Теория вероятностей и математическая статистика : учебник. – Москва : Наука, 2020. – 320 с."
+    BOOK_SHORT = "Иванов И. И. Теория вероятностей и математическая статистика : учебник. – М. : Наука, 2020. – 318 с."
+    OTHER = "Петров, П. П. Органическая химия : учебное пособие. – Казань : КФУ, 2018. – 144 с."
+
+    def test_variants_of_one_work_cluster(self):
+        items = [
+            (1, self.BOOK, {"authors": "Иванов, И. И.", "year": "2020"}),
+            (2, self.OTHER, {}),
+            (3, self.BOOK_SHORT, {"authors": "Иванов И. И.", "year": "2020"}),
+            (4, " – ", {}),
+        ]
+        self.assertEqual(near_duplicates.find_clusters(items), [[1, 3]])
+
+    def test_different_year_is_not_a_duplicate(self):
+        items = [
+            (1, self.BOOK, {"authors": "Иванов, И. И.", "year": "2020"}),
+            (2, self.BOOK.replace("2020", "2021"), {"authors": "Иванов, И. И.", "year": "2021"}),
+        ]
+        self.assertEqual(near_duplicates.find_clusters(items), [])
+
+    def test_signature_is_order_independent(self):
+        first = near_duplicates.features(self.BOOK)
+        second = frozenset(sorted(first, reverse=True))
+        self.assertEqual(near_duplicates.signature(first), near_duplicates.signature(second))
+        self.assertEqual(len(near_duplicates.signature(first)), near_duplicates.NUM_PERM)
+        self.assertEqual(near_duplicates.signature(frozenset()), ())
+
+    def test_many_distinct_lines_form_no_clusters(self):
+        items = [(n, f"Автор{n}, А. Заглавие номер {n} книги{n}. – Город{n}, {1900 + n % 100}.", {}) for n in range(2000)]
+        self.assertEqual(near_duplicates.find_clusters(items), [])
+
+
+class CheckRunTests(TestCase):
+    """Снимки проверок списка и их сравнение (app/runs.py) без перепроверки ссылок."""
+
+    BOOK = "Иванов, И. И. Книга. – Москва, 2020. – 10 с."
+    ARTICLE = "Петров, П. П. Статья // Журнал. – 2021. – № 1."
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("student", password="x")
+        cls.user.groups.add(Group.objects.get_or_create(name="user")[0])
+        cls.reference_text = ReferenceText.objects.create(input_text="—", user=cls.user)
+        cls.refs = [
+            Reference.objects.create(reference_text=cls.reference_text, raw_text=raw_text, status="error", **normalized_fields(raw_text))
+            for raw_text in (cls.BOOK, cls.ARTICLE, cls.BOOK)
+        ]
+        for ref in cls.refs:
+            ReferenceIssue.objects.create(reference=ref, field_name="", severity="error", code=issue_codes.NO_TYPE)
+
+    def _issue(self, rows):
+        return sorted((row["ref_hash"], row["occurrence"], row["field_name"]) for row in rows)
+
+    def test_snapshot(self):
+        run = runs.record_run(self.reference_text, self.refs, user=self.user, seconds=0.5)
+        self.assertEqual((run.total, run.errors, run.issues, run.duration_ms), (3, 3, 3, 500))
+        self.assertEqual([verdict[0] for verdict in run.verdicts], [ref.normalized_hash for ref in self.refs])
+        self.assertEqual(run.verdicts[0][2], [["", issue_codes.NO_TYPE, "error", None]])
+
+    def test_compare_by_hash_and_occurrence(self):
+        old = runs.record_run(self.reference_text, self.refs)
+        book, article, second_book = self.refs
+        # Вторая «Книга» исправлена, у статьи новая проблема; порядок ссылок в снимке другой
+        ReferenceIssue.objects.filter(reference=second_book).delete()
+        second_book.status = "ok"
+        ReferenceIssue.objects.create(
+            reference=article, field_name="pages", severity="error", code=issue_codes.REQUIRED_MISSING, params={"label": "Страницы"},
+        )
+        new = runs.record_run(self.reference_text, [article, book, second_book])
+
+        diff = runs.compare_runs(old, new)
+        self.assertEqual(self._issue(diff["fixed"]), [(book.normalized_hash, 1, "")])
+        self.assertEqual(self._issue(diff["new"]), [(article.normalized_hash, 0, "pages")])
+        self.assertEqual(diff["new"][0]["message"], issue_codes.render(issue_codes.REQUIRED_MISSING, {"label": "Страницы"}))
+        self.assertEqual(
+            self._issue(diff["unchanged"]), sorted([(book.normalized_hash, 0, ""), (article.normalized_hash, 0, "")]),
+        )
+
+    def test_compare_page(self):
+        runs.record_run(self.reference_text, self.refs)
+        ReferenceIssue.objects.filter(reference=self.refs[1]).delete()
+        runs.record_run(self.reference_text, self.refs)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("check_run_compare", args=[self.reference_text.pk]))
+        self.assertEqual(response.context["fixed_count"], 1)
+        fixed = response.context["sections"][0][1]
+        self.assertEqual([(row["number"], row["text"]) for row in fixed], [(2, self.ARTICLE)])
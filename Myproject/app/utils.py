@@ -1,6 +1,9 @@
+import hashlib
 import re
 
 LETTER_PATTERN = re.compile(r'^[^A-Za-zА-Яа-я]+')
+# Знаки препинания, включая все виды тире и дефисов; "_" входит в \w, поэтому отдельно
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]|_')
 
 
 def clean_reference_line(text: str) -> str:
@@ -24,3 +27,93 @@ def clean_reference_line(text: str) -> str:
     value = value.rstrip()
 
     return value
+
+
+def split_reference_lines(text: str) -> list:
+    """
+    Разбивает текст списка на ссылки.
+    Возвращает список (номер строки, очищенный текст); пустые строки и строки
+    без букв пропускаются.
+    """
+    result = []
+    for idx, line in enumerate((text or "").splitlines(), start=1):
+        line_text = line.strip()
+        if not line_text:
+            continue
+        cleaned_text = clean_reference_line(line_text)
+        if cleaned_text:
+            result.append((idx, cleaned_text))
+    return result
+
+
+def normalize_reference_text(text: str) -> str:
+    """
+    Каноническая форма ссылки для поиска повторов: регистр приведён (casefold),
+    тире, дефисы и прочая пунктуация заменены пробелами, любые пробельные
+    символы (в т.ч. неразрывные) схлопнуты в один пробел.
+    "Иванов, И. И. Книга. – М., 2020" -> "иванов и и книга м 2020"
+    """
+    value = PUNCTUATION_PATTERN.sub(" ", (text or "").casefold())
+    return " ".join(value.split())
+
+
+def reference_digest(normalized_text: str) -> str:
+    """SHA-1 нормализованного текста (40 hex-символов); для пустого текста — ""."""
+    if not normalized_text:
+        return ""
+    return hashlib.sha1(normalized_text.encode("utf-8")).hexdigest()
+
+
+def normalized_fields(raw_text: str) -> dict:
+    """Поля normalized_text и normalized_hash для Reference с данным raw_text."""
+    normalized = normalize_reference_text(raw_text)
+    return {"normalized_text": normalized, "normalized_hash": reference_digest(normalized)}
+
+
+def input_digest(text: str) -> str:
+    """
+    SHA-1 списка: ссылки после split_reference_lines с пробелами, схлопнутыми
+    в один, по одной на строку. Одинаков для повторной отправки того же списка
+    с другой нумерацией и пробелами; любая правка самих ссылок, в т.ч. пунктуации
+    и регистра, даёт другой хэш. По нему копируются результаты прошлой проверки,
+    поэтому нечувствительная к пунктуации normalize_reference_text здесь не годится:
+    она только для поиска повторов.
+    """
+    lines = [" ".join(line.split()) for _, line in split_reference_lines(text)]
+    return reference_digest("\n".join(lines))
+
+
+# Ключевые поля parsed_data, вынесенные в индексируемые колонки Reference
+AUTHOR_KEYS = ("authors", "author", "inventors")
+YEAR_KEYS = ("year", "publication_date")
+YEAR_PATTERN = re.compile(r"\b(1[5-9]\d\d|2\d\d\d)\b")
+SURNAME_PATTERN = re.compile(r"[^\W\d_]+(?:[-'’][^\W\d_]+)*")
+
+
+def first_author(parsed_data: dict) -> str:
+    """Фамилия (первое слово) первого автора: "Римский-Корсаков, Н. А., Иванов" -> "Римский-Корсаков"."""
+    for key in AUTHOR_KEYS:
+        match = SURNAME_PATTERN.search(str(parsed_data.get(key) or ""))
+        if match:
+            return match.group(0)
+    return ""
+
+
+def publication_year(parsed_data: dict):
+    """Год издания числом или None: "2020", "[2020?]", "15.03.2021" -> 2020, 2021."""
+    for key in YEAR_KEYS:
+        match = YEAR_PATTERN.search(str(parsed_data.get(key) or ""))
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def key_fields(parsed_data: dict) -> dict:
+    """Поля year, first_author, journal_title, publisher для Reference с данным parsed_data."""
+    parsed_data = parsed_data or {}
+    return {
+        "year": publication_year(parsed_data),
+        "first_author": first_author(parsed_data)[:100],
+        "journal_title": str(parsed_data.get("journal_title") or "").strip()[:255],
+        "publisher": str(parsed_data.get("publisher") or "").strip()[:255],
+    }
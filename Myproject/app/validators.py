@@ -1,115 +1,256 @@
+import hashlib
+import json
 import re
+import time
+from collections import namedtuple
 
-from .models import Reference, ReferenceField, ReferenceIssue
-from .parsers import parse_reference_instance
+from django.db.models import Q
 
+from . import issue_codes, metrics, perf, stats
+from .models import Reference, ReferenceField, ReferenceIssue, ReferenceType
+from .parsers import PARSER_VERSION, parse_reference_instance
+from .utils import key_fields
 
-def check_reference(reference: Reference) -> None:
+# Правило поля шаблона без привязки к БД: можно передать в дочерний процесс (см. app/batch.py)
+FieldRule = namedtuple("FieldRule", ["name", "label", "required", "pattern"])
+# Найденная проблема: код из app/issue_codes.py и его параметры (None — без параметров)
+Issue = namedtuple("Issue", ["field_name", "severity", "code", "params"])
+
+
+# Версия правил, зашитых в collect_issues: входит в версию шаблонов вместе с правилами
+# из БД. Увеличивается вручную, когда меняется набор находимых проблем
+CHECK_VERSION = "1"
+
+
+def rules_version() -> str:
     """
-    Проверяет одну ссылку:
-    - пересоздает ReferenceIssue для нее;
-    - обновляет reference.parsed_data и reference.status.
+    Версия шаблонов: хэш правил всех полей всех типов и CHECK_VERSION.
+    Меняется с любой правкой ReferenceField/ReferenceType или с CHECK_VERSION.
+    """
+    rows = ReferenceField.objects.order_by("id").values_list(
+        "reference_type__code", "name", "label", "required", "pattern", "order_index"
+    )
+    payload = json.dumps([CHECK_VERSION, list(rows)], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def rules_digest(rules) -> str:
+    """Версия шаблона одного типа: хэш его правил (FieldRule по порядку) и CHECK_VERSION."""
+    payload = json.dumps([CHECK_VERSION, [list(rule) for rule in rules]], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def template_versions() -> dict:
+    """{reference_type_id: версия шаблона} для всех типов; ключ None — ссылка без типа."""
+    rules = {type_id: [] for type_id in ReferenceType.objects.values_list("id", flat=True)}
+    for f in ReferenceField.objects.order_by("order_index", "id"):
+        rules.setdefault(f.reference_type_id, []).append(FieldRule(f.name, f.label, f.required, f.pattern))
+    versions = {type_id: rules_digest(type_rules) for type_id, type_rules in rules.items()}
+    versions[None] = rules_digest([])
+    return versions
+
+
+def is_stale(reference: Reference, versions: dict) -> bool:
+    """Проверенная ссылка проверялась другой версией парсеров или шаблона своего типа (versions — template_versions())."""
+    if reference.status == "new":
+        return False
+    return (
+        reference.parser_version != PARSER_VERSION
+        or reference.template_version != versions.get(reference.reference_type_id)
+    )
+
+
+def stale_q(versions: dict) -> Q:
+    """То же, что is_stale, условием для Reference.objects.filter()."""
+    stale = ~Q(parser_version=PARSER_VERSION) | (
+        Q(reference_type__isnull=True) & ~Q(template_version=versions[None])
+    )
+    for type_id, version in versions.items():
+        if type_id is not None:
+            stale |= Q(reference_type_id=type_id) & ~Q(template_version=version)
+    return ~Q(status="new") & stale
+
+
+def load_field_rules(reference_type) -> list:
+    """Правила полей типа ссылки в порядке order_index."""
+    fields_qs = ReferenceField.objects.filter(
+        reference_type=reference_type
+    ).order_by("order_index", "id")
+    return [FieldRule(f.name, f.label, f.required, f.pattern) for f in fields_qs]
+
+
+def collect_issues(type_code, type_name, data, rules) -> list:
+    """
+    Проверка распарсенных данных по правилам полей, без обращения к БД.
+
+    :param type_code: код типа (None — тип не выбран)
+    :param type_name: название типа для сообщений
+    :param data: результат парсинга (пустой dict — парсинг не удался)
+    :param rules: список FieldRule
+    :return: список Issue (field_name, severity, code, params)
     """
-    # Удалить старые проблемы для этой ссылки
-    ReferenceIssue.objects.filter(reference=reference).delete()
-    
     # 1. Проверка: выбран ли тип
-    if reference.reference_type is None:
-        ReferenceIssue.objects.create(
-            reference=reference,
-            field_name="",
-            severity="error",
-            message="Не выбран тип ссылки.",
-        )
-        reference.parsed_data = {}
-        reference.status = "error"
-        reference.save()
-        return
-    
+    if type_code is None:
+        return [Issue("", "error", issue_codes.NO_TYPE, None)]
+
     # 2. Парсинг
-    data = parse_reference_instance(reference)
     if not data:
-        ReferenceIssue.objects.create(
-            reference=reference,
-            field_name="",
-            severity="error",
-            message=f"Не удалось распарсить ссылку для типа '{reference.reference_type.name}'.",
-        )
-        reference.parsed_data = {}
-        reference.status = "error"
-        reference.save()
-        return
-    
+        return [Issue("", "error", issue_codes.PARSE_FAILED, {"type_name": type_name})]
+
     # 3. Проверка обязательных полей по ReferenceField
-    errors = []
-    fields_qs = ReferenceField.objects.filter(
-        reference_type=reference.reference_type
-    ).order_by("order_index")
-    
-    for field in fields_qs:
+    issues = []
+    for field in rules:
         value = (data.get(field.name) or "").strip()
-        
+
         if field.required and not value:
-            errors.append(
-                ReferenceIssue(
-                    reference=reference,
-                    field_name=field.name,
-                    severity="error",
-                    message=f"Отсутствует обязательное поле: {field.label}.",
-                )
-            )
-        
+            issues.append(Issue(field.name, "error", issue_codes.REQUIRED_MISSING, {"label": field.label}))
+
         # При наличии pattern можно проверить формат
         pattern = (field.pattern or "").strip()
         if pattern and value:
             try:
                 if not re.match(pattern, value):
-                    errors.append(
-                        ReferenceIssue(
-                            reference=reference,
-                            field_name=field.name,
-                            severity="warning",
-                            message=f"Поле «{field.label}» не соответствует ожидаемому формату.",
-                        )
-                    )
+                    issues.append(Issue(field.name, "warning", issue_codes.BAD_FORMAT, {"label": field.label}))
             except re.error:
                 # Если регулярка в БД некорректная, просто игнорируем проверку формата
                 pass
 
     # По шаблону типа «Электронный ресурс» (ГОСТ): обязательны URL/Режим доступа либо носитель (CD-ROM и т.п.)
-    if reference.reference_type and reference.reference_type.code == "ONLINE":
+    if type_code == "ONLINE":
         url_val = (data.get("url") or "").strip()
         access_val = (data.get("access_date") or "").strip()
         carrier_val = (data.get("carrier") or "").strip()
 
         # Сетевой ресурс (есть URL): по шаблону обязательна дата обращения
         if url_val and not access_val:
-            errors.append(
-                ReferenceIssue(
-                    reference=reference,
-                    field_name="access_date",
-                    severity="error",
-                    message="По шаблону «Электронный ресурс» для сетевого ресурса обязательна дата обращения: (дата обращения: ДД.ММ.ГГГГ).",
-                )
-            )
+            issues.append(Issue("access_date", "error", issue_codes.ONLINE_NO_ACCESS_DATE, None))
 
         # По шаблону «Электронный ресурс» в ссылке должны быть URL (Режим доступа) ИЛИ носитель (CD-ROM и т.п.). Иначе тип не соответствует тексту.
         if not url_val and not carrier_val:
-            errors.append(
-                ReferenceIssue(
-                    reference=reference,
-                    field_name="url",
-                    severity="error",
-                    message="По шаблону «Электронный ресурс» в ссылке должны быть URL (Режим доступа) или сведения о носителе (CD-ROM и т.п.). В тексте этого нет — выбранный тип не соответствует содержанию.",
-                )
-            )
-
-    # Сохранить parsed_data и статус
-    reference.parsed_data = data
-    reference.status = "error" if errors else "ok"
-    reference.save()
-    
-    if errors:
-        ReferenceIssue.objects.bulk_create(errors)
+            issues.append(Issue("url", "error", issue_codes.ONLINE_NO_URL_OR_CARRIER, None))
+
+    return issues
+
+
+def build_issue_objects(reference: Reference, issues) -> list:
+    """Несохранённые ReferenceIssue из Issue collect_issues (для bulk_create)."""
+    return [
+        ReferenceIssue(reference=reference, field_name=field_name, severity=severity, code=code, params=params)
+        for field_name, severity, code, params in issues
+    ]
+
+
+def diff_issues(stored, issues):
+    """
+    Разница между сохранёнными ReferenceIssue (stored) и новым набором issues:
+    сравнение по (field_name, code, severity), у совпавших обновляются params.
+    Возвращает (to_create — Issue, to_update — ReferenceIssue с новыми params,
+    to_delete — pk лишних).
+    """
+    by_key = {}
+    for issue in stored:
+        by_key.setdefault((issue.field_name, issue.code, issue.severity), []).append(issue)
+
+    to_create, to_update = [], []
+    for issue in issues:
+        same = by_key.get((issue.field_name, issue.code, issue.severity))
+        if not same:
+            to_create.append(issue)
+            continue
+        existing = same.pop()
+        if existing.params != issue.params:
+            existing.params = issue.params
+            to_update.append(existing)
+    to_delete = [issue.pk for rest in by_key.values() for issue in rest]
+    return to_create, to_update, to_delete
+
+
+def sync_issues(reference: Reference, issues) -> bool:
+    """
+    Приводит сохранённые ReferenceIssue ссылки к issues, меняя только разницу (diff_issues).
+    Возвращает True, если набор проблем изменился.
+    """
+    to_create, to_update, to_delete = diff_issues(ReferenceIssue.objects.filter(reference=reference), issues)
+
+    if to_delete:
+        ReferenceIssue.objects.filter(pk__in=to_delete).delete()
+    if to_update:
+        ReferenceIssue.objects.bulk_update(to_update, ["params"])
+    if to_create:
+        ReferenceIssue.objects.bulk_create(build_issue_objects(reference, to_create))
+        for issue in to_create:
+            metrics.ISSUES_CREATED.inc(issue.severity)
+    return bool(to_create or to_update or to_delete)
+
+
+# Поля Reference, которые пишет проверка (apply_result), — для update_fields/bulk_update
+RESULT_FIELDS = [
+    "parsed_data", "year", "first_author", "journal_title", "publisher",
+    "status", "parser_version", "template_version",
+]
+# Версии пишутся при каждой проверке, но сами по себе результат не меняют
+VERSION_FIELDS = ("parser_version", "template_version")
+
+
+def apply_result(reference: Reference, data: dict, issues, template_version: str) -> list:
+    """
+    Переносит результат проверки в reference (parsed_data, ключевые поля, статус,
+    версии парсеров и шаблона) без сохранения. Возвращает имена изменившихся полей.
+    """
+    values = {
+        "parsed_data": data,
+        **key_fields(data),
+        "status": "error" if issues else "ok",
+        "parser_version": PARSER_VERSION,
+        "template_version": template_version,
+    }
+    changed_fields = [name for name, value in values.items() if getattr(reference, name) != value]
+    for name in changed_fields:
+        setattr(reference, name, values[name])
+    return changed_fields
+
+
+def verdict_changed(changed_fields) -> bool:
+    """Изменился ли результат проверки (статус, parsed_data, ключевые поля), а не только версии."""
+    return any(name not in VERSION_FIELDS for name in changed_fields)
+
+
+def check_reference(reference: Reference) -> bool:
+    """
+    Проверяет одну ссылку:
+    - приводит ReferenceIssue к новому набору проблем (sync_issues);
+    - обновляет reference.parsed_data, ключевые поля (utils.key_fields), reference.status
+      и версии парсеров/шаблона, записывая только изменившиеся поля.
+    Возвращает True, если результат проверки изменился (только новые версии
+    парсеров/шаблона не в счёт); счётчики результатов в статистике (app/stats.py)
+    учитывают только такие проверки, счётчики проверок — все.
+    """
+    started = time.perf_counter()
+
+    ref_type = reference.reference_type
+    if ref_type is None:
+        data, rules = {}, []
+    else:
+        data = parse_reference_instance(reference)
+        rules = load_field_rules(ref_type)
+
+    validate_started = time.perf_counter()
+    issues = collect_issues(
+        ref_type.code if ref_type else None,
+        ref_type.name if ref_type else "",
+        data,
+        rules,
+    )
+    perf.record_validate(time.perf_counter() - validate_started)
+
+    # Сохранить parsed_data и статус, если они изменились
+    changed_fields = apply_result(reference, data, issues, rules_digest(rules))
+    if changed_fields:
+        reference.save(update_fields=changed_fields)
 
+    changed = sync_issues(reference, issues) or verdict_changed(changed_fields)
+    metrics.REFERENCES_CHECKED.inc(reference.status)
+    stats.count_check(reference, ref_type.code if ref_type else "", issues, changed=changed)
 
+    perf.record_check(time.perf_counter() - started)
+    return changed
@@ -1,12 +1,31 @@
+import functools
+import time
+from datetime import timedelta
+
+from django.db.models import Avg, Count, Max, Sum
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+from django.conf import settings
 from django.contrib import messages
-from django.http import HttpResponseForbidden
-
-from .models import ReferenceType, ReferenceField, Reference, ReferenceIssue, ReferenceText
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import (
+    CheckRun, ReferenceType, ReferenceField, Reference, ReferenceIssue, ReferenceText, PerfRecord, SlowLine, StatCounter,
+    ShadowComparison,
+)
+from . import issue_codes, metrics, page_cache, runs, sandbox, shadow, stats
+from .duplicates import clone_results, find_previous_check, list_duplicates, seen_before
+from .near_duplicates import find_clusters
 from .forms import ReferenceTypeForm, ReferenceFieldForm
-from .utils import clean_reference_line
-from .parsers import parse_reference_instance
-from .validators import check_reference
+from .impact import field_change_impact
+from .search import KEY_FILTERS, search_references
+from .utils import input_digest, normalized_fields, split_reference_lines
+from .parsers import SHADOW_PARSERS_BY_TYPE, parse_reference_instance
+from .validators import check_reference, stale_q, template_versions
 from .auth_utils import (
     login_required,
     role_required,
@@ -36,6 +55,7 @@ def check_list(request):
         if reference_list:
             reference_text = ReferenceText.objects.create(
                 input_text=reference_list,
+                input_hash=input_digest(reference_list),
                 status="new",
                 user=request.user,
             )
@@ -101,6 +121,7 @@ def check_list_edit(request, pk):
         new_text = request.POST.get("input_text", "").strip()
         if new_text:
             reference_text.input_text = new_text
+            reference_text.input_hash = input_digest(new_text)
             reference_text.intermediate_text = ""
             reference_text.output_text = ""
             reference_text.save()
@@ -113,7 +134,109 @@ def check_list_edit(request, pk):
     return render(request, "check_list_edit.html", {"reference_text": reference_text})
 
 
+def _recheck_stale(references, user_id) -> tuple:
+    """
+    Перепроверяет устаревшие ссылки queryset references (validators.stale_q) одной транзакцией.
+    Возвращает (перепроверено, осталось устаревших сверх LITERA_LAZY_RECHECK_LIMIT).
+    """
+    stale = references.filter(stale_q(template_versions()))
+    limit = getattr(settings, "LITERA_LAZY_RECHECK_LIMIT", 300)
+    batch = list(stale.select_related('reference_type').order_by('id')[:limit])
+    if not batch:
+        return 0, 0
+    with transaction.atomic(), stats.batch(user_id=user_id):
+        for ref in batch:
+            check_reference(ref)
+        page_cache.touch(ref.reference_text_id for ref in batch)
+    return len(batch), stale.count() if len(batch) == limit else 0
+
+
+def _apply_posted_types(request, references) -> list:
+    """Ставит ссылкам типы из формы (поля reference_type_<id>); возвращает ссылки, у которых тип изменился."""
+    types = ReferenceType.objects.in_bulk()
+    changed = []
+    for ref in references:
+        ref_type_id = request.POST.get(f'reference_type_{ref.id}', '').strip()
+        ref_type = types.get(int(ref_type_id)) if ref_type_id.isdigit() else None
+        if ref.reference_type_id != (ref_type.pk if ref_type else None):
+            ref.reference_type = ref_type
+            changed.append(ref)
+    return changed
+
+
+def _verify_listing(reference_text, has_saved) -> dict:
+    """Таблицы страницы проверки списка: строки, почти-повторы, проблемы (считаются, только если их нет в кэше фрагментов)."""
+    # Если есть сохраненные ссылки, показываем их
+    # Если нет - показываем распарсенные строки из исходного текста
+    if has_saved:
+        saved_references = Reference.objects.filter(reference_text=reference_text).select_related('reference_type').order_by('id')
+        references_list = []
+        # Создаем словарь соответствия ID ссылки -> порядковый номер
+        reference_id_to_number = {}
+        for idx, ref in enumerate(saved_references, start=1):
+            # Получаем ID типа ссылки, если он установлен
+            ref_type_id = None
+            if ref.reference_type:
+                ref_type_id = ref.reference_type.id
+            reference_id_to_number[ref.id] = idx
+            references_list.append({
+                'number': idx,
+                'text': ref.raw_text,
+                'id': ref.id,
+                'reference_type_id': ref_type_id,
+                'status': ref.status if hasattr(ref, 'status') else '',
+                'reference_obj': ref  # Передаем сам объект для доступа к issues
+            })
+        # Повторы внутри списка и в других списках (по normalized_hash)
+        duplicates = list_duplicates([(item['number'], item['reference_obj'].normalized_hash) for item in references_list])
+        seen = seen_before(reference_text, [item['reference_obj'].normalized_hash for item in references_list])
+        for item in references_list:
+            item['duplicate_of'] = duplicates.get(item['number'], [])
+            item['seen_before'], item['checked_before'] = seen.get(item['reference_obj'].normalized_hash, (0, 0))
+        # Почти-повторы (MinHash/LSH); группы только из точных повторов уже отмечены выше
+        by_number = {item['number']: item for item in references_list}
+        near_duplicates = [
+            [by_number[number] for number in cluster]
+            for cluster in find_clusters(
+                (item['number'], item['text'], item['reference_obj'].parsed_data) for item in references_list
+            )
+            if len({by_number[number]['reference_obj'].normalized_hash for number in cluster}) > 1
+        ]
+    else:
+        # Разбиваем текст на строки только если нет сохраненных ссылок
+        near_duplicates = []
+        reference_id_to_number = {}
+        lines = reference_text.input_text.splitlines()
+        references_list = []
+        for idx, line in enumerate(lines, start=1):
+            line_text = line.strip()
+            if line_text:  # Пропускаем пустые строки
+                references_list.append({
+                    'number': idx,
+                    'text': line_text
+                })
+    
+    # Получаем все проблемы для данного ReferenceText
+    try:
+        # Подзапрос вместо JOIN: порядок (reference_id, -severity) берётся прямо из
+        # индекса app_issue_ref_sev_idx, без сортировки во временном B-дереве
+        issues_qs = ReferenceIssue.objects.filter(
+            reference__in=Reference.objects.filter(reference_text=reference_text).values("id")
+        ).order_by('reference_id', '-severity')
+        # Добавляем порядковый номер к каждой проблеме
+        issues = []
+        for issue in issues_qs:
+            issue.reference_number = reference_id_to_number.get(issue.reference_id, issue.reference_id)
+            issues.append(issue)
+    except Exception:
+        issues = []
+    
+    return {'references_list': references_list, 'near_duplicates': near_duplicates, 'issues': issues}
+
+
 @login_required
+@condition(etag_func=page_cache.verify_etag, last_modified_func=page_cache.verify_last_modified)
+@cache_control(private=True, no_cache=True)
 def check_list_verify(request, pk):
     """Страница проверки списка ссылок. user — только свои проверки."""
     if can_see_all_checks(request.user):
@@ -125,63 +248,65 @@ def check_list_verify(request, pk):
     if request.method == 'POST' and request.POST.get('action') == 'check_all':
         try:
             # Получаем все сохраненные ссылки
-            saved_references = Reference.objects.filter(reference_text=reference_text)
+            saved_references = list(
+                Reference.objects.filter(reference_text=reference_text).select_related('reference_type').order_by('id')
+            )
             
-            if not saved_references.exists():
+            if not saved_references:
                 messages.warning(request, 'Нет сохраненных ссылок для проверки.')
                 return redirect('check_list_verify', pk=pk)
             
-            # 1) Сначала обновляем типы по данным из формы
-            for ref in saved_references:
-                ref_type_id = request.POST.get(f'reference_type_{ref.id}', '').strip()
-                if ref_type_id:
-                    try:
-                        ref_type = ReferenceType.objects.get(pk=int(ref_type_id))
-                        ref.reference_type = ref_type
-                    except (ReferenceType.DoesNotExist, ValueError):
-                        ref.reference_type = None
-                else:
-                    ref.reference_type = None
-                ref.save()
-            
-            # 2) Затем проверяем каждую ссылку и создаем issues
-            checked_count = 0
-            for ref in saved_references:
-                check_reference(ref)
-                checked_count += 1
+            # Типы из формы и проверка всех ссылок — одна транзакция: на SQLite один
+            # fsync вместо одного на каждую запись; при ошибке список не остаётся проверенным наполовину
+            checked_count = changed_count = 0
+            started = time.perf_counter()
+            parse_started = runs.parse_seconds()
+            with transaction.atomic(), stats.batch(user_id=reference_text.user_id):
+                # 1) Сначала обновляем типы по данным из формы
+                Reference.objects.bulk_update(_apply_posted_types(request, saved_references), ['reference_type'])
+                # 2) Затем проверяем каждую ссылку и создаем issues
+                for ref in saved_references:
+                    changed_count += check_reference(ref)
+                    checked_count += 1
+                # 3) Снимок проверки для истории и сравнения с прошлыми
+                runs.record_run(
+                    reference_text, saved_references, request.user,
+                    seconds=time.perf_counter() - started, parse_seconds=runs.parse_seconds() - parse_started,
+                )
+                page_cache.touch([reference_text.pk])
+            metrics.CHECK_ALL_SECONDS.observe(time.perf_counter() - started)
             
-            messages.success(request, f'Проверено {checked_count} ссылок.')
+            messages.success(request, f'Проверено {checked_count} ссылок, результат изменился у {changed_count}.')
             return redirect('check_list_verify', pk=pk)
         except Exception as e:
             import traceback
             messages.error(request, f'Ошибка при проверке: {str(e)}')
             return redirect('check_list_verify', pk=pk)
     
+    # Обработка POST-запроса для копирования результатов прошлой проверки того же списка
+    if request.method == 'POST' and request.POST.get('action') == 'clone_results':
+        previous = find_previous_check(reference_text)
+        if previous is None or str(previous.pk) != request.POST.get('source_id'):
+            messages.warning(request, 'Прошлая проверка этого списка не найдена.')
+            return redirect('check_list_verify', pk=pk)
+        cloned_count = clone_results(previous, reference_text)
+        messages.success(request, f'Скопированы результаты проверки от {previous.created_at:%d.%m.%Y %H:%M}: {cloned_count} ссылок.')
+        return redirect('check_list_verify', pk=pk)
+
     # Обработка POST-запроса для сохранения типов ссылок
     if request.method == 'POST' and request.POST.get('action') == 'save_types':
         try:
-            saved_count = 0
             # Получаем все сохраненные ссылки
-            saved_references = Reference.objects.filter(reference_text=reference_text)
+            saved_references = list(Reference.objects.filter(reference_text=reference_text))
             
-            if not saved_references.exists():
+            if not saved_references:
                 messages.warning(request, 'Нет сохраненных ссылок для обновления.')
                 return redirect('check_list_verify', pk=pk)
             
-            for ref in saved_references:
-                ref_type_id = request.POST.get(f'reference_type_{ref.id}', '').strip()
-                if ref_type_id:
-                    try:
-                        ref_type = ReferenceType.objects.get(pk=int(ref_type_id))
-                        ref.reference_type = ref_type
-                    except (ReferenceType.DoesNotExist, ValueError) as e:
-                        ref.reference_type = None
-                else:
-                    ref.reference_type = None
-                ref.save()
-                # Перезагружаем объект из базы для получения актуальных данных
-                ref.refresh_from_db()
-                saved_count += 1
+            with transaction.atomic():
+                Reference.objects.bulk_update(_apply_posted_types(request, saved_references), ['reference_type'])
+                page_cache.touch([reference_text.pk])
+            saved_count = len(saved_references)
             
             messages.success(request, f'Типы ссылок сохранены для {saved_count} ссылок.')
             return redirect('check_list_verify', pk=pk)
@@ -193,27 +318,16 @@ def check_list_verify(request, pk):
     # Обработка POST-запроса для сохранения очищенных ссылок
     if request.method == 'POST' and request.POST.get('action') == 'clean_and_save':
         try:
-            # Удаляем старые ссылки для этого ReferenceText
-            Reference.objects.filter(reference_text=reference_text).delete()
-            
-            # Разбиваем текст на строки
-            lines = reference_text.input_text.splitlines()
-            
-            # Очищаем и сохраняем каждую строку как Reference
-            created_count = 0
-            for idx, line in enumerate(lines, start=1):
-                line_text = line.strip()
-                if line_text:  # Пропускаем пустые строки
-                    # Очищаем строку
-                    cleaned_text = clean_reference_line(line_text)
-                    
-                    if cleaned_text:  # Сохраняем только если после очистки остался текст
-                        Reference.objects.create(
-                            reference_text=reference_text,
-                            raw_text=cleaned_text,
-                            status='new'
-                        )
-                        created_count += 1
+            # Очищаем строки и заменяем ими старые ссылки этого ReferenceText — одной транзакцией
+            new_references = [
+                Reference(reference_text=reference_text, raw_text=cleaned_text, status='new', **normalized_fields(cleaned_text))
+                for _, cleaned_text in split_reference_lines(reference_text.input_text)
+            ]
+            with transaction.atomic():
+                Reference.objects.filter(reference_text=reference_text).delete()
+                Reference.objects.bulk_create(new_references, batch_size=500)
+                page_cache.touch([reference_text.pk])
+            created_count = len(new_references)
             
             messages.success(request, f'Сохранено {created_count} очищенных ссылок.')
             return redirect('check_list_verify', pk=pk)
@@ -222,79 +336,102 @@ def check_list_verify(request, pk):
             messages.error(request, f'Ошибка при сохранении: необходимо применить миграцию. {str(e)}')
             return redirect('check_list_verify', pk=pk)
     
-    # Получаем уже сохраненные ссылки, если они есть
+    # Получаем признак сохраненных ссылок; сами ссылки читаются, только если таблиц нет в кэше фрагментов
     # Используем try-except на случай, если миграция еще не применена
     try:
-        saved_references = Reference.objects.filter(reference_text=reference_text).select_related('reference_type').order_by('id')
-        has_saved = saved_references.exists()
+        saved_qs = Reference.objects.filter(reference_text=reference_text)
+        has_saved = saved_qs.exists()
     except Exception as e:
         # Если миграция не применена, считаем что сохраненных ссылок нет
-        saved_references = Reference.objects.none()
         has_saved = False
         # Логируем ошибку для отладки
         import logging
         logger = logging.getLogger(__name__)
         logger.error(f"Ошибка при загрузке ссылок: {str(e)}")
     
-    # Получаем все типы ссылок для выпадающего меню
-    reference_types = ReferenceType.objects.all().order_by('name')
+    # Ссылки, проверенные прежними парсерами или шаблоном, перепроверяются при открытии
+    # списка (не больше LITERA_LAZY_RECHECK_LIMIT за раз, остальные — при следующем открытии)
+    rechecked_count, stale_left = _recheck_stale(saved_qs, reference_text.user_id) if has_saved else (0, 0)
+    if rechecked_count:
+        reference_text.refresh_from_db(fields=['updated_at'])
+
+    # Тяжёлые части контекста — функции: шаблон вызывает их только при промахе кэша фрагментов
+    listing = functools.cache(functools.partial(_verify_listing, reference_text, has_saved))
     
-    # Если есть сохраненные ссылки, показываем их
-    # Если нет - показываем распарсенные строки из исходного текста
-    if has_saved:
-        references_list = []
-        # Создаем словарь соответствия ID ссылки -> порядковый номер
-        reference_id_to_number = {}
-        for idx, ref in enumerate(saved_references, start=1):
-            # Получаем ID типа ссылки, если он установлен
-            ref_type_id = None
-            if ref.reference_type:
-                ref_type_id = ref.reference_type.id
-            reference_id_to_number[ref.id] = idx
-            references_list.append({
-                'number': idx,
-                'text': ref.raw_text,
-                'id': ref.id,
-                'reference_type_id': ref_type_id,
-                'status': ref.status if hasattr(ref, 'status') else '',
-                'reference_obj': ref  # Передаем сам объект для доступа к issues
-            })
-    else:
-        # Разбиваем текст на строки только если нет сохраненных ссылок
-        reference_id_to_number = {}
-        lines = reference_text.input_text.splitlines()
-        references_list = []
-        for idx, line in enumerate(lines, start=1):
-            line_text = line.strip()
-            if line_text:  # Пропускаем пустые строки
-                references_list.append({
-                    'number': idx,
-                    'text': line_text
-                })
-    
-    # Получаем все проблемы для данного ReferenceText
-    try:
-        issues_qs = ReferenceIssue.objects.filter(
-            reference__reference_text=reference_text
-        ).select_related("reference").order_by('reference__id', '-severity')
-        # Добавляем порядковый номер к каждой проблеме
-        issues = []
-        for issue in issues_qs:
-            issue.reference_number = reference_id_to_number.get(issue.reference.id, issue.reference.id)
-            issues.append(issue)
-    except Exception:
-        issues = []
-    
-    return render(request, 'check_list_verify.html', {
+    # Тот же список уже проверялся — предлагаем скопировать результаты
+    previous_check = None if has_saved else find_previous_check(reference_text)
+
+    response = render(request, 'check_list_verify.html', {
         'reference_text': reference_text,
-        'references_list': references_list,
+        'references_list': lambda: listing()['references_list'],
         'has_saved_references': has_saved,
-        'reference_types': reference_types,
-        'issues': issues
+        # Получаем все типы ссылок для выпадающего меню
+        'reference_types': ReferenceType.objects.all().order_by('name'),
+        'issues': lambda: listing()['issues'],
+        'previous_check': previous_check,
+        'near_duplicates': lambda: listing()['near_duplicates'],
+        'check_runs': reference_text.runs.defer('verdicts')[:10],
+        'rechecked_count': rechecked_count,
+        'stale_left': stale_left,
+        'page_version': page_cache.list_version(reference_text),
+        'fragment_timeout': page_cache.fragment_timeout(),
     })
+    metrics.CACHE_REQUESTS.inc('fragments', 'miss' if listing.cache_info().currsize else 'hit')
+    return response
 
 
 @login_required
+def check_run_compare(request, pk):
+    """Сравнение двух проверок списка (CheckRun): исправленные, новые и оставшиеся проблемы."""
+    if can_see_all_checks(request.user):
+        reference_text = get_object_or_404(ReferenceText, pk=pk)
+    else:
+        reference_text = get_object_or_404(ReferenceText, pk=pk, user=request.user)
+
+    all_runs = list(reference_text.runs.defer('verdicts').select_related('user')[:50])
+    if len(all_runs) < 2:
+        messages.info(request, 'Для сравнения нужны хотя бы две проверки списка.')
+        return redirect('check_list_verify', pk=pk)
+    runs_by_id = {str(run.pk): run for run in all_runs}
+    new_run = runs_by_id.get(request.GET.get('new', ''), all_runs[0])
+    old_run = runs_by_id.get(request.GET.get('old', ''), all_runs[1])
+    with_verdicts = CheckRun.objects.in_bulk([old_run.pk, new_run.pk])
+    old_run, new_run = with_verdicts[old_run.pk], with_verdicts[new_run.pk]
+    diff = runs.compare_runs(old_run, new_run)
+
+    # Номер и текст ссылки в текущем списке по (normalized_hash, номер среди одинаковых)
+    positions, seen = {}, {}
+    for number, (ref_hash, raw_text) in enumerate(
+        Reference.objects.filter(reference_text=reference_text).order_by('id').values_list('normalized_hash', 'raw_text'),
+        start=1,
+    ):
+        occurrence = seen[ref_hash] = seen.get(ref_hash, -1) + 1
+        positions[(ref_hash, occurrence)] = (number, raw_text)
+    for rows in diff.values():
+        for row in rows:
+            row['number'], row['text'] = positions.get((row['ref_hash'], row['occurrence']), (None, ''))
+        rows.sort(key=lambda row: (row['number'] is None, row['number'] or 0))
+
+    return render(request, 'check_run_compare.html', {
+        'reference_text': reference_text,
+        'runs': all_runs,
+        'old_run': old_run,
+        'new_run': new_run,
+        'fixed_count': len(diff['fixed']),
+        'new_count': len(diff['new']),
+        'unchanged_count': len(diff['unchanged']),
+        'sections': [
+            ('Исправлено', diff['fixed'], 'Ничего не исправлено.'),
+            ('Новые проблемы', diff['new'], 'Новых проблем нет.'),
+            ('Остались', diff['unchanged'], 'Проблем не осталось.'),
+        ],
+        'versions_changed': (old_run.parser_version, old_run.template_version) != (new_run.parser_version, new_run.template_version),
+    })
+
+
+@login_required
+@condition(etag_func=page_cache.errors_etag, last_modified_func=page_cache.errors_last_modified)
+@cache_control(private=True, no_cache=True)
 def reference_errors(request, pk):
     """Страница с детальной информацией об ошибках. user — только свои проверки."""
     reference = get_object_or_404(Reference, pk=pk)
@@ -303,7 +440,12 @@ def reference_errors(request, pk):
         if not rt or rt.user != request.user:
             return HttpResponseForbidden("Доступ запрещён.")
 
-    # Получаем все проблемы для этой ссылки
+    rechecked_count, _ = _recheck_stale(Reference.objects.filter(pk=reference.pk), rt.user_id)
+    if rechecked_count:
+        reference.refresh_from_db()
+        rt.refresh_from_db(fields=['updated_at'])
+
+    # Получаем все проблемы для этой ссылки (запрос выполнится, только если таблицы нет в кэше фрагментов)
     try:
         issues = ReferenceIssue.objects.filter(reference=reference).order_by('-severity', 'field_name')
     except Exception:
@@ -316,6 +458,9 @@ def reference_errors(request, pk):
         'reference': reference,
         'issues': issues,
         'parsed_data': parsed_data,
+        'rechecked_count': rechecked_count,
+        'page_version': page_cache.list_version(rt),
+        'fragment_timeout': page_cache.fragment_timeout(),
     })
 
 
@@ -326,17 +471,16 @@ def reference_type_list(request):
     if not can_see_templates(request.user):
         return HttpResponseForbidden("Доступ запрещён.")
     reference_types = ReferenceType.objects.all()
-    reference_fields = ReferenceField.objects.all()
-    references = Reference.objects.all()
-    reference_issues = ReferenceIssue.objects.all()
+    # Вкладка «Поля ссылок»: тип каждого поля — тем же запросом, а не по запросу на строку
+    reference_fields = ReferenceField.objects.select_related("reference_type").order_by(
+        "reference_type__name", "order_index", "id"
+    )
     return render(
         request,
         "reference_type/list.html",
         {
             "reference_types": reference_types,
             "reference_fields": reference_fields,
-            "references": references,
-            "reference_issues": reference_issues,
             "can_edit": can_edit_templates(request.user),
         },
     )
@@ -429,6 +573,11 @@ def reference_field_create(request, type_pk):
             obj = form.save(commit=False)
             obj.reference_type = reference_type
             obj.pattern = ".*"  # в UI шаблон убран; для БД (NOT NULL) — «всё сходит»
+            if "dry_run" in request.POST:
+                return render(request, "reference_type/field_form.html", {
+                    "form": form, "reference_type": reference_type, "title": "Добавить поле",
+                    "impact": field_change_impact(reference_type, obj),
+                })
             obj.save()
             messages.success(request, "Поле добавлено.")
             return redirect("reference_type_fields", pk=type_pk)
@@ -451,6 +600,13 @@ def reference_field_update(request, type_pk, field_pk):
         data["name"] = field.name
         form = ReferenceFieldForm(data, instance=field)
         if form.is_valid():
+            if "dry_run" in request.POST:
+                # Пробная проверка: изменённый экземпляр не сохраняется
+                form.fields["name"].disabled = True
+                return render(request, "reference_type/field_form.html", {
+                    "form": form, "reference_type": reference_type, "field": field, "title": "Редактировать поле",
+                    "impact": field_change_impact(reference_type, form.save(commit=False)),
+                })
             form.save()
             messages.success(request, "Поле сохранено.")
             return redirect("reference_type_fields", pk=type_pk)
@@ -460,3 +616,282 @@ def reference_field_update(request, type_pk, field_pk):
     return render(request, "reference_type/field_form.html", {
         "form": form, "reference_type": reference_type, "field": field, "title": "Редактировать поле",
     })
+
+
+@role_required("operator")
+def perf_dashboard(request):
+    """Самые медленные запросы и строки за последние часы (operator и admin)."""
+    try:
+        hours = max(1, min(int(request.GET.get("hours", 24)), 24 * 30))
+    except ValueError:
+        hours = 24
+    recent = PerfRecord.objects.filter(created_at__gte=timezone.now() - timedelta(hours=hours))
+
+    slowest = list(recent.select_related("user").order_by("-total_ms")[:50])
+    by_view = (
+        recent.values("view_name")
+        .annotate(n=Count("id"), avg_ms=Avg("total_ms"), max_ms=Max("total_ms"), avg_sql=Avg("sql_count"))
+        .order_by("-max_ms")[:20]
+    )
+    # Самые медленные строки из замеров запросов (PerfRecord.details) — есть всегда,
+    # и строки дольше LITERA_SLOW_LINE_MS из SlowLine — для golden-корпуса
+    request_slow_lines = []
+    for record in recent.order_by("-parse_ms")[:200]:
+        for line in record.details.get("slow_lines", []):
+            request_slow_lines.append({**line, "record": record})
+    request_slow_lines.sort(key=lambda line: line["ms"], reverse=True)
+    slow_lines = SlowLine.objects.filter(last_seen__gte=timezone.now() - timedelta(hours=hours))[:50]
+    since = timezone.now() - timedelta(hours=hours)
+
+    return render(request, "perf.html", {
+        "hours": hours,
+        "slowest": slowest,
+        "by_view": by_view,
+        "request_slow_lines": request_slow_lines[:50],
+        "slow_lines": slow_lines,
+        "slow_line_ms": getattr(settings, "LITERA_SLOW_LINE_MS", 20),
+        "shadow_parsers": SHADOW_PARSERS_BY_TYPE,
+        "shadow_summary": shadow.summary(since),
+        "shadow_diverged": ShadowComparison.objects.filter(created_at__gte=since, diverged=True)[:20],
+    })
+
+
+@role_required("operator")
+def stats_dashboard(request):
+    """
+    Статистика проверок за период (operator и admin): доля ошибок по типам и полям,
+    частые сообщения, проверки по дням и пользователям, возраст источников —
+    по счётчикам StatCounter (app/stats.py); частые авторы, журналы и издательства —
+    по ключевым колонкам всех сохранённых ссылок (stats.top_sources).
+    """
+    try:
+        days = max(1, min(int(request.GET.get("days", 30)), 366 * 3))
+    except ValueError:
+        days = 30
+    since = timezone.localdate() - timedelta(days=days - 1)
+    counters = StatCounter.objects.filter(day__gte=since)
+
+    totals = {}
+    for kind, key, n in counters.values("kind", "key").annotate(n=Sum("count")).values_list("kind", "key", "n"):
+        totals.setdefault(kind, {})[key] = n
+    # checked — все проверки, verdict — изменившиеся результаты: от них доли ошибок (см. app/stats.py)
+    checked, verdicts, errors = totals.get("checked", {}), totals.get("verdict", {}), totals.get("error", {})
+    type_names = dict(ReferenceType.objects.values_list("code", "name"))
+
+    by_type = sorted(
+        (
+            {
+                "name": type_names.get(code, code) or "Тип не выбран",
+                "checked": checked.get(code, 0),
+                "verdicts": verdicts.get(code, 0),
+                "errors": errors.get(code, 0),
+                "error_rate": 100 * errors.get(code, 0) / verdicts[code] if verdicts.get(code) else None,
+            }
+            for code in checked.keys() | verdicts.keys()
+        ),
+        key=lambda row: -row["checked"],
+    )
+    by_field = []
+    for key, n in totals.get("field", {}).items():
+        code, _, field_name = key.partition(":")
+        by_field.append({
+            "type_name": type_names.get(code, code) or "Тип не выбран",
+            "field_name": field_name or "—",
+            "issues": n,
+            "rate": 100 * n / verdicts[code] if verdicts.get(code) else None,
+        })
+    by_field.sort(key=lambda row: -row["issues"])
+    top_messages = sorted(
+        ((issue_codes.title(int(code)), n) for code, n in totals.get("code", {}).items()),
+        key=lambda item: -item[1],
+    )[:20]
+
+    user_counts = totals.get("user", {})
+    usernames = dict(
+        get_user_model().objects.filter(pk__in=[int(key) for key in user_counts]).values_list("pk", "username")
+    )
+    by_user = sorted(
+        ((usernames.get(int(key), f"#{key}"), n) for key, n in user_counts.items()),
+        key=lambda item: -item[1],
+    )[:20]
+
+    # Проверки по дням; за длинный период — по месяцам
+    by_period = {}
+    for day, n in counters.filter(kind="checked").values("day").annotate(n=Sum("count")).values_list("day", "n"):
+        period = day if days <= 31 else day.replace(day=1)
+        by_period[period] = by_period.get(period, 0) + n
+
+    ages = {}
+    for key, n in totals.get("age", {}).items():
+        bucket = stats.age_bucket(int(key))
+        ages[bucket] = ages.get(bucket, 0) + n
+    age_total = sum(ages.values())
+    age_rows = [
+        (label, ages.get(label, 0), 100 * ages.get(label, 0) / age_total if age_total else 0)
+        for label in (stats.age_bucket(low) for low, _ in stats.AGE_BUCKETS)
+    ]
+
+    return render(request, "stats.html", {
+        "days": days,
+        "total_checked": sum(checked.values()),
+        "total_verdicts": sum(verdicts.values()),
+        "total_errors": sum(errors.values()),
+        "by_type": by_type,
+        "by_field": by_field[:30],
+        "top_messages": top_messages,
+        "by_user": by_user,
+        "by_period": sorted(by_period.items()),
+        "period_monthly": days > 31,
+        "age_rows": age_rows,
+        "age_total": age_total,
+        "top_authors": stats.top_sources("first_author"),
+        "top_journals": stats.top_sources("journal_title"),
+        "top_publishers": stats.top_sources("publisher"),
+    })
+
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_STATUSES = (("new", "Не проверена"), ("ok", "Без ошибок"), ("error", "С ошибками"))
+
+
+@role_required("operator")
+def reference_search(request):
+    """Полнотекстовый поиск и фильтры по ключевым полям всех сохранённых ссылок (operator и admin)."""
+    query = request.GET.get("q", "").strip()
+    type_id = request.GET.get("type", "")
+    status = request.GET.get("status", "")
+    username = request.GET.get("user", "").strip()
+    keys = {name: request.GET.get(name, "").strip() for name in KEY_FILTERS}
+    year_from, year_to = request.GET.get("year_from", "").strip(), request.GET.get("year_to", "").strip()
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+    except ValueError:
+        page = 1
+
+    searched = bool(query or any(keys.values()) or year_from.isdigit() or year_to.isdigit())
+    total, results, user_missing = 0, [], False
+    if searched:
+        user_id = None
+        if username:
+            user_id = get_user_model().objects.filter(username=username).values_list("id", flat=True).first()
+            user_missing = user_id is None
+        if not user_missing:
+            total, results = search_references(
+                query,
+                reference_type_id=int(type_id) if type_id.isdigit() else None,
+                status=status if status in dict(SEARCH_STATUSES) else None,
+                user_id=user_id,
+                keys=keys,
+                year_from=int(year_from) if year_from.isdigit() else None,
+                year_to=int(year_to) if year_to.isdigit() else None,
+                limit=SEARCH_PAGE_SIZE,
+                offset=(page - 1) * SEARCH_PAGE_SIZE,
+            )
+
+    params = request.GET.copy()
+    params.pop("page", None)
+    return render(request, "search.html", {
+        "query": query,
+        "searched": searched,
+        "keys": keys,
+        "year_from": year_from,
+        "year_to": year_to,
+        "type_id": type_id,
+        "status": status,
+        "username": username,
+        "user_missing": user_missing,
+        "reference_types": ReferenceType.objects.order_by("name"),
+        "statuses": SEARCH_STATUSES,
+        "total": total,
+        "results": results,
+        "page": page,
+        "has_previous": page > 1,
+        "has_next": page * SEARCH_PAGE_SIZE < total,
+        "base_query": params.urlencode(),
+    })
+
+
+@role_required("operator")
+def slow_lines_export(request):
+    """
+    Медленные строки в формате golden-корпуса. Это тексты пользователей: перед
+    python manage.py benchmark --add-golden файл проверяется и обезличивается вручную.
+    """
+    lines = [{"type": line.type_code, "text": line.text} for line in SlowLine.objects.all()]
+    response = JsonResponse(lines, safe=False, json_dumps_params={"ensure_ascii": False, "indent": 1})
+    response["Content-Disposition"] = 'attachment; filename="slow-lines.json"'
+    return response
+
+
+def metrics_view(request):
+    """Метрики Prometheus: адреса из LITERA_METRICS_ALLOWED_IPS или operator/admin."""
+    allowed_ips = getattr(settings, "LITERA_METRICS_ALLOWED_IPS", [])
+    if request.META.get("REMOTE_ADDR") not in allowed_ips and not (
+        request.user.is_authenticated and is_operator(request.user)
+    ):
+        return HttpResponseForbidden("Доступ запрещён.")
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@role_required("operator")
+def pattern_sandbox(request):
+    """
+    Песочница: регулярное выражение или функция разбора по выборке сохранённых
+    ссылок, в отдельном процессе под бюджетом времени (operator и admin).
+
+    Прогон синхронный: запрос ждёт дочерний процесс и занимает воркер до
+    LITERA_SANDBOX_SECONDS плюс время его запуска. Поэтому бюджет короткий,
+    а по его истечении отчёт строится по уже обработанным строкам (timed_out).
+    """
+    params = request.POST if request.method == "POST" else request.GET
+    mode = params.get("mode", "extract")
+    type_id = params.get("type", "")
+    field_name = params.get("field", "").strip()
+    candidate = params.get("candidate", "").strip()
+    status = params.get("status", "")
+    contains = params.get("contains", "").strip()
+    max_lines = getattr(settings, "LITERA_SANDBOX_MAX_LINES", 5000)
+    try:
+        limit = min(max_lines, max(1, int(params.get("limit", 500))))
+    except ValueError:
+        limit = 500
+
+    report, error = None, ""
+    if request.method == "POST":
+        try:
+            sandbox.validate(mode, candidate, field_name)
+        except sandbox.SandboxError as exc:
+            error = str(exc)
+        else:
+            current_pattern = ""
+            if mode == "pattern" and type_id.isdigit():
+                current_pattern = ReferenceField.objects.filter(
+                    reference_type_id=int(type_id), name=field_name
+                ).values_list("pattern", flat=True).first() or ""
+            sample = sandbox.load_sample(
+                reference_type_id=int(type_id) if type_id.isdigit() else None,
+                status=status if status in ("ok", "error") else None,
+                contains=contains,
+                limit=limit,
+            )
+            report = sandbox.run_sandbox(
+                {"mode": mode, "candidate": candidate, "field_name": field_name, "current_pattern": current_pattern},
+                sample,
+                getattr(settings, "LITERA_SANDBOX_SECONDS", 3),
+            )
+
+    return render(request, "sandbox.html", {
+        "modes": sandbox.MODES,
+        "mode": mode,
+        "type_id": type_id,
+        "field_name": field_name,
+        "candidate": candidate,
+        "status": status,
+        "contains": contains,
+        "limit": limit,
+        "max_lines": max_lines,
+        "reference_types": ReferenceType.objects.order_by("name"),
+        "statuses": SEARCH_STATUSES[1:],
+        "error": error,
+        "report": report,
+    })
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Прогрев процесса при запуске: AppConfig.ready() вызывает warm_up(), если
+LITERA_WARMUP включён (gunicorn.conf.py включает его сам).
+
+Без прогрева первый запрос каждого воркера платит за холодный старт: импорт
+представлений и таблицы URL, компиляцию регулярных выражений внутри парсеров
+(re кэширует их при первом вызове), первые запросы к ReferenceType/ReferenceField
+и разбор шаблонов страниц. Под gunicorn с preload_app прогрев выполняется один
+раз в мастер-процессе до fork, и воркеры получают готовое состояние
+копированием при записи. Соединения с БД после прогрева закрываются: воркеры
+не должны делить соединение мастера.
+"""
+import logging
+import re
+import time
+from contextlib import contextmanager
+
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger("litera.perf")
+
+# Шаблоны страниц, которые разбираются заранее (кэширующий загрузчик Django хранит их в процессе)
+KEY_TEMPLATES = (
+    "base.html",
+    "index.html",
+    "check_list.html",
+    "check_list_verify.html",
+    "reference_errors.html",
+    "check_run_compare.html",
+)
+
+
+# По строке каждого типа: прогрев не зависит от каталога benchmarks, которого может не быть на сервере
+WARMUP_LINES = (
+    "Дронов, В. А. Django: практика создания веб-сайтов на Python / В. А. Дронов. – Санкт-Петербург : БХВ-Петербург, 2017. – 528 с.",
+    "Иванов, И. И. Методы анализа данных // Вестник университета. – 2020. – Т. 12, вып. 3. – С. 45–58.",
+    "Васильев, П. А. Применение нейросетей для классификации текстов // Информационные технологии в науке и образовании : "
+    "материалы 12 Всерос. науч.-практ. конф. – Москва, 2021. – С. 54–60.",
+    "Росстат: Численность населения Российской Федерации [Электронный ресурс]. URL: https://rosstat.gov.ru/folder/12781 "
+    "(дата обращения: 26.09.2025).",
+    "Электронный журнал [Электронный ресурс]: Образовательный комплекс №11, г. Москва. — Режим доступа: "
+    "https://sch11.mskobr.ru/journal (дата обращения: 23.11.2025).",
+    "Кузнецова А. В. Управление рисками инвестиционных проектов : дис. … канд. экон. наук. Москва, 2015. 186 с.",
+    "ГОСТ Р 57580–2017. Безопасность финансовых (банковских) операций. Защита информации финансовых организаций. "
+    "Москва : Стандартинформ, 2017. 24 с.",
+    "Пат. 2654321 Российская Федерация, МПК G06F 17/30. Способ обработки текстовых документов / Иванов И. И., Петров П. П.; "
+    "заявитель и патентообладатель ООО «Ромашка». Заявл. 01.02.2017; опубл. 10.03.2018, Бюл. № 7.",
+)
+
+
+def _warm_parsers() -> None:
+    """
+    Разбор WARMUP_LINES каждым парсером и автоопределение типа: компилирует
+    регулярные выражения, в т.ч. запасных ветвей разбора (строки чужих типов).
+    """
+    from .parsers import PARSERS_BY_TYPE, detect_reference_type
+    from .utils import key_fields, normalized_fields
+
+    for text in WARMUP_LINES:
+        detect_reference_type(text)
+        normalized_fields(text)
+        for parser in PARSERS_BY_TYPE.values():
+            key_fields(parser(text))
+
+
+def _warm_field_rules() -> None:
+    """Типы и поля шаблонов из БД (первые запросы ORM) и компиляция ReferenceField.pattern."""
+    from .models import ReferenceField
+    from .validators import template_versions
+
+    template_versions()
+    for pattern in ReferenceField.objects.exclude(pattern="").values_list("pattern", flat=True).distinct():
+        try:
+            re.compile(pattern)
+        except re.error:
+            pass
+
+
+def _warm_templates() -> None:
+    """Таблица URL (импорт представлений), разбор ключевых шаблонов и один рендер главной страницы."""
+    from django.contrib.auth.models import AnonymousUser
+    from django.template.loader import get_template
+    from django.test import RequestFactory
+    from django.urls import reverse
+
+    for name in KEY_TEMPLATES:
+        get_template(name)
+    request = RequestFactory().get(reverse("index"))
+    request.user = AnonymousUser()
+    get_template("index.html").render({}, request)
+
+
+@contextmanager
+def _stage(timings: dict, name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    except (DatabaseError, ImportError, OSError, ValueError) as e:
+        # Прогрев не должен мешать запуску: например, БД ещё без миграций
+        logger.warning(f"Прогрев «{name}» пропущен: {e}")
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def warm_up() -> dict:
+    """Прогрев всех частей; возвращает время этапов, мс."""
+    timings = {}
+    try:
+        with _stage(timings, "parsers"):
+            _warm_parsers()
+        with _stage(timings, "field_rules"):
+            _warm_field_rules()
+        with _stage(timings, "templates"):
+            _warm_templates()
+    finally:
+        connections.close_all()
+    logger.info(f"Прогрев: {timings}")
+    return timings
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+Замеры производительности парсеров и проверки ссылок.
+
+corpus — детерминированный генератор синтетического корпуса ссылок;
+suite  — замеры и запись результатов в JSON.
+Запуск: python manage.py benchmark (см. app/management/commands/benchmark.py).
+"""
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Генератор синтетического корпуса ссылок по ГОСТ Р 7.0.100–2018.
+
+Для каждого типа из PARSERS_BY_TYPE строятся правдоподобные корректные
+ссылки и намеренно испорченные (нет года, обрезана строка, потерян
+разделитель « // » и т.п.). Генерация детерминирована: одинаковый seed даёт
+одинаковый корпус, поэтому замеры разных запусков сопоставимы.
+"""
+import random
+import re
+
+SURNAMES = [
+    "Иванов", "Петров", "Смирнова", "Кузнецов", "Соколова", "Попов", "Лебедев",
+    "Козлова", "Новиков", "Морозов", "Волкова", "Соловьёв", "Васильев", "Зайцева",
+    "Павлов", "Семёнов", "Голубева", "Виноградов", "Богданов", "Воробьёва",
+]
+INITIALS = "АБВГДЕИКЛМНОПРСТЮЯ"
+
+TITLE_HEADS = ["Основы", "Теория", "Методы", "Практикум по курсу", "Проблемы", "Инструменты"]
+TITLE_TAILS = [
+    "программирования на Python", "анализа данных", "экономической теории",
+    "управления проектами", "информационных систем", "бухгалтерского учета",
+    "маркетинга", "проектирования баз данных", "машинного обучения",
+]
+DOC_TYPES = ["учебное пособие", "учебник", "монография", "практикум"]
+PUBLISHING = [
+    ("Москва", "Юрайт"), ("Санкт-Петербург", "Питер"), ("Москва", "ИНФРА-М"),
+    ("Санкт-Петербург", "БХВ-Петербург"), ("Москва", "Проспект"), ("Новосибирск", "НГТУ"),
+    ("Казань", "КФУ"), ("Москва", "КноРус"),
+]
+JOURNALS = [
+    "Вопросы экономики", "Прикладная информатика", "Экономика и управление",
+    "Программная инженерия", "Информационное общество", "Открытое образование",
+]
+COLLECTIONS = [
+    "Информационные технологии в науке и образовании", "Цифровая экономика",
+    "Актуальные проблемы управления", "Наука и молодежь",
+]
+ORGANIZATIONS = ["Росстат", "Банк России", "Минобрнауки России", "Минфин России"]
+DOMAINS = ["rosstat.gov.ru", "cbr.ru", "minobrnauki.gov.ru", "elibrary.ru", "cyberleninka.ru"]
+STANDARDS = [
+    ("ГОСТ Р 57580–2017", "Безопасность финансовых (банковских) операций", "Защита информации финансовых организаций"),
+    ("ГОСТ Р 59793–2021", "Информационные технологии", "Комплекс стандартов на автоматизированные системы"),
+    ("ГОСТ 34602–2020", "Информационные технологии", "Техническое задание на создание автоматизированной системы"),
+]
+DEGREES = ["канд. экон. наук", "канд. техн. наук", "д-ра экон. наук", "канд. пед. наук"]
+
+
+def _person(rnd: random.Random, comma: bool = True) -> str:
+    a, b = rnd.choice(INITIALS), rnd.choice(INITIALS)
+    sep = ", " if comma else " "
+    return f"{rnd.choice(SURNAMES)}{sep}{a}. {b}."
+
+
+def _responsibility(rnd: random.Random) -> str:
+    return f"{rnd.choice(INITIALS)}. {rnd.choice(INITIALS)}. {rnd.choice(SURNAMES)}"
+
+
+def _title(rnd: random.Random) -> str:
+    return f"{rnd.choice(TITLE_HEADS)} {rnd.choice(TITLE_TAILS)}"
+
+
+def _date(rnd: random.Random, year_from: int = 2019) -> str:
+    return f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.randint(year_from, 2025)}"
+
+
+def _book(rnd):
+    place, publisher = rnd.choice(PUBLISHING)
+    return (
+        f"{_person(rnd)} {_title(rnd)} : {rnd.choice(DOC_TYPES)} / {_responsibility(rnd)}. "
+        f"– {place} : {publisher}, {rnd.randint(1995, 2025)}. – {rnd.randint(80, 640)} с."
+    )
+
+
+def _article_journal(rnd):
+    start = rnd.randint(5, 120)
+    return (
+        f"{_person(rnd)} {_title(rnd)} // {rnd.choice(JOURNALS)}. – {rnd.randint(2000, 2025)}. "
+        f"– № {rnd.randint(1, 12)}. – С. {start}–{start + rnd.randint(3, 20)}."
+    )
+
+
+def _article_proceedings(rnd):
+    place, _ = rnd.choice(PUBLISHING)
+    start = rnd.randint(5, 300)
+    return (
+        f"{_person(rnd)} {_title(rnd)} // {rnd.choice(COLLECTIONS)} : материалы "
+        f"{rnd.randint(2, 25)} Всерос. науч.-практ. конф. – {place}, {rnd.randint(2005, 2025)}. "
+        f"– С. {start}–{start + rnd.randint(2, 10)}."
+    )
+
+
+def _online(rnd):
+    return (
+        f"{rnd.choice(ORGANIZATIONS)}: {_title(rnd)} [Электронный ресурс]. "
+        f"URL: https://{rnd.choice(DOMAINS)}/doc/{rnd.randint(1000, 99999)} (дата обращения: {_date(rnd)})."
+    )
+
+
+def _online_journal(rnd):
+    return (
+        f"Электронный журнал [Электронный ресурс]: {rnd.choice(JOURNALS)}. – Режим доступа: "
+        f"https://{rnd.choice(DOMAINS)}/journal/{rnd.randint(1, 500)} (дата обращения: {_date(rnd)})."
+    )
+
+
+def _dissertation(rnd):
+    place, _ = rnd.choice(PUBLISHING)
+    return (
+        f"{_person(rnd, comma=False)} {_title(rnd)} : дис. … {rnd.choice(DEGREES)}. "
+        f"{place}, {rnd.randint(1995, 2025)}. {rnd.randint(120, 260)} с."
+    )
+
+
+def _standard(rnd):
+    code, main, sub = rnd.choice(STANDARDS)
+    return f"{code}. {main}. {sub}. Москва : Стандартинформ, {code[-4:]}. {rnd.randint(12, 80)} с."
+
+
+def _patent(rnd):
+    return (
+        f"Пат. {rnd.randint(2000000, 2899999)} Российская Федерация, МПК G06F 17/30. "
+        f"Способ обработки {rnd.choice(TITLE_TAILS)} / {_person(rnd, comma=False)}, {_person(rnd, comma=False)}; "
+        f"заявитель и патентообладатель ООО «Ромашка». Заявл. {_date(rnd, 2015)}; "
+        f"опубл. {_date(rnd, 2019)}, Бюл. № {rnd.randint(1, 36)}."
+    )
+
+
+GENERATORS = {
+    "BOOK": _book,
+    "ARTICLE_JOURNAL": _article_journal,
+    "ARTICLE_PROCEEDINGS": _article_proceedings,
+    "ONLINE": _online,
+    "ONLINE_JOURNAL": _online_journal,
+    "DISSERTATION": _dissertation,
+    "STANDARD": _standard,
+    "PATENT": _patent,
+}
+
+
+def _drop_year(rnd, text):
+    return re.sub(r"\b(19|20)\d{2}\b\.?", "", text, count=1)
+
+
+def _truncate(rnd, text):
+    return text[: rnd.randint(len(text) // 3, max(len(text) // 3 + 1, len(text) - 5))]
+
+
+def _drop_separators(rnd, text):
+    return re.sub(r"\s+[–—-]\s+", " ", text.replace(" // ", " "))
+
+
+def _drop_url(rnd, text):
+    return re.sub(r"(URL|Режим доступа):\s*\S+", "", text)
+
+
+def _inflate(rnd, text):
+    # Длинная «вязкая» строка: повтор заглавия и служебных слов — нагрузка на жадные/ленивые группы
+    filler = " ".join(_title(rnd) for _ in range(rnd.randint(8, 20)))
+    return text.replace(" // ", f" {filler} // ", 1) if " // " in text else f"{filler}. {text}"
+
+
+BREAKERS = [_drop_year, _truncate, _drop_separators, _drop_url, _inflate]
+
+
+def generate_corpus(size: int, seed: int = 42, types=None, broken_ratio: float = 0.25) -> list:
+    """
+    Корпус из size ссылок, равномерно по типам.
+
+    :return: список dict с ключами type, text, well_formed
+    """
+    rnd = random.Random(seed)
+    type_codes = list(types or GENERATORS)
+    corpus = []
+    for idx in range(size):
+        code = type_codes[idx % len(type_codes)]
+        text = GENERATORS[code](rnd)
+        well_formed = rnd.random() >= broken_ratio
+        if not well_formed:
+            text = rnd.choice(BREAKERS)(rnd, text).strip()
+        corpus.append({"type": code, "text": text, "well_formed": well_formed})
+    return corpus
+
+
+def as_numbered_list(corpus: list) -> str:
+    """Текст списка, как его вставляет студент: «N. ссылка» по строке."""
+    return "\n".join(f"{idx}. {item['text']}" for idx, item in enumerate(corpus, start=1))
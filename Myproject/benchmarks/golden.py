@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Эталонный (golden) корпус и бюджеты времени парсеров.
+
+golden/corpus.json  — обезличенные реальные ссылки с ожидаемым parsed_data:
+                      [{"type": "BOOK", "text": "...", "expected": {...}}, ...].
+                      Последние записи — патологически длинные строки, на которых
+                      проявляется катастрофический бэктрекинг регулярных выражений.
+golden/budgets.json — медиана и p99 времени одного вызова парсера по типам (мкс),
+                      время калибровочной нагрузки на машине, где записаны бюджеты,
+                      и допустимое замедление в процентах.
+
+Бюджеты масштабируются отношением текущей калибровки к записанной, поэтому
+проверка переносима между машинами разной скорости и устойчива к их загрузке.
+
+Проверка выполняется тестами app/tests.py: ParserTimeBudgetTests — только
+с LITERA_PERF_TESTS=1 (замер по часам не для CI), а грубая проверка p99 с
+десятикратным запасом (ParserBacktrackingTests) — всегда; бюджеты и ожидаемые значения
+обновляются командой benchmark (--write-budgets, --update-golden) после
+осознанного изменения парсеров. Медленные строки из рабочей системы (SlowLine)
+добавляются командой benchmark --add-golden после ручного обезличивания.
+"""
+import json
+import os
+import re
+import statistics
+import time
+from pathlib import Path
+
+GOLDEN_DIR = Path(__file__).resolve().parent / "golden"
+CORPUS_PATH = GOLDEN_DIR / "corpus.json"
+BUDGETS_PATH = GOLDEN_DIR / "budgets.json"
+
+DEFAULT_TOLERANCE_PERCENT = 50.0
+DEFAULT_REPEATS = 30
+
+# Калибровочная нагрузка: те же операции, что у парсеров (re на кириллице, split, strip)
+_CALIBRATION_RE = re.compile(r"^(?P<authors>.+?,\s*[А-ЯA-Z]\.(?:\s*[А-ЯA-Z]\.)*)\s+(?P<rest>.+)$")
+_CALIBRATION_TEXT = "Иванов, И. И. Методы анализа данных. – Москва : Наука, 2020. – 120 с."
+
+
+def load_corpus() -> list:
+    with open(CORPUS_PATH, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def load_budgets() -> dict:
+    with open(BUDGETS_PATH, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def tolerance_percent(budgets: dict) -> float:
+    """Допустимое замедление: LITERA_PERF_TOLERANCE из окружения или значение из budgets.json."""
+    env = os.environ.get("LITERA_PERF_TOLERANCE")
+    if env:
+        return float(env)
+    return float(budgets.get("tolerance_percent", DEFAULT_TOLERANCE_PERCENT))
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def calibrate(batches: int = 25, per_batch: int = 200) -> float:
+    """Медианное время одной итерации калибровочной нагрузки, мкс."""
+    timings = []
+    for _ in range(batches):
+        started = time.perf_counter()
+        for _ in range(per_batch):
+            m = _CALIBRATION_RE.match(_CALIBRATION_TEXT)
+            [part.strip() for part in re.split(r"\.\s+[-\u2013\u2014]\s+", m.group("rest"))]
+        timings.append((time.perf_counter() - started) / per_batch)
+    return round(statistics.median(timings) * 1e6, 3)
+
+
+def measure_parsers(corpus: list, repeats: int = DEFAULT_REPEATS) -> dict:
+    """
+    Медиана и p99 времени разбора строки по типам на строках корпуса.
+    Время строки — медиана из repeats прогонов (первый прогон — прогрев кэша re),
+    поэтому единичные паузы машины не попадают в p99; p99 по строкам типа
+    показывает самую «тяжёлую» строку, на которой и проявляется бэктрекинг.
+    """
+    from app.parsers import PARSERS_BY_TYPE
+
+    per_line = {}
+    totals = {}
+    for entry in corpus:
+        parser = PARSERS_BY_TYPE[entry["type"]]
+        text = entry["text"]
+        parser(text)
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            parser(text)
+            timings.append(time.perf_counter() - started)
+        per_line.setdefault(entry["type"], []).append(statistics.median(timings))
+        totals[entry["type"]] = totals.get(entry["type"], 0.0) + sum(timings)
+
+    measured = {}
+    for code, timings in per_line.items():
+        ordered = sorted(timings)
+        measured[code] = {
+            "median_us": round(statistics.median(ordered) * 1e6, 2),
+            "p99_us": round(_percentile(ordered, 0.99) * 1e6, 2),
+            "samples": len(ordered) * repeats,
+            "total_s": round(totals[code], 6),
+        }
+    return measured
+
+
+def check_budgets(measured: dict, budgets: dict, tolerance: float, calibration_us: float = None,
+                  metrics=("median_us", "p99_us")) -> list:
+    """
+    Список нарушений бюджета (пустой — всё в пределах).
+    calibration_us — текущая калибровка; бюджеты умножаются на её отношение к записанной.
+    metrics — какие величины сверять.
+    """
+    violations = []
+    limits = budgets.get("parsers", {})
+    scale = 1.0
+    if calibration_us and budgets.get("calibration_us"):
+        scale = calibration_us / budgets["calibration_us"]
+    for code, values in sorted(measured.items()):
+        budget = limits.get(code)
+        if not budget:
+            violations.append(f"{code}: нет бюджета в {BUDGETS_PATH.name}")
+            continue
+        for metric in metrics:
+            limit = budget[metric] * scale
+            if values[metric] > limit * (1 + tolerance / 100):
+                violations.append(
+                    f"{code}: {metric} {values[metric]:.1f} мкс > бюджета {limit:.1f} мкс "
+                    f"(+{(values[metric] / limit - 1) * 100:.0f}%, допуск {tolerance:.0f}%, "
+                    f"масштаб машины {scale:.2f})"
+                )
+    return violations
+
+
+def verify_budgets(attempts: int = 3, tolerance: float = None, metrics=("median_us", "p99_us"),
+                   repeats: int = DEFAULT_REPEATS) -> list:
+    """
+    Полная проверка golden-корпуса по бюджетам; возвращает список нарушений.
+    При нарушении замер повторяется (до attempts раз) и по каждому типу берётся
+    минимум: медленный прогон из-за загрузки машины не валит проверку, а
+    настоящее замедление парсера воспроизводится в каждой попытке.
+    tolerance — допуск в процентах (по умолчанию tolerance_percent).
+    """
+    budgets = load_budgets()
+    if tolerance is None:
+        tolerance = tolerance_percent(budgets)
+    corpus = load_corpus()
+    best, calibration_us = {}, None
+    for _ in range(attempts):
+        calibration = calibrate()
+        calibration_us = calibration if calibration_us is None else min(calibration_us, calibration)
+        for code, values in measure_parsers(corpus, repeats).items():
+            if code in best:
+                best[code] = {k: min(v, best[code][k]) for k, v in values.items()}
+            else:
+                best[code] = values
+        violations = check_budgets(best, budgets, tolerance, calibration_us, metrics)
+        if not violations:
+            break
+    return violations
+
+
+def mismatches(corpus: list) -> list:
+    """Записи корпуса, для которых текущий парсер даёт не тот parsed_data: [(запись, фактический результат)]."""
+    from app.parsers import PARSERS_BY_TYPE
+
+    result = []
+    for entry in corpus:
+        actual = PARSERS_BY_TYPE[entry["type"]](entry["text"])
+        if actual != entry["expected"]:
+            result.append((entry, actual))
+    return result
+
+
+def write_budgets(measured: dict, calibration_us: float, tolerance: float = None) -> Path:
+    """Записывает текущие замеры как новые бюджеты."""
+    budgets = {
+        "tolerance_percent": DEFAULT_TOLERANCE_PERCENT if tolerance is None else tolerance,
+        "calibration_us": calibration_us,
+        "parsers": {
+            code: {"median_us": values["median_us"], "p99_us": values["p99_us"]}
+            for code, values in sorted(measured.items())
+        },
+    }
+    with open(BUDGETS_PATH, "w", encoding="utf-8") as fh:
+        json.dump(budgets, fh, ensure_ascii=False, indent=2)
+        fh.write("\n")
+    return BUDGETS_PATH
+
+
+def update_expected(corpus: list) -> Path:
+    """Перезаписывает expected текущими результатами парсеров (после осознанного изменения)."""
+    from app.parsers import PARSERS_BY_TYPE
+
+    for entry in corpus:
+        entry["expected"] = PARSERS_BY_TYPE[entry["type"]](entry["text"])
+    with open(CORPUS_PATH, "w", encoding="utf-8") as fh:
+        json.dump(corpus, fh, ensure_ascii=False, indent=1)
+        fh.write("\n")
+    return CORPUS_PATH
+
+
+def add_entries(corpus: list, entries: list) -> int:
+    """
+    Добавляет в корпус строки [{"type": ..., "text": ...}], которых в нём ещё нет;
+    expected — текущий результат парсера. Возвращает число добавленных строк.
+    """
+    from app.parsers import PARSERS_BY_TYPE
+
+    known = {entry["text"] for entry in corpus}
+    added = 0
+    for item in entries:
+        parser = PARSERS_BY_TYPE.get(item.get("type"))
+        text = item.get("text", "")
+        if parser is None or not text or text in known:
+            continue
+        corpus.append({"type": item["type"], "text": text, "expected": parser(text)})
+        known.add(text)
+        added += 1
+    if added:
+        with open(CORPUS_PATH, "w", encoding="utf-8") as fh:
+            json.dump(corpus, fh, ensure_ascii=False, indent=1)
+            fh.write("\n")
+    return added
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Замер запуска процесса (группа startup команды benchmark). Выполняется
+в отдельном процессе, чтобы django.setup() и первый запрос были холодными:
+
+    LITERA_BENCH_DB=<файл SQLite> LITERA_WARMUP=0|1 python -m benchmarks.startup <user_id> <url>
+
+Печатает одну JSON-строку: setup_s, first_request_s, second_request_s.
+"""
+import json
+import os
+import sys
+import time
+
+
+def main(user_id: int, url: str) -> dict:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    from django.conf import settings
+
+    # До django.setup(): прогрев в AppConfig.ready() уже обращается к БД
+    settings.DATABASES["default"]["NAME"] = os.environ["LITERA_BENCH_DB"]
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, "testserver"]
+
+    import django
+
+    started = time.perf_counter()
+    django.setup()
+    setup_s = time.perf_counter() - started
+
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+
+    client = Client()
+    client.force_login(get_user_model().objects.get(pk=user_id))
+    timings = []
+    for _ in range(2):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+    return {"setup_s": setup_s, "first_request_s": timings[0], "second_request_s": timings[1]}
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(int(sys.argv[1]), sys.argv[2])))
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Замеры скорости парсеров, диагностики, поиска почти-повторов, проверки, страницы verify
+и запуска процесса (с прогревом app/warmup.py и без).
+
+Каждый замер возвращает dict:
+    name       — имя замера (parse.BOOK, check_reference.n1000 и т.п.)
+    n          — число обработанных элементов
+    total_s    — суммарное время, с
+    per_second — элементов в секунду
+    median_us, p95_us — медиана и 95-й перцентиль одного элемента, мкс (если применимо)
+
+Замеры с БД (check_reference, verify_view, startup) выполняются на тестовой БД,
+которую создаёт команда benchmark; рабочая БД не затрагивается.
+"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from . import golden
+from .corpus import as_numbered_list, generate_corpus
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def _summary(name: str, timings: list) -> dict:
+    total = sum(timings)
+    n = len(timings)
+    result = {
+        "name": name,
+        "n": n,
+        "total_s": round(total, 6),
+        "per_second": round(n / total, 1) if total else 0.0,
+    }
+    if n > 1:
+        ordered = sorted(timings)
+        result["median_us"] = round(statistics.median(ordered) * 1e6, 1)
+        result["p95_us"] = round(ordered[min(n - 1, int(n * 0.95))] * 1e6, 1)
+    return result
+
+
+def _single(name: str, n: int, elapsed: float) -> dict:
+    """Замер одной операции над n элементами (например, одного HTTP-запроса)."""
+    return {"name": name, "n": n, "total_s": round(elapsed, 6), "per_second": round(n / elapsed, 1) if elapsed else 0.0}
+
+
+def _time_each(fn, items) -> list:
+    timings = []
+    for item in items:
+        started = time.perf_counter()
+        fn(item)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def bench_parsers(corpus: list) -> list:
+    """Пропускная способность каждого парсера на строках своего типа."""
+    from app.parsers import PARSERS_BY_TYPE
+
+    results = []
+    for code, parser in PARSERS_BY_TYPE.items():
+        texts = [item["text"] for item in corpus if item["type"] == code]
+        if texts:
+            results.append(_summary(f"parse.{code}", _time_each(parser, texts)))
+    return results
+
+
+def bench_diagnostics(corpus: list) -> list:
+    """get_parse_diagnostic по типам (используется на странице ошибок)."""
+    from app.parse_diagnostics import get_parse_diagnostic
+    from app.parsers import PARSERS_BY_TYPE
+
+    results = []
+    for code in PARSERS_BY_TYPE:
+        texts = [item["text"] for item in corpus if item["type"] == code]
+        if texts:
+            timings = _time_each(lambda text: get_parse_diagnostic(text, code), texts)
+            results.append(_summary(f"diagnostic.{code}", timings))
+    return results
+
+
+def bench_golden() -> list:
+    """Медиана и p99 парсеров на эталонном корпусе (те же величины, что в golden/budgets.json)."""
+    results = []
+    for code, values in sorted(golden.measure_parsers(golden.load_corpus()).items()):
+        results.append({
+            "name": f"golden.{code}",
+            "n": values["samples"],
+            "total_s": values["total_s"],
+            "per_second": round(values["samples"] / values["total_s"], 1) if values["total_s"] else 0.0,
+            "median_us": values["median_us"],
+            "p99_us": values["p99_us"],
+        })
+    return results
+
+
+def bench_near_duplicates(sizes: list, seed: int) -> list:
+    """Поиск почти-повторов (MinHash/LSH) в списке, как на странице verify."""
+    from app.near_duplicates import find_clusters
+    from app.parsers import PARSERS_BY_TYPE
+
+    results = []
+    for size in sizes:
+        corpus = generate_corpus(size, seed=seed)
+        items = [(i, item["text"], PARSERS_BY_TYPE[item["type"]](item["text"])) for i, item in enumerate(corpus)]
+        started = time.perf_counter()
+        find_clusters(items)
+        results.append(_single(f"near_duplicates.n{size}", size, time.perf_counter() - started))
+    return results
+
+
+def _create_list(size: int, seed: int, user=None):
+    """ReferenceText с size сохранёнными ссылками и выбранными типами (как после «Сохранить типы»)."""
+    from app.models import Reference, ReferenceText, ReferenceType
+    from app.utils import normalized_fields
+
+    corpus = generate_corpus(size, seed=seed)
+    types = {t.code: t for t in ReferenceType.objects.all()}
+    reference_text = ReferenceText.objects.create(
+        title=f"benchmark {size}", input_text=as_numbered_list(corpus), user=user,
+    )
+    Reference.objects.bulk_create([
+        Reference(
+            reference_text=reference_text,
+            raw_text=item["text"],
+            reference_type=types.get(item["type"]),
+            status="new",
+            **normalized_fields(item["text"]),
+        )
+        for item in corpus
+    ])
+    return reference_text
+
+
+def bench_check_reference(sizes: list, seed: int) -> list:
+    """check_reference по всем ссылкам списка: парсинг, правила полей, запись в БД."""
+    from app.models import Reference
+    from app.validators import check_reference
+
+    results = []
+    for size in sizes:
+        reference_text = _create_list(size, seed)
+        refs = list(Reference.objects.filter(reference_text=reference_text).select_related("reference_type"))
+        results.append(_summary(f"check_reference.n{size}", _time_each(check_reference, refs)))
+    return results
+
+
+def bench_verify_view(sizes: list, seed: int) -> list:
+    """Страница check_list_verify: POST «Проверить» (check_all), последующий GET и повторный GET."""
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    from django.urls import reverse
+
+    from app.models import Reference
+
+    user = get_user_model().objects.create_user("benchmark", password="benchmark", is_staff=True)
+    client = Client()
+    client.force_login(user)
+
+    results = []
+    for size in sizes:
+        reference_text = _create_list(size, seed, user=user)
+        url = reverse("check_list_verify", args=[reference_text.pk])
+        form = {"action": "check_all"}
+        for ref_id, type_id in Reference.objects.filter(reference_text=reference_text).values_list("id", "reference_type_id"):
+            form[f"reference_type_{ref_id}"] = str(type_id or "")
+
+        started = time.perf_counter()
+        response = client.post(url, form)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 302, response.status_code
+        results.append(_single(f"verify_view.check_all.n{size}", size, elapsed))
+
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 200, response.status_code
+        results.append(_single(f"verify_view.get.n{size}", size, elapsed))
+
+        # Повторное открытие без изменений: таблицы из кэша фрагментов (app/page_cache.py)
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 200, response.status_code
+        results.append(_single(f"verify_view.get_cached.n{size}", size, elapsed))
+    return results
+
+
+def bench_startup(size: int, seed: int) -> list:
+    """
+    Запуск процесса без прогрева и с прогревом (app/warmup.py): django.setup()
+    и два запроса страницы verify в новом процессе (benchmarks/startup.py)
+    на копии тестовой БД. Только для SQLite.
+    """
+    import os
+    import sqlite3
+    import sys
+    import tempfile
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.urls import reverse
+
+    if connection.vendor != "sqlite":
+        return []
+
+    user = get_user_model().objects.create_user("benchmark-startup", password="benchmark", is_staff=True)
+    reference_text = _create_list(size, seed, user=user)
+    url = reverse("check_list_verify", args=[reference_text.pk])
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "startup.sqlite3"
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        connection.connection.backup(target)
+        target.close()
+
+        for label, warmup in (("cold", "0"), ("warm", "1")):
+            completed = subprocess.run(
+                [sys.executable, "-m", "benchmarks.startup", str(user.pk), url],
+                capture_output=True, text=True, check=True, cwd=Path(__file__).resolve().parent.parent,
+                env={**os.environ, "LITERA_WARMUP": warmup, "LITERA_BENCH_DB": str(path), "LITERA_METRICS_DIR": tmp},
+            )
+            measured = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(_single(f"startup.{label}.setup", 1, measured["setup_s"]))
+            results.append(_single(f"startup.{label}.first_request", 1, measured["first_request_s"]))
+            results.append(_single(f"startup.{label}.second_request", 1, measured["second_request_s"]))
+    return results
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(groups: list, sizes: list, seed: int, corpus_size: int) -> dict:
+    """Запуск выбранных групп замеров; возвращает документ результатов."""
+    import django
+
+    corpus = generate_corpus(corpus_size, seed=seed)
+    results = []
+    if "parse" in groups:
+        results += bench_parsers(corpus)
+    if "golden" in groups:
+        results += bench_golden()
+    if "diagnostic" in groups:
+        results += bench_diagnostics(corpus)
+    if "dedup" in groups:
+        results += bench_near_duplicates(sizes, seed)
+    if "check" in groups:
+        results += bench_check_reference(sizes, seed)
+    if "view" in groups:
+        results += bench_verify_view(sizes, seed)
+    if "startup" in groups:
+        results += bench_startup(min(sizes), seed)
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "corpus_size": corpus_size,
+            "sizes": sizes,
+        },
+        "results": results,
+    }
+
+
+def write_results(document: dict, path=None) -> Path:
+    """Сохраняет результаты в JSON (по умолчанию benchmarks/results/bench-<время>.json)."""
+    if path is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = RESULTS_DIR / f"bench-{stamp}.json"
+    path = Path(path)
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(document, fh, ensure_ascii=False, indent=2)
+    return path
+
+
+def compare(old: dict, new: dict) -> list:
+    """
+    Сравнение двух документов результатов по per_second.
+    Возвращает [(name, old_per_second, new_per_second, изменение в %)]; минус — стало медленнее.
+    """
+    old_by_name = {r["name"]: r for r in old.get("results", [])}
+    rows = []
+    for result in new.get("results", []):
+        prev = old_by_name.get(result["name"])
+        if not prev or not prev.get("per_second"):
+            continue
+        change = (result["per_second"] - prev["per_second"]) / prev["per_second"] * 100
+        rows.append((result["name"], prev["per_second"], result["per_second"], round(change, 1)))
+    return rows
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,12 +42,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -57,7 +60,7 @@ TEMPLATES_DIR = BASE_DIR / "templates"
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'app.perf.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -142,3 +145,87 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = "/accounts/login/"
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/"
+
+# В форме проверки по одному полю reference_type_<id> на ссылку: списки до ~10 000 строк
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 20000
+
+# Повторная отправка того же списка: предлагать копию результатов проверки
+# не только своих прошлых списков, но и списков других пользователей
+LITERA_DEDUP_ANY_USER = False
+
+# Ссылки, проверенные прежними версиями парсеров или шаблонов, перепроверяются
+# при открытии списка: не больше стольких за один просмотр
+LITERA_LAZY_RECHECK_LIMIT = 300
+
+# Пробная проверка правки поля шаблона (app/impact.py): сколько последних ссылок типа прогонять
+LITERA_IMPACT_SAMPLE = 20000
+
+# Песочница шаблонов (app/sandbox.py): бюджет времени прогона, секунд, и предел выборки.
+# Прогон идёт внутри запроса: воркер gunicorn занят до бюджета плюс запуск процесса
+# (~0,5 с), поэтому бюджет держим коротким — строки сверх него в отчёт не попадают
+LITERA_SANDBOX_SECONDS = 3
+LITERA_SANDBOX_MAX_LINES = 5000
+
+# Теневые парсеры (app/shadow.py): {код типа: "app.parsers<...>:функция"}; доля строк
+# LITERA_SHADOW_SAMPLE_RATE ставится в очередь фонового потока процесса (не больше
+# LITERA_SHADOW_QUEUE строк, остальные пропускаются), сравнения — в ShadowComparison
+LITERA_SHADOW_PARSERS = {}
+LITERA_SHADOW_SAMPLE_RATE = 0.1
+LITERA_SHADOW_QUEUE = 1000
+LITERA_SHADOW_KEEP = 10000
+
+# Кэш отрисованных таблиц страниц проверки списка и ошибок ссылки (app/page_cache.py):
+# ключ — версия списка, поэтому после изменений старые фрагменты просто не читаются
+# и вытесняются по TIMEOUT/MAX_ENTRIES. Кэш у каждого процесса свой
+LITERA_FRAGMENT_CACHE_SECONDS = 600
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "litera-fragments",
+        "TIMEOUT": LITERA_FRAGMENT_CACHE_SECONDS,
+        "OPTIONS": {"MAX_ENTRIES": 500},
+    },
+}
+
+# Прогрев процесса при запуске (app/warmup.py): парсеры, правила полей, шаблоны страниц.
+# Включается переменной окружения LITERA_WARMUP=1 — её ставит gunicorn.conf.py
+LITERA_WARMUP = os.environ.get("LITERA_WARMUP") == "1"
+
+# Замеры производительности запросов (app/middleware.py, страница «Производительность»)
+LITERA_PERF_ENABLED = True
+LITERA_PERF_RECORD_MS = 200     # запросы дольше — сохраняются в PerfRecord
+LITERA_PERF_KEEP = 5000         # сколько последних PerfRecord хранить
+LITERA_PERF_SLOW_LINES = 10     # самых медленных строк на запрос
+LITERA_SLOW_LINE_MS = 20        # строки с разбором дольше — в SlowLine (0 — не собирать)
+LITERA_SLOW_LINE_KEEP = 1000    # сколько SlowLine хранить
+
+# Метрики Prometheus (/metrics, app/metrics.py)
+LITERA_METRICS_DIR = os.environ.get("LITERA_METRICS_DIR")  # снимки процессов; None — <tmp>/litera-metrics
+LITERA_METRICS_FLUSH_SECONDS = 1.0                  # как часто процесс записывает свой снимок
+# Адреса, с которых /metrics доступна без входа (иначе — роль operator/admin). По умолчанию
+# пусто: за обратным прокси на той же машине все запросы приходят с 127.0.0.1, и такой
+# адрес в списке открыл бы метрики всем. Указывайте адрес сервера Prometheus
+LITERA_METRICS_ALLOWED_IPS = []
+
+# PRAGMA для SQLite (app/db.py): WAL, synchronous=NORMAL, busy_timeout; только PRAGMA и
+# значения из db.ALLOWED_PRAGMAS. journal_mode ставится в файле БД один раз (миграция 0027);
+# значение None отключает PRAGMA, например {"journal_mode": None} для БД на сетевом диске
+LITERA_SQLITE_PRAGMAS = {}
+
+# Каждый запрос — одна JSON-строка в логгер litera.perf. В консоль строки выводятся только
+# при LITERA_PERF_LOG=1 (её ставит gunicorn.conf.py): runserver и тесты не засоряются ими
+LITERA_PERF_LOG = os.environ.get("LITERA_PERF_LOG") == "1"
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+        "null": {"class": "logging.NullHandler"},
+    },
+    "loggers": {
+        "litera.perf": {"handlers": ["console" if LITERA_PERF_LOG else "null"], "level": "INFO", "propagate": False},
+    },
+}
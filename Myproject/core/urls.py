@@ -31,7 +31,14 @@ urlpatterns = [
     path('check-list/<int:pk>/parse/', views.check_list_parse, name='check_list_parse'),
     path('check-list/<int:pk>/edit/', views.check_list_edit, name='check_list_edit'),
     path('check-list/<int:pk>/verify/', views.check_list_verify, name='check_list_verify'),
+    path('check-list/<int:pk>/runs/compare/', views.check_run_compare, name='check_run_compare'),
     path('reference/<int:pk>/errors/', views.reference_errors, name='reference_errors'),
+    path('search/', views.reference_search, name='reference_search'),
+    path('stats/', views.stats_dashboard, name='stats_dashboard'),
+    path('sandbox/', views.pattern_sandbox, name='pattern_sandbox'),
+    path('perf/', views.perf_dashboard, name='perf_dashboard'),
+    path('perf/slow-lines.json', views.slow_lines_export, name='slow_lines_export'),
+    path('metrics', views.metrics_view, name='metrics'),
     # CRUD для ReferenceType
     path('reference-types/', views.reference_type_list, name='reference_type_list'),
     path('reference-types/create/', views.reference_type_create, name='reference_type_create'),
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Конфигурация gunicorn для Litera (запуск из каталога с manage.py):
+
+    gunicorn -c gunicorn.conf.py
+
+preload_app: приложение загружается и прогревается (app/warmup.py) один раз
+в мастер-процессе, воркеры получают готовое состояние копированием при записи.
+Строки замеров запросов (логгер litera.perf) выводятся в консоль — LITERA_PERF_LOG=1,
+отключаются LITERA_PERF_LOG=0.
+Переменные окружения: GUNICORN_BIND — адрес, WEB_CONCURRENCY — число воркеров.
+По умолчанию gunicorn слушает только 127.0.0.1:8000 — перед ним должен стоять
+обратный прокси (nginx и т.п.). Если задан PORT (так делают платформы вроде
+Render, у которых свой прокси), слушается 0.0.0.0:$PORT.
+"""
+import gc
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+os.environ.setdefault("LITERA_WARMUP", "1")
+os.environ.setdefault("LITERA_PERF_LOG", "1")
+
+wsgi_app = "core.wsgi:application"
+bind = os.environ.get("GUNICORN_BIND") or (f"0.0.0.0:{os.environ['PORT']}" if os.environ.get("PORT") else "127.0.0.1:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+preload_app = True
+timeout = 120
+# Перезапуск воркеров ограничивает рост памяти; разброс — чтобы не все сразу
+max_requests = 2000
+max_requests_jitter = 200
+
+
+def when_ready(server):
+    # Объекты, созданные при загрузке и прогреве, — в постоянное поколение GC: сборщик мусора
+    # не трогает их заголовки, и страницы памяти остаются общими с воркерами
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Соединения с БД мастера воркерам не достаются: каждый открывает свои
+    from django.db import connections
+
+    connections.close_all()